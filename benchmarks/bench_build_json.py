@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_build_json.py — build_json 全量重建 vs 逐筆指紋增量重建
+
+用 data/bgg_data.json 複製出 N 款（改 bgg_id）當目錄，比較：
+- full  ：build_games + json.dump 兩份輸出（舊版 main）
+- cold  ：build_incremental，目錄是空的（第一次跑）
+- noop  ：同樣的輸入再跑一次（不寫檔）
+- one   ：只改一款的價格
+- pct1  ：改 1% 的遊戲
+
+用法：
+    python benchmarks/bench_build_json.py [--sizes 1000,10000,50000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import build_json  # noqa: E402
+from catalog import Catalog  # noqa: E402
+
+
+def catalog(n: int) -> list:
+    base = json.loads((ROOT / "data" / "bgg_data.json").read_text("utf-8"))
+    rows = []
+    for i in range(n):
+        r = dict(base[i % len(base)])
+        r["bgg_id"] = 1_000_000 + i
+        rows.append(r)
+    return rows
+
+
+def run_full(rows) -> None:
+    games, _ = build_json.build_games(rows, {})
+    with build_json.OUT_FULL.open("w", encoding="utf-8") as f:
+        json.dump(games, f, ensure_ascii=False, indent=2)
+    with build_json.OUT_SITE.open("w", encoding="utf-8") as f:
+        json.dump(games, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def run_incremental(rows, catalog: Catalog) -> str:
+    outputs = ((build_json.OUT_FULL, 2), (build_json.OUT_SITE, None))
+    return build_json.build_incremental(rows, {}, outputs=outputs, catalog=catalog).delta.summary()
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,50000")
+    args = ap.parse_args()
+
+    print(f"{'games':>7} {'full':>8} {'cold':>8} {'noop':>8} {'one':>8} {'pct1':>8}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        rows = catalog(n)
+        with tempfile.TemporaryDirectory() as d, Catalog(pathlib.Path(d) / "catalog.sqlite3") as cache:
+            d = pathlib.Path(d)
+            build_json.OUT_FULL = d / "games_full.json"
+            build_json.OUT_SITE = d / "games.json"
+
+            full, _ = timed(run_full, rows)
+            ref = build_json.OUT_FULL.read_bytes(), build_json.OUT_SITE.read_bytes()
+            cold, _ = timed(run_incremental, rows, cache)
+            assert (build_json.OUT_FULL.read_bytes(), build_json.OUT_SITE.read_bytes()) == ref, "增量輸出不一致"
+            noop, _ = timed(run_incremental, rows, cache)
+            rows[n // 2] = dict(rows[n // 2], price_twd=99999)
+            one, _ = timed(run_incremental, rows, cache)
+            for i in range(0, n, 100):
+                rows[i] = dict(rows[i], price_twd=88888)
+            pct1, _ = timed(run_incremental, rows, cache)
+            # 切片拼出來的檔案要跟全量重建逐字相同
+            games, _ = build_json.build_games(rows, {})
+            assert build_json.OUT_FULL.read_text("utf-8") == json.dumps(games, ensure_ascii=False, indent=2)
+            assert build_json.OUT_SITE.read_text("utf-8") == json.dumps(games, ensure_ascii=False, separators=(",", ":"))
+        print(f"{n:>7} {full:>7.2f}s {cold:>7.2f}s {noop:>7.2f}s {one:>7.2f}s {pct1:>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_catalog.py — 改幾筆記錄：整份 JSON 讀進來、改、整份寫回 vs SQLite 目錄（catalog.py）只改那幾列
+
+用 data/bgg_data.json 複製出 N 筆（換 bgg_id），各自放在暫存目錄：
+- JSON：json.loads 整份 → 改 K 筆 → json.dumps(indent=2) 整份寫回（舊版各腳本的做法）
+- 目錄：put_fetched 那 K 筆（一個 transaction，只寫那幾列）
+另外量匯出：
+- JSON：整份讀進來再 json.dumps 寫出
+- 目錄：export_built（一個 SELECT … ORDER BY position，JsonArrayWriter 邊讀邊寫）
+各印出耗時與 tracemalloc 峰值（兩者分開跑）。
+
+用法：
+    python benchmarks/bench_catalog.py [--sizes 1000,10000,100000] [--touch 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from catalog import Catalog  # noqa: E402
+
+
+def make_rows(n: int) -> list:
+    base = json.loads((ROOT / "data" / "bgg_data.json").read_text("utf-8"))
+    rows = []
+    for i in range(n):
+        r = dict(base[i % len(base)])
+        r["bgg_id"] = str(i + 1)
+        rows.append(r)
+    return rows
+
+
+def measured(fn):
+    """(耗時 秒, tracemalloc 峰值 byte)；耗時另外跑一次量（tracemalloc 開著會慢好幾倍）。"""
+    t0 = time.perf_counter()
+    fn()
+    sec = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sec, peak
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--touch", type=int, default=10, help="每次改幾筆")
+    args = ap.parse_args()
+
+    for n in [int(x) for x in args.sizes.split(",")]:
+        rows = make_rows(n)
+        touched = [str(1 + i * (n // args.touch)) for i in range(args.touch)]
+        with tempfile.TemporaryDirectory() as d:
+            tmp = pathlib.Path(d)
+            path = tmp / "bgg_data.json"
+            path.write_text(json.dumps(rows, ensure_ascii=False, indent=2), "utf-8")
+            with Catalog(tmp / "catalog.sqlite3") as cat:
+                cat.put_fetched((r["bgg_id"], r) for r in rows)
+                cat.update_built((r["bgg_id"], r["bgg_id"], i, "", r, {}) for i, r in enumerate(rows))
+                del rows
+
+                def json_update():
+                    data = json.loads(path.read_text("utf-8"))
+                    for r in data:
+                        if r["bgg_id"] in touched:
+                            r["price_twd"] = 999
+                    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), "utf-8")
+
+                def catalog_update():
+                    with cat.transaction():
+                        cat.put_fetched((bid, dict(cat.get_record(bid), price_twd=999)) for bid in touched)
+
+                def json_export():
+                    data = json.loads(path.read_text("utf-8"))
+                    (tmp / "out.json").write_text(json.dumps(data, ensure_ascii=False, indent=2), "utf-8")
+
+                def catalog_export():
+                    cat.export_built(tmp / "out.json")
+
+                results = [
+                    ("改 %d 筆" % args.touch, measured(json_update), measured(catalog_update)),
+                    ("匯出全部", measured(json_export), measured(catalog_export)),
+                ]
+
+        print(f"N={n}")
+        for label, (js, jm), (cs, cm) in results:
+            print(f"  {label:8} JSON {js * 1000:8.1f} ms（峰值 {jm / 2**20:7.1f} MB）   "
+                  f"目錄 {cs * 1000:8.1f} ms（峰值 {cm / 2**20:7.1f} MB）")
+
+
+if __name__ == "__main__":
+    main()
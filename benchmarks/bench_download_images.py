@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_download_images.py — download_images 吞吐量測試（打本機檔案 server，不碰 BGG）
+
+比較：
+- legacy：一張一張 requests.get（無 Session），resp.content 整張進記憶體再寫檔
+- pooled：download_all（Session 連線池 + 多執行緒 + 每 host 上限 + .part 串流寫入）
+- reval ：manifest 條件式請求（全部 304）
+假圖內容都一樣，pooled 會顯示內容定址倉庫的去重（deduped）。
+
+用法：
+    python benchmarks/bench_download_images.py [--images 200] [--kb 200] [--latency 0.05]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import requests  # noqa: E402
+
+import download_images  # noqa: E402
+from image_store import ImageStore  # noqa: E402
+
+
+class ImageServer:
+    """回傳固定大小假圖檔的 HTTP/1.1 server（支援 keep-alive 與 ETag／304）。"""
+
+    def __init__(self, size: int, latency: float):
+        payload = os.urandom(size)
+        etag = '"bench-v1"'
+        self.connections = 0
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                outer.connections += 1
+
+            def do_GET(self):
+                time.sleep(latency)
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def url(self, name: str) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/img/{name}"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run_legacy(jobs, out_dir: pathlib.Path) -> int:
+    total = 0
+    for _, url, fname in jobs:
+        resp = requests.get(url, timeout=30)
+        if resp.status_code == 200 and resp.content:
+            (out_dir / fname).write_bytes(resp.content)
+            total += len(resp.content)
+    return total
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--images", type=int, default=200)
+    ap.add_argument("--kb", type=int, default=200, help="每張圖大小（KB）")
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--concurrency", type=int, default=download_images.CONCURRENCY)
+    ap.add_argument("--per-host", type=int, default=download_images.PER_HOST)
+    args = ap.parse_args()
+
+    server = ImageServer(args.kb * 1024, args.latency)
+    try:
+        jobs = [(str(i), server.url(f"pic{i}.jpg"), f"{i}-bench.jpg") for i in range(args.images)]
+        print(f"images={args.images} size={args.kb}KB latency={args.latency}s")
+
+        with tempfile.TemporaryDirectory() as d:
+            before = server.connections
+            t0 = time.perf_counter()
+            nbytes = run_legacy(jobs, pathlib.Path(d))
+            wall = time.perf_counter() - t0
+            print(f"  legacy  wall={wall:6.2f}s {nbytes / 2**20 / wall:7.2f} MB/s "
+                  f"{args.images / wall:7.1f} img/s connections={server.connections - before}")
+
+        with tempfile.TemporaryDirectory() as d:
+            before = server.connections
+            st = download_images.download_all(
+                jobs, pathlib.Path(d), concurrency=args.concurrency, per_host=args.per_host
+            )
+            wall = st["elapsed"]
+            print(f"  pooled  wall={wall:6.2f}s {st['bytes'] / 2**20 / wall:7.2f} MB/s "
+                  f"{st['downloaded'] / wall:7.1f} img/s connections={server.connections - before} "
+                  f"(concurrency={args.concurrency}, per_host={args.per_host}) deduped={st['deduped']}")
+
+            # 第二次跑：全部已存在且剛確認過，應該完全不打網路
+            st = download_images.download_all(jobs, pathlib.Path(d))
+            print(f"  rerun   skipped={st['skipped']} downloaded={st['downloaded']} wall={st['elapsed']:.3f}s")
+
+            # 強制重新確認：條件式請求，全部 304、不傳內容
+            st = download_images.download_all(jobs, pathlib.Path(d), revalidate_days=0)
+            print(f"  reval   not_modified={st['not_modified']} downloaded={st['downloaded']} "
+                  f"bytes={st['bytes']} wall={st['elapsed']:.2f}s")
+
+            # 離線比對 manifest
+            bad = ImageStore(pathlib.Path(d)).verify()
+            print(f"  verify  bad={bad}")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_fetch_bgg.py — fetch_bgg 抓取排程的吞吐量測試（打本機 stub，不碰 BGG）
+
+比較：
+- legacy：一次一批、每批後固定 sleep（舊版 main 的行為）
+- bucket：BGG_CONCURRENCY 條執行緒 + 令牌桶 + 自適應退避（同時用 bgg_client 的 record 模式把回應錄到暫存目錄）
+- replay：同一批 id 用 replay 模式重跑（完全不連網，stub 應該收不到任何請求；量的是純解析／排程的成本）
+
+用法：
+    python benchmarks/bench_fetch_bgg.py [--ids 400] [--latency 0.2] [--rate 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import fetch_bgg  # noqa: E402
+from bgg_client import BGGClient  # noqa: E402
+from bgg_stub import StubBGG  # noqa: E402
+from rate_limit import Backoff, FetchStats  # noqa: E402
+
+# benchmark 把退避縮短，避免結果被固定 sleep 淹沒
+BACKOFF = Backoff(base=0.05, cap=1.0)
+
+
+def run_legacy(ids, url: str, sleep_sec: float) -> tuple:
+    """舊版流程：循序抓，每批後固定 sleep。"""
+    stats = FetchStats()
+    rows = []
+    with BGGClient(mode="live", rate=1e6, backoff=BACKOFF) as client:
+        for batch in fetch_bgg.iter_batches(ids):
+            xml_bytes = fetch_bgg.fetch_batch(client, batch, stats=stats, base_url=url)
+            if xml_bytes is not None:
+                rows.extend(fetch_bgg.parse_xml(xml_bytes))
+            time.sleep(sleep_sec)
+    stats.add(items=len(rows))
+    stats.finish()
+    return rows, stats
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ids", type=int, default=400)
+    ap.add_argument("--latency", type=float, default=0.2, help="stub 每個請求的延遲秒數")
+    ap.add_argument("--rate", type=float, default=10.0, help="令牌桶每秒請求數")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--queue-every", type=int, default=7, help="每 N 個請求回一次 202")
+    args = ap.parse_args()
+
+    ids = [str(i) for i in range(1, args.ids + 1)]
+    legacy_sleep = 1.0 / args.rate
+
+    results = []
+    with StubBGG(latency=args.latency, queue_every=args.queue_every) as stub, tempfile.TemporaryDirectory() as d:
+        t0 = time.perf_counter()
+        rows, stats = run_legacy(ids, stub.thing_url, legacy_sleep)
+        results.append(("legacy", time.perf_counter() - t0, len(rows), stats))
+
+        def run(name: str, mode: str) -> list:
+            stats = FetchStats()
+            client = BGGClient(mode=mode, rate=args.rate, burst=args.concurrency, backoff=BACKOFF,
+                               cache_dir=pathlib.Path(d))
+            t0 = time.perf_counter()
+            with client:
+                rows = fetch_bgg.fetch_all(
+                    ids, client, concurrency=args.concurrency, base_url=stub.thing_url, stats=stats
+                )
+            results.append((name, time.perf_counter() - t0, len(rows), stats))
+            return rows
+
+        recorded = run("bucket", "record")
+        before = stub.count
+        assert run("replay", "replay") == recorded, "replay 的結果跟錄下來的不一樣"
+        assert stub.count == before, "replay 不應該連網"
+
+    print(f"ids={args.ids} latency={args.latency}s rate={args.rate}/s concurrency={args.concurrency}")
+    for name, wall, n, st in results:
+        print(f"  {name:<7} wall={wall:6.2f}s rows={n:<6} {n / wall:8.1f} ids/s  | {st.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_game_record.py — game_record.Game 的成本：記憶體與轉換時間，跟直接用 dict 比
+
+用 data/bgg_data.json 複製出 N 筆（換 bgg_id），先 json.loads 成 dict，再比較：
+- 記憶體：json.loads 的 dict 直接留著 vs 每筆用 Game.adopt 包起來；Game 不省記憶體（每筆多一個小外殼，
+  約為 dict 的 102–103%），這裡量的是包起來的額外成本有多小
+- 網站用的標準記錄（site_payload.canonical）：Game vs 轉成 dict（to_dict）
+- 每筆的轉換成本：dict(rec)（舊版 build_json / normalize_bgg_data 開頭的複製）vs Game.from_dict（複製＋包起來）
+  vs Game.adopt（只包起來），以及 build_json 每筆都要做的 to_full
+
+用法：
+    python benchmarks/bench_game_record.py [--sizes 1000,10000,100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import pathlib
+import sys
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from game_record import Game  # noqa: E402
+from site_payload import canonical  # noqa: E402
+
+
+def make_text(n: int) -> str:
+    base = json.loads((ROOT / "data" / "bgg_data.json").read_text("utf-8"))
+    rows = []
+    for i in range(n):
+        r = dict(base[i % len(base)])
+        r["bgg_id"] = str(i + 1)
+        rows.append(r)
+    return json.dumps(rows, ensure_ascii=False)
+
+
+def measured(build):
+    """build() 產生的物件留在記憶體裡佔多少 byte（tracemalloc 現用量）。"""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    cur, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, cur
+
+
+def as_games(text: str) -> list:
+    return [Game.adopt(r) for r in json.loads(text)]
+
+
+def timed(fn, repeat: int = 3):
+    """跑 repeat 次取最快的一次（秒）。"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(n: int) -> None:
+    text = make_text(n)
+    dicts, dict_b = measured(lambda: json.loads(text))
+    games, game_b = measured(lambda: as_games(text))
+    assert [g.to_dict() for g in games[:50]] == [Game.from_dict(r).to_dict() for r in dicts[:50]]
+
+    _, site_dict_b = measured(lambda: [canonical(r).to_dict() for r in dicts])
+    _, site_game_b = measured(lambda: [canonical(r) for r in dicts])
+
+    copy_dict = timed(lambda: [dict(r) for r in dicts])
+    copy_game = timed(lambda: [Game.from_dict(r) for r in dicts])
+    adopt_game = timed(lambda: [Game.adopt(r) for r in dicts])
+    full = timed(lambda: [Game.adopt(r).to_full() for r in dicts])
+
+    print(f"N={n}")
+    print(f"  bgg_data 記錄  dict {dict_b / 2**20:7.1f} MB ({dict_b / n:5.0f} B/筆)   "
+          f"Game {game_b / 2**20:7.1f} MB ({game_b / n:5.0f} B/筆)   {game_b / dict_b:.0%}")
+    print(f"  網站標準記錄   dict {site_dict_b / 2**20:7.1f} MB ({site_dict_b / n:5.0f} B/筆)   "
+          f"Game {site_game_b / 2**20:7.1f} MB ({site_game_b / n:5.0f} B/筆)   {site_game_b / site_dict_b:.0%}")
+    print(f"  每筆轉換一次   dict(rec) {copy_dict * 1000:7.1f} ms   Game.from_dict {copy_game * 1000:7.1f} ms   "
+          f"Game.adopt {adopt_game * 1000:7.1f} ms   adopt+to_full {full * 1000:7.1f} ms")
+
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    args = ap.parse_args()
+
+    for n in [int(x) for x in args.sizes.split(",")]:
+        run(n)  # 每個 N 各跑在自己的 function 裡，跑完整批物件一起釋放，不影響下一個 N 的量測
+
+if __name__ == "__main__":
+    main()
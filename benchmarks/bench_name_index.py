@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_name_index.py — bgg_query 每個 query 的解析延遲：本機名稱索引 vs 網路搜尋（stub）
+
+- index  ：name_index.NameIndex（data/bgg_data.json + data/manual.csv 建的索引）
+- network：resolve_bgg.bgg_search_to_id 打本機 stub（--latency 模擬往返）
+
+query 組成：已知名稱原樣、已知名稱換大小寫／加標點、目錄裡沒有的名稱（這些一定要走網路）
+
+用法：
+    python benchmarks/bench_name_index.py [--queries 2000] [--latency 0.2] [--network-sample 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import random
+import statistics
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import resolve_bgg  # noqa: E402
+from bgg_client import BGGClient  # noqa: E402
+from bgg_stub import StubBGG  # noqa: E402
+from name_index import NameIndex, record_names  # noqa: E402
+
+
+def make_queries(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    names = [
+        name
+        for rec in json.loads((ROOT / "data" / "bgg_data.json").read_text("utf-8"))
+        for name in record_names(rec)
+    ]
+    out = []
+    for i in range(n):
+        kind = i % 3
+        if kind == 0:
+            out.append(rng.choice(names))
+        elif kind == 1:
+            out.append(f"  {rng.choice(names).upper()}!  ")
+        else:
+            out.append(f"Synthetic Game {i}")
+    return out
+
+
+def per_query_us(fn, queries) -> list:
+    out = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        out.append((time.perf_counter() - t0) * 1e6)
+    return out
+
+
+def fmt(us: list) -> str:
+    us = sorted(us)
+    p95 = us[min(len(us) - 1, int(len(us) * 0.95))]
+    return f"median={statistics.median(us):10.1f}µs p95={p95:10.1f}µs"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--latency", type=float, default=0.2, help="stub 每個請求的延遲秒數")
+    ap.add_argument("--network-sample", type=int, default=20, help="網路路徑只量這麼多個 query")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    idx = NameIndex.load()
+    build = time.perf_counter() - t0
+    queries = make_queries(args.queries)
+
+    hits = sum(1 for q in queries if idx.resolve(q))
+    index_us = per_query_us(idx.match, queries)
+
+    sample = queries[: args.network_sample]
+    with StubBGG(latency=args.latency) as stub, BGGClient(mode="live", rate=1e6) as client:
+        net_us = per_query_us(lambda q: resolve_bgg.bgg_search_to_id(client, q, base_url=stub.search_url), sample)
+
+    print(f"索引：{len(idx)} 個名稱，建立 {build * 1000:.1f} ms；本機命中 {hits}/{len(queries)}")
+    print(f"  index   {fmt(index_us)}  (n={len(queries)})")
+    print(f"  network {fmt(net_us)}  (n={len(sample)}, stub latency {args.latency}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_pipeline.py — 整條管線各階段在合成目錄（1k / 10k / 100k 款）上的耗時、吞吐量、峰值 RSS
+
+合成資料（可重現，內容只由款數決定；第一次產生後放在 data/cache/bench/n{N}/ 重複使用）：
+- bgg/*.xml      ：BGG XML API2 的 thing 回應，每檔 20 款（bgg_stub.thing_xml）
+- manual.csv     ：跟 data/manual.csv 同欄位的覆寫表（售價、二手價、中文名、分類、庫存…）
+- bgg_data.json  ：XML 解析後的 BGG 記錄
+- games_full.json：套完 manual.csv 的 games_full 記錄
+- img/           ：N 個假的圖檔（每個 --image-bytes byte）
+
+階段（每個都在獨立子程序裡跑，RSS 互不影響）：
+    parse_xml      fetch_bgg.iter_parse_xml 解析全部 XML
+    apply_override manual.csv 讀進來 → apply_taxonomy_and_price.apply_overrides
+    merge          merge_bgg_into_full.merge_record（每款 games_full 記錄＋對應的 BGG 記錄）
+    compat         build_json._compat（bgg_data 記錄 → games_full 記錄）
+    publish        site_payload.encode → 清單／明細／搜尋索引序列化＋ .gz（publish_games.write_compressed，寫到資料目錄的 site/）
+    image_hash     fingerprint.sha256_file 算每個圖檔的 sha256（image_store / download_images 收圖時做的事）
+
+每個階段跑 --repeat 次取最快的一次；RSS 是子程序的 ru_maxrss（載入輸入之後、跑完之後各記一次）。
+結果寫成 JSON（含 commit、Python 版本、機器資訊），預設放在 benchmarks/results/（不進版控，切 commit 也會留著）：
+
+    {"schema": 1, "commit": "...", "dirty": false, "python": "3.11.7", "platform": "...", "cpus": 8,
+     "created_at": "...", "repeat": 3,
+     "results": [{"stage": "parse_xml", "n": 1000, "items": 1000, "wall_s": 0.41,
+                  "items_per_s": 2439.0, "rss_setup_mb": 61.2, "peak_rss_mb": 75.0}, ...]}
+
+用法：
+    python benchmarks/bench_pipeline.py                                # 1k / 10k / 100k、全部階段
+    python benchmarks/bench_pipeline.py --sizes 1000 --stages parse_xml,compat
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/pipeline-<commit>.json
+        # 跟另一個 commit 的結果比；有階段慢超過 --tolerance（預設 15%）就以 exit code 1 結束
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import pathlib
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+BENCH = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(BENCH))
+
+FIXTURE_DIR = ROOT / "data" / "cache" / "bench"
+RESULTS_DIR = BENCH / "results"
+FIXTURE_VERSION = 1
+RESULT_SCHEMA = 1
+
+MANUAL_HEADER = [
+    "name_zh", "bgg_id", "bgg_query", "name_en_override", "category_zh", "alias_zh",
+    "price_msrp_twd", "price_twd", "used_price_twd", "price_note", "used_note",
+    "manual_override", "stock", "description", "image_override", "image_version_id",
+]
+CATEGORY_ZH = ["派對", "策略", "家庭", "兒童", "合作", "陣營"]
+
+
+# ------------------------------
+# 合成資料
+# ------------------------------
+def _manual_row(bid: int) -> Dict[str, str]:
+    return {
+        "name_zh": f"合成遊戲 {bid}",
+        "bgg_id": str(bid),
+        "bgg_query": "",
+        "name_en_override": f"Synthetic Game {bid} (TW)" if bid % 50 == 0 else "",
+        "category_zh": CATEGORY_ZH[bid % len(CATEGORY_ZH)] if bid % 3 else "",
+        "alias_zh": f"合成{bid}" if bid % 4 == 0 else "",
+        "price_msrp_twd": str(500 + bid % 40 * 50),
+        "price_twd": str(450 + bid % 40 * 50) if bid % 2 else "",
+        "used_price_twd": str(300 + bid % 20 * 25) if bid % 5 == 0 else "",
+        "price_note": "含擴充" if bid % 11 == 0 else "",
+        "used_note": "盒損" if bid % 13 == 0 else "",
+        "manual_override": "1",
+        "stock": str(bid % 4),
+        "description": f"第 {bid} 款合成遊戲的中文介紹。" * 3 if bid % 10 == 0 else "",
+        "image_override": "",
+        "image_version_id": "",
+    }
+
+
+def _image_bytes(i: int, size: int) -> bytes:
+    seed = hashlib.sha256(str(i).encode()).digest()
+    return (seed * (size // len(seed) + 1))[:size]
+
+
+def make_fixtures(n: int, image_bytes: int) -> pathlib.Path:
+    """產生（或沿用）N 款的合成資料；回傳目錄。"""
+    import apply_taxonomy_and_price as atp
+    from bgg_stub import thing_xml
+    from build_json import _compat
+    from fetch_bgg import iter_parse_xml
+    from json_stream import JsonArrayWriter
+
+    d = FIXTURE_DIR / f"n{n}"
+    marker = d / "fixture.json"
+    spec = {"version": FIXTURE_VERSION, "n": n, "image_bytes": image_bytes}
+    if marker.exists() and json.loads(marker.read_text("utf-8")) == spec:
+        return d
+    print(f"[INFO] 產生合成資料 n={n} → {d}", file=sys.stderr)
+    (d / "bgg").mkdir(parents=True, exist_ok=True)
+    (d / "img").mkdir(exist_ok=True)
+    marker.unlink(missing_ok=True)
+
+    ids = list(range(1, n + 1))
+    with (d / "manual.csv").open("w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=MANUAL_HEADER)
+        w.writeheader()
+        for bid in ids:
+            w.writerow(_manual_row(bid))
+
+    overrides = {str(bid): _manual_row(bid) for bid in ids}
+    with JsonArrayWriter(d / "bgg_data.json") as raw, JsonArrayWriter(d / "games_full.json") as full:
+        for k, start in enumerate(range(0, n, 20)):
+            xml_bytes = thing_xml(ids[start:start + 20])
+            (d / "bgg" / f"{k:05d}.xml").write_bytes(xml_bytes)
+            for rec in iter_parse_xml(xml_bytes):
+                raw.write(rec)
+                atp.apply_override(rec, overrides[str(rec["bgg_id"])])
+                g = _compat(rec)
+                g.pop("rating_bayes", None)  # 留一些給 merge 補
+                full.write(g)
+
+    for i in ids:
+        (d / "img" / f"{i}.jpg").write_bytes(_image_bytes(i, image_bytes))
+    marker.write_text(json.dumps(spec), "utf-8")
+    return d
+
+
+# ------------------------------
+# 各階段：setup(資料目錄) → ctx；run(ctx) → 處理了幾筆
+# ------------------------------
+def _load(d: pathlib.Path, name: str) -> List[Dict]:
+    return json.loads((d / name).read_text("utf-8"))
+
+
+def setup_parse_xml(d):
+    return [p.read_bytes() for p in sorted((d / "bgg").glob("*.xml"))]
+
+
+def run_parse_xml(batches) -> int:
+    from fetch_bgg import iter_parse_xml
+
+    return sum(1 for xml_bytes in batches for _ in iter_parse_xml(xml_bytes))
+
+
+def setup_apply_override(d):
+    return d / "manual.csv", _load(d, "bgg_data.json")
+
+
+def run_apply_override(ctx) -> int:
+    import apply_taxonomy_and_price as atp
+
+    path, rows = ctx
+    atp.MANUAL_CSV = path
+    overrides = atp.load_manual_overrides()
+    atp.apply_overrides(rows, overrides)
+    return len(rows)
+
+
+def setup_merge(d):
+    return _load(d, "games_full.json"), {str(r["bgg_id"]): r for r in _load(d, "bgg_data.json")}
+
+
+def run_merge(ctx) -> int:
+    from merge_bgg_into_full import merge_record
+
+    full, by_id = ctx
+    for g in full:
+        merge_record(dict(g), by_id[str(g["bgg_id"])])
+    return len(full)
+
+
+def setup_compat(d):
+    return _load(d, "bgg_data.json")
+
+
+def run_compat(rows) -> int:
+    from build_json import _compat
+
+    for r in rows:
+        _compat(r)
+    return len(rows)
+
+
+def setup_publish(d):
+    import taxonomy
+
+    out = d / "site"
+    out.mkdir(exist_ok=True)
+    return _load(d, "games_full.json"), taxonomy.load_labels(), out
+
+
+def run_publish(ctx) -> int:
+    from publish_games import write_compressed
+    from site_payload import DETAIL_DIR, dumps, encode
+
+    rows, labels, out = ctx
+    payload, files = encode(rows, labels=labels)
+    (out / DETAIL_DIR).mkdir(exist_ok=True)
+    for name, body in files.items():
+        write_compressed(out / name, dumps(body))
+    write_compressed(out / "games.json", dumps(payload))
+    return len(rows)
+
+
+def setup_image_hash(d):
+    return sorted((d / "img").iterdir())
+
+
+def run_image_hash(paths) -> int:
+    from fingerprint import sha256_file
+
+    for p in paths:
+        sha256_file(p)
+    return len(paths)
+
+
+STAGES: Dict[str, Tuple[Callable[[pathlib.Path], Any], Callable[[Any], int]]] = {
+    "parse_xml": (setup_parse_xml, run_parse_xml),
+    "apply_override": (setup_apply_override, run_apply_override),
+    "merge": (setup_merge, run_merge),
+    "compat": (setup_compat, run_compat),
+    "publish": (setup_publish, run_publish),
+    "image_hash": (setup_image_hash, run_image_hash),
+}
+
+
+def _rss_mb() -> float:
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb / 1024 if sys.platform != "darwin" else kb / 2**20  # macOS 的單位是 byte
+
+
+def child(stage: str, n: int, d: pathlib.Path, repeat: int) -> None:
+    setup, run = STAGES[stage]
+    ctx = setup(d)
+    rss_setup = _rss_mb()
+    best = None
+    items = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        items = run(ctx)
+        sec = time.perf_counter() - t0
+        best = sec if best is None else min(best, sec)
+    print(json.dumps({
+        "stage": stage, "n": n, "items": items, "wall_s": round(best, 4),
+        "items_per_s": round(items / best, 1) if best else None,
+        "rss_setup_mb": round(rss_setup, 1), "peak_rss_mb": round(_rss_mb(), 1),
+    }))
+
+
+# ------------------------------
+# 結果
+# ------------------------------
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "schema": RESULT_SCHEMA,
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(base: Dict[str, Any], cur: Dict[str, Any], tolerance: float) -> int:
+    """印出兩份結果的比值；回傳變慢超過 tolerance 的項目數。"""
+    old = {(r["stage"], r["n"]): r for r in base["results"]}
+    print(f"\n對照 {base.get('commit', '?')[:10]}（{base.get('created_at', '?')}）：")
+    print(f"{'stage':<15} {'games':>7} {'wall':>8} {'peak rss':>9}")
+    slower = 0
+    for r in cur["results"]:
+        o = old.get((r["stage"], r["n"]))
+        if not o:
+            continue
+        wall = r["wall_s"] / o["wall_s"] if o["wall_s"] else float("inf")
+        rss = r["peak_rss_mb"] / o["peak_rss_mb"] if o["peak_rss_mb"] else float("inf")
+        flag = ""
+        if wall > 1 + tolerance:
+            slower += 1
+            flag = "  ← 變慢"
+        print(f"{r['stage']:<15} {r['n']:>7} {wall:>7.2f}x {rss:>8.2f}x{flag}")
+    return slower
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--stages", default=",".join(STAGES), help="逗號分隔：" + ",".join(STAGES))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--image-bytes", type=int, default=4096, help="每個合成圖檔的大小")
+    ap.add_argument("--out", type=pathlib.Path, help="結果 JSON（預設 benchmarks/results/pipeline-<commit>.json）")
+    ap.add_argument("--compare", type=pathlib.Path, metavar="BASE.json", help="跟另一份結果比較")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="--compare 時容許變慢的比例")
+    ap.add_argument("--child", nargs=3, metavar=("STAGE", "N", "DIR"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        stage, n, d = args.child
+        return child(stage, int(n), pathlib.Path(d), args.repeat)
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise SystemExit(f"[ERR] 沒有這個階段：{unknown}")
+
+    report = dict(environment(), repeat=args.repeat, results=[])
+    print(f"{'stage':<15} {'games':>7} {'wall':>9} {'games/s':>10} {'setup rss':>10} {'peak rss':>9}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        d = make_fixtures(n, args.image_bytes)
+        for stage in stages:
+            out = subprocess.run(
+                [sys.executable, __file__, "--repeat", str(args.repeat), "--child", stage, str(n), str(d)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            report["results"].append(r)
+            print(f"{stage:<15} {n:>7} {r['wall_s']:>8.3f}s {r['items_per_s']:>10.0f} "
+                  f"{r['rss_setup_mb']:>8.1f}MB {r['peak_rss_mb']:>7.1f}MB")
+
+    out = args.out
+    if out is None:
+        commit = (report["commit"] or "unknown")[:10] + ("-dirty" if report["dirty"] else "")
+        out = RESULTS_DIR / f"pipeline-{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", "utf-8")
+    print(f"[OK] 結果 → {out}")
+
+    if args.compare:
+        slower = compare(json.loads(args.compare.read_text("utf-8")), report, args.tolerance)
+        if slower:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
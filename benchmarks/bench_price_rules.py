@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_price_rules.py — data/price_rules.json 套到 N 筆記錄要多久
+
+- rowwise：每筆記錄各自從頭跑一遍規則（直譯 JSON 規則的寫法，當對照組）
+- python ：price_rules.PriceRules，純 Python 逐欄計算
+- numpy  ：price_rules.PriceRules，numpy 陣列（有裝 numpy 才量）
+三者的結果會互相比對（售價、二手價、命中規則都要一樣）。
+
+用法：
+    python benchmarks/bench_price_rules.py [--rows 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import math
+import pathlib
+import random
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import price_rules  # noqa: E402
+
+CATEGORIES = ["", "", "", "派對", "策略", "家庭", "派對、家庭", "兒童"]
+
+
+def make_rows(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        r = {"bgg_id": i + 1, "weight": round(rng.uniform(1, 5), 2) if rng.random() < 0.95 else None}
+        if rng.random() < 0.5:
+            r["category_zh"] = rng.choice(CATEGORIES)
+        if rng.random() < 0.4:
+            r["price_twd"] = rng.randrange(300, 3000, 10)
+        if rng.random() < 0.5:
+            r["price_msrp_twd"] = rng.randrange(300, 3000, 10)
+        if rng.random() < 0.3:
+            r["used_price_twd"] = rng.randrange(100, 2000, 10)
+        rows.append(r)
+    return rows
+
+
+def rowwise(rows: list, spec: dict) -> None:
+    """對照組：每筆記錄逐條比對規則。"""
+    step = spec.get("round_step") or 1
+    labels = [r.label for r in price_rules.PriceRules(spec).rules]
+    for r in rows:
+        cats = set(price_rules._categories(r.get("category_zh")))
+        w = r.get("weight")
+        hit, label = {}, price_rules.DEFAULT_LABEL
+        for i, rule in enumerate(spec.get("rules") or []):
+            m = rule.get("match") or {}
+            if "category_zh" in m and not cats & set(price_rules._categories(m["category_zh"])):
+                continue
+            if any(w is None or not price_rules.WEIGHT_OPS[op](w, m[op]) for op in price_rules.WEIGHT_OPS if op in m):
+                continue
+            hit, label = rule, labels[i]
+            break
+        filled = {}
+        if r.get("price_twd") is None and hit.get("price_set") is not None:
+            r["price_twd"] = hit["price_set"]
+            filled["price_twd"] = label
+        if r.get("used_price_twd") is None:
+            if hit.get("used_set") is not None:
+                r["used_price_twd"] = hit["used_set"]
+                filled["used_price_twd"] = label
+            else:
+                pct = hit.get("used_pct", spec.get("default_used_pct"))
+                base = r.get("price_twd") if r.get("price_twd") is not None else r.get("price_msrp_twd")
+                if pct is not None and base is not None:
+                    v = math.floor(base * pct / step + 0.5) * step
+                    r["used_price_twd"] = int(v) if float(v).is_integer() else v
+                    filled["used_price_twd"] = label
+        if filled:
+            r["price_rule"] = filled
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    args = ap.parse_args()
+
+    spec = json.loads(price_rules.RULES_JSON.read_text("utf-8"))
+    rows = make_rows(args.rows)
+    results = {}
+
+    data = copy.deepcopy(rows)
+    print(f"rowwise {timed(rowwise, data, spec) * 1000:8.1f} ms")
+    results["rowwise"] = data
+
+    numpy = price_rules.np
+    for name, backend in (("python", None), ("numpy", numpy)):
+        if name == "numpy" and numpy is None:
+            print("numpy   （沒有裝 numpy，略過）")
+            continue
+        price_rules.np = backend
+        data = copy.deepcopy(rows)
+        rules = price_rules.PriceRules(spec)
+        print(f"{name:7} {timed(rules.apply, data) * 1000:8.1f} ms")
+        results[name] = data
+    price_rules.np = numpy
+
+    base = results["rowwise"]
+    for name, data in results.items():
+        same = data == base
+        print(f"  {name} 結果{'一致' if same else '不一致！'}（{args.rows} 筆）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_resolve_bgg.py — resolve_bgg 的 bgg_query 搜尋成本（打本機 stub，不碰 BGG）
+
+比較：
+- legacy：每一列各搜一次、循序、無快取（舊版 main 的行為）
+- cold  ：去重 + 令牌桶同時搜尋，快取是空的（第一次跑）
+- warm  ：同一批 query 再跑一次（全部命中快取，應該一個請求都不發）
+- new5  ：多了 5 個新 query（只搜這 5 個）
+
+用法：
+    python benchmarks/bench_resolve_bgg.py [--queries 120] [--dup 0.3] [--latency 0.1] [--rate 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import resolve_bgg  # noqa: E402
+from bgg_client import BGGClient  # noqa: E402
+from bgg_stub import StubBGG  # noqa: E402
+
+
+def run_legacy(queries, url: str, rate: float) -> int:
+    """舊版流程：逐列搜尋，不去重也不記結果。"""
+    found = 0
+    with BGGClient(mode="live", rate=1e6) as client:
+        for q in queries:
+            if resolve_bgg.bgg_search_to_id(client, q, base_url=url):
+                found += 1
+            time.sleep(1.0 / rate)
+    return found
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=120)
+    ap.add_argument("--dup", type=float, default=0.3, help="重複 query 的比例（大小寫／空白不同）")
+    ap.add_argument("--latency", type=float, default=0.1, help="stub 每個請求的延遲秒數")
+    ap.add_argument("--rate", type=float, default=10.0, help="令牌桶每秒請求數")
+    ap.add_argument("--concurrency", type=int, default=4)
+    args = ap.parse_args()
+
+    n_unique = max(1, int(args.queries * (1 - args.dup)))
+    queries = [f"Synthetic Game {i}" for i in range(1, n_unique + 1)]
+    queries += [f"  synthetic  GAME {1 + i % n_unique}" for i in range(args.queries - n_unique)]
+    extra = [f"Synthetic Game {n_unique + i}" for i in range(1, 6)]
+
+    with StubBGG(latency=args.latency) as stub, tempfile.TemporaryDirectory() as d, \
+            BGGClient(mode="live", rate=args.rate, burst=args.concurrency) as client:
+        cache_path = pathlib.Path(d) / "bgg_search.json"
+        url = stub.search_url
+
+        def resolve(qs):
+            t0 = time.perf_counter()
+            before = stub.count
+            found, st = resolve_bgg.resolve_queries(
+                qs, resolve_bgg.QueryCache(cache_path), client=client, concurrency=args.concurrency,
+                base_url=url,
+            )
+            assert all(found[resolve_bgg._norm_query(q)] == int(q.split()[-1]) for q in qs), "搜尋結果不對"
+            return time.perf_counter() - t0, stub.count - before, st
+
+        results = []
+        t0 = time.perf_counter()
+        before = stub.count
+        run_legacy(queries, url, args.rate)
+        results.append(("legacy", time.perf_counter() - t0, stub.count - before, None))
+        results.append(("cold",) + resolve(queries))
+        results.append(("warm",) + resolve(queries))
+        results.append(("new5",) + resolve(queries + extra))
+
+    print(f"queries={args.queries} unique={n_unique} latency={args.latency}s rate={args.rate}/s "
+          f"concurrency={args.concurrency}")
+    for name, wall, reqs, st in results:
+        extra_txt = f"cached={st['cached']} searched={st['searched']}" if st else ""
+        print(f"  {name:<7} wall={wall:6.2f}s requests={reqs:<5} {extra_txt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_search_index.py — 搜尋框：逐筆 includes 掃描 vs 倒排索引（search_index.py）
+
+用 data/games_full.json 複製出 N 款（名稱加上隨機的中文字、英文詞，避免整批重複）當目錄，比較：
+- scan ：舊版 applyFilters 的做法（每款 nameZh + nameEn 轉小寫後 includes）
+- index：SearchIndex.query（前端 searchRows 的同一套規則）
+另外印出建索引時間、索引檔大小（raw / gzip）。
+
+query 組成：中文 1～3 字、英文詞首 2～5 字母、中英混合。
+
+用法：
+    python benchmarks/bench_search_index.py [--sizes 1000,10000,50000] [--queries 500]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import pathlib
+import random
+import statistics
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from search_index import SearchIndex, build  # noqa: E402
+from site_payload import canonical, dumps  # noqa: E402
+
+SYLLABLES = ["ka", "ta", "mon", "ri", "do", "zen", "lor", "vex", "qua", "sol", "nor", "bel"]
+
+
+def catalog(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    base = [canonical(r) for r in json.loads((ROOT / "data" / "games_full.json").read_text("utf-8"))]
+    rows = []
+    for i in range(n):
+        g = dict(base[i % len(base)])
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+        han = "".join(chr(0x4E00 + rng.randrange(3000)) for _ in range(2))
+        g["name_en"] = f"{g.get('name_en') or ''} {word.title()}"
+        g["name_zh"] = f"{g.get('name_zh') or ''}{han}"
+        rows.append(g)
+    return rows
+
+
+def make_queries(rows: list, n: int, seed: int = 2) -> list:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        g = rng.choice(rows)
+        zh, en = g.get("name_zh") or "", (g.get("name_en") or "").split()
+        kind = i % 3
+        if kind == 0 and zh:
+            k = rng.randint(1, 3)
+            start = rng.randrange(max(1, len(zh) - k + 1))
+            out.append(zh[start:start + k])
+        elif kind == 1 and en:
+            out.append(rng.choice(en)[: rng.randint(2, 5)])
+        else:
+            out.append(f"{zh[:2]} {en[0][:3] if en else ''}")
+    return out
+
+
+def scan(rows: list, q: str) -> int:
+    q = q.strip().lower()
+    return sum(1 for g in rows if q in f"{g.get('name_zh') or ''} {g.get('name_en') or ''}".lower())
+
+
+def per_query_us(fn, queries) -> list:
+    out = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        out.append((time.perf_counter() - t0) * 1e6)
+    return out
+
+
+def fmt(us: list) -> str:
+    us = sorted(us)
+    p95 = us[min(len(us) - 1, int(len(us) * 0.95))]
+    return f"median={statistics.median(us):10.1f}µs p95={p95:10.1f}µs"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,50000")
+    ap.add_argument("--queries", type=int, default=500)
+    args = ap.parse_args()
+
+    for n in [int(x) for x in args.sizes.split(",")]:
+        rows = catalog(n)
+        queries = make_queries(rows, args.queries)
+
+        t0 = time.perf_counter()
+        data = build(rows, schema=0)
+        build_s = time.perf_counter() - t0
+        blob = dumps(data)
+        idx = SearchIndex(data)
+
+        scan_us = per_query_us(lambda q: scan(rows, q), queries)
+        index_us = per_query_us(idx.query, queries)
+        print(f"N={n}: 建索引 {build_s * 1000:.0f} ms；索引 raw {len(blob) / 1024:.0f} KB / "
+              f"gz {len(gzip.compress(blob, mtime=0)) / 1024:.0f} KB；"
+              f"{len(data['words'])} 個詞、{len(data['grams'])} 個中文 gram")
+        print(f"  scan  {fmt(scan_us)}")
+        print(f"  index {fmt(index_us)}")
+
+
+if __name__ == "__main__":
+    main()
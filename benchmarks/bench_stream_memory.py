@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_stream_memory.py — fetch_bgg 解析＋輸出階段的峰值記憶體（1k / 10k / 100k 款）
+
+比較：
+- legacy：每批 parse_xml → all_rows.extend → 最後一次 json.dumps(indent=2)（舊版 main）
+- stream：每批 iter_parse_xml → 寫進目錄（catalog.py）→ 串流重設 bgg_data 表 → export_rows 逐筆輸出（現行 main＋build_json 匯出）
+
+每個組合在獨立子程序裡跑，量 tracemalloc 峰值與 ru_maxrss。XML 由 bgg_stub 產生，不碰網路。
+
+用法：
+    python benchmarks/bench_stream_memory.py [--sizes 1000,10000,100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+
+def _batches(n: int):
+    from bgg_stub import thing_xml
+
+    for start in range(1, n + 1, 20):
+        ids = list(range(start, min(start + 20, n + 1)))
+        yield [str(i) for i in ids], thing_xml(ids)
+
+
+def run_legacy(n: int, out: pathlib.Path) -> int:
+    import fetch_bgg
+
+    all_rows = []
+    for _, xml_bytes in _batches(n):
+        all_rows.extend(fetch_bgg.parse_xml(xml_bytes))
+    out.write_text(json.dumps(all_rows, ensure_ascii=False, indent=2), "utf-8")
+    return len(all_rows)
+
+
+def run_stream(n: int, out: pathlib.Path) -> int:
+    from catalog import Catalog
+    from fetch_bgg import iter_parse_xml
+
+    ids = []
+    with Catalog(out.with_suffix(".sqlite3")) as catalog:
+        for batch, xml_bytes in _batches(n):
+            ids.extend(batch)
+            catalog.put_fetched((r["bgg_id"], r) for r in iter_parse_xml(xml_bytes))
+        catalog.put_rows(catalog.iter_records(ids))
+        return catalog.export_rows(out)
+
+
+def child(mode: str, n: int) -> None:
+    with tempfile.TemporaryDirectory() as d:
+        out = pathlib.Path(d) / "bgg_data.json"
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        rows = (run_legacy if mode == "legacy" else run_stream)(n, out)
+        wall = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"mode": mode, "n": n, "rows": rows, "wall_s": round(wall, 2),
+                      "peak_py_mb": round(peak / 2**20, 1), "max_rss_mb": round(rss_kb / 1024, 1)}))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--child", nargs=2, metavar=("MODE", "N"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+        return child(args.child[0], int(args.child[1]))
+
+    print(f"{'mode':<7} {'games':>7} {'wall':>7} {'py peak':>9} {'max rss':>9}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        for mode in ("legacy", "stream"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, str(n)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:<7} {n:>7} {r['wall_s']:>6}s {r['peak_py_mb']:>7}MB {r['max_rss_mb']:>7}MB")
+
+
+if __name__ == "__main__":
+    main()
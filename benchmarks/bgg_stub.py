@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bgg_stub.py — 本機假的 BGG XML API2，給 benchmark 用（不會碰到真正的 BGG）
+
+- /xmlapi2/thing?id=1,2,3  → 每個 id 回一個 <item>，內容由 id 決定（可重現）
+- /xmlapi2/search?query=Synthetic Game 42 → 回 42 以及一個名稱較長的干擾項；查不到數字就回空結果
+- latency：每個請求固定延遲幾秒，模擬網路往返
+- queue_every：每 N 個請求回一次 202（BGG 排隊中）
+- max_inflight：同時超過幾個請求就回 429
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import quoteattr
+
+CATEGORIES = ["Card Game", "Fantasy", "Party Game", "Economic", "Wargame", "Abstract Strategy"]
+MECHANISMS = ["Hand Management", "Dice Rolling", "Set Collection", "Worker Placement", "Drafting"]
+
+
+def thing_item(bid: int) -> str:
+    """產生單一遊戲的 <item>（欄位跟 BGG 真實回應同形狀）。"""
+    cats = "".join(
+        f'<link type="boardgamecategory" id="{i}" value={quoteattr(c)}/>'
+        for i, c in enumerate(CATEGORIES)
+        if (bid + i) % 3 == 0
+    )
+    mechs = "".join(
+        f'<link type="boardgamemechanic" id="{i}" value={quoteattr(m)}/>'
+        for i, m in enumerate(MECHANISMS)
+        if (bid + i) % 2 == 0
+    )
+    return (
+        f'<item type="boardgame" id="{bid}">'
+        f"<thumbnail>https://cf.geekdo-images.com/t{bid}__small/img/pic{bid}.jpg</thumbnail>"
+        f"<image>https://cf.geekdo-images.com/t{bid}__original/img/pic{bid}.jpg</image>"
+        f'<name type="primary" sortindex="1" value="Synthetic Game {bid}"/>'
+        f'<name type="alternate" sortindex="1" value="合成遊戲 {bid}"/>'
+        f"<description>Game number {bid}. " + "Lorem ipsum dolor sit amet. " * 20 + "</description>"
+        f'<yearpublished value="{1990 + bid % 35}"/>'
+        f'<minplayers value="{1 + bid % 3}"/><maxplayers value="{3 + bid % 4}"/>'
+        f'<playingtime value="{30 + bid % 90}"/>'
+        f'<minplaytime value="{30 + bid % 60}"/><maxplaytime value="{30 + bid % 90}"/>'
+        f"{cats}{mechs}"
+        "<statistics page=\"1\"><ratings>"
+        f'<usersrated value="{bid * 7 % 50000}"/>'
+        f'<average value="{5 + (bid % 500) / 100:.5f}"/>'
+        f'<bayesaverage value="{5 + (bid % 300) / 100:.5f}"/>'
+        f'<averageweight value="{1 + (bid % 400) / 100:.4f}"/>'
+        "</ratings></statistics>"
+        "</item>"
+    )
+
+
+def search_xml(query: str) -> bytes:
+    m = re.search(r"(\d+)", query)
+    body = ""
+    if m:
+        bid = int(m.group(1))
+        body = "".join(
+            f'<item type="boardgame" id="{i}"><name type="primary" value={quoteattr(name)}/></item>'
+            for i, name in ((bid + 500_000, f"Synthetic Game {bid}: Deluxe"), (bid, f"Synthetic Game {bid}"))
+        )
+    return f'<?xml version="1.0" encoding="utf-8"?><items total="{body.count("<item")}">{body}</items>'.encode("utf-8")
+
+
+def thing_xml(ids) -> bytes:
+    body = "".join(thing_item(int(i)) for i in ids)
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        f'<items termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">{body}</items>'
+    ).encode("utf-8")
+
+
+class StubBGG:
+    """在背景執行緒跑的 stub server；用 with 包起來會自動關掉。"""
+
+    def __init__(self, latency: float = 0.05, queue_every: int = 0, max_inflight: int = 0):
+        self.latency = latency
+        self.queue_every = queue_every
+        self.max_inflight = max_inflight
+        self.count = 0
+        self.inflight = 0
+        self.status_counts: dict = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def thing_url(self) -> str:
+        return self.base_url + "/xmlapi2/thing"
+
+    @property
+    def search_url(self) -> str:
+        return self.base_url + "/xmlapi2/search"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):  # 安靜一點
+                pass
+
+            def _send(self, status: int, body: bytes = b"", ctype: str = "text/xml") -> None:
+                with stub._lock:
+                    stub.status_counts[status] = stub.status_counts.get(status, 0) + 1
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                qs = parse_qs(url.query)
+                with stub._lock:
+                    stub.count += 1
+                    n = stub.count
+                    stub.inflight += 1
+                    inflight = stub.inflight
+                try:
+                    time.sleep(stub.latency)
+                    if stub.max_inflight and inflight > stub.max_inflight:
+                        return self._send(429, b"Rate limit exceeded")
+                    if stub.queue_every and n % stub.queue_every == 0:
+                        return self._send(202, b"")
+                    if url.path.endswith("/thing"):
+                        ids = ",".join(qs.get("id", [""])).split(",")
+                        return self._send(200, thing_xml(i for i in ids if i.isdigit()))
+                    if url.path.endswith("/search"):
+                        return self._send(200, search_xml(qs.get("query", [""])[0]))
+                    return self._send(404, b"not found")
+                finally:
+                    with stub._lock:
+                        stub.inflight -= 1
+
+        return Handler
+
+    def __enter__(self) -> "StubBGG":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,12 @@
+# scripts/__main__.py
+"""python -m scripts → 跑整條資料管線（見 pipeline.py）。"""
+import pathlib
+import sys
+
+# 各 script 之間是用同目錄的頂層 import（from common_image import ...）
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+from pipeline import main  # noqa: E402
+
+if __name__ == "__main__":
+    main()
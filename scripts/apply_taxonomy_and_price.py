@@ -1,24 +1,26 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-將 BGG 抓回來的 data/bgg_data.json
+將 BGG 抓回來的記錄（本機目錄 catalog.py 的 bgg_data 表）
 套用 data/manual.csv 裡的價格／庫存／圖片等覆寫欄位，
-再寫回 data/bgg_data.json。
+再用 data/price_rules.json（price_rules.py）補上 CSV 沒填的售價／二手價，
+再寫回目錄（只改有變的列，一個 transaction）；data/bgg_data.json 由 build_json 最後匯出。
+manual.csv 先同步到目錄的 overrides 表（只寫有變的列、刪掉 CSV 已經沒有的），套用時從 overrides 表讀。
 
-說白話：這一步才是「尊重 CSV」的地方。
+說白話：這一步才是「尊重 CSV」的地方 —— CSV 有填的值一律優先，規則只補空的。
 """
 
 from __future__ import annotations
 import csv
-import json
 import pathlib
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional, Tuple
+
+from catalog import Catalog
+from price_rules import apply_price_rules, clear_rule_values
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
 
-BGG_JSON_IN = DATA_DIR / "bgg_data.json"
-BGG_JSON_OUT = DATA_DIR / "bgg_data.json"  # 直接覆寫
 MANUAL_CSV = DATA_DIR / "manual.csv"
 
 
@@ -37,16 +39,6 @@ def _parse_number(value: Any):
         return None
 
 
-def load_bgg_data():
-    if not BGG_JSON_IN.exists():
-        raise SystemExit(f"[ERROR] 找不到 {BGG_JSON_IN}")
-    with BGG_JSON_IN.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise SystemExit("[ERROR] bgg_data.json 內容不是 list")
-    return data
-
-
 def load_manual_overrides() -> Dict[str, Dict[str, str]]:
     """
     讀取 manual.csv，回傳 {bgg_id(str): row(dict)}。
@@ -77,6 +69,7 @@ def apply_override(rec: Dict[str, Any], ov: Dict[str, str]) -> None:
     # 文字欄位
     text_map = {
         "name_zh": "name_zh",
+        "category_zh": "category_zh",
         "alias_zh": "alias_zh",
         "description": "description",
         "image_override": "image_override",
@@ -101,10 +94,8 @@ def apply_override(rec: Dict[str, Any], ov: Dict[str, str]) -> None:
             rec[key] = num
 
 
-def main():
-    bgg_rows = load_bgg_data()
-    manual_overrides = load_manual_overrides()
-
+def apply_overrides(bgg_rows: List[Dict[str, Any]], manual_overrides: Dict[str, Dict[str, str]]) -> int:
+    """就地套用覆寫，回傳有套到的筆數。"""
     applied = 0
     for rec in bgg_rows:
         bid = str(rec.get("bgg_id") or "").strip()
@@ -115,15 +106,44 @@ def main():
             continue
         apply_override(rec, ov)
         applied += 1
+    return applied
+
+
+def sync_overrides(catalog: Catalog) -> Dict[str, Dict[str, str]]:
+    """manual.csv → 目錄的 overrides 表；回傳表裡目前的覆寫（{bgg_id: row}）。"""
+    changed, removed = catalog.sync_overrides(load_manual_overrides())
+    if changed or removed:
+        print(f"[INFO] 目錄 overrides：寫入 {changed}、刪除 {removed} 列")
+    return catalog.overrides()
 
-    with BGG_JSON_OUT.open("w", encoding="utf-8") as f:
-        json.dump(bgg_rows, f, ensure_ascii=False, indent=2)
+
+def apply_all(bgg_rows: List[Dict[str, Any]],
+              manual_overrides: Optional[Dict[str, Dict[str, str]]] = None) -> Tuple[Dict[str, Dict[str, str]], int]:
+    """
+    清掉上次規則補的價格 → 套 manual.csv → 套價格規則；回傳 (manual 覆寫, 套到的筆數)。
+    manual_overrides：目錄 overrides 表讀出來的覆寫（sync_overrides）；沒給就直接讀 manual.csv。
+    """
+    clear_rule_values(bgg_rows)
+    if manual_overrides is None:
+        manual_overrides = load_manual_overrides()
+    applied = apply_overrides(bgg_rows, manual_overrides)
+    apply_price_rules(bgg_rows)
+    return manual_overrides, applied
+
+
+def main():
+    with Catalog() as catalog:
+        bgg_rows = catalog.rows()
+        if not bgg_rows:
+            raise SystemExit("[ERROR] 目錄裡沒有 bgg_data（先跑 fetch_bgg.py）")
+        manual_overrides, applied = apply_all(bgg_rows, sync_overrides(catalog))
+        _, changed = catalog.put_rows(bgg_rows)
 
     print(
         f"apply_taxonomy_and_price: total={len(bgg_rows)}, "
         f"manual_rows={len(manual_overrides)}, applied={applied}"
     )
-    print(f"→ 已覆寫輸出：{BGG_JSON_OUT}")
+    print(f"→ 目錄 bgg_data 改了 {changed} 列：{catalog.path}")
 
 
 if __name__ == "__main__":
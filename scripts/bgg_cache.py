@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bgg_cache.py — 以 id 為 key 的 append-only JSONL 快取
+（fetch_version_image 的 data/cache/bgg_versions.jsonl、bgg_client 回應快取的 index.jsonl；
+fetch_bgg 的 BGG 記錄改存在目錄 catalog.py，舊的 bgg_records.jsonl 只在匯入時讀一次）
+
+格式：一行一筆 JSON
+    {"bgg_id": "8", "fetched_at": 1731900000.0, "record": {...} | null}
+- 只會 append，同一個 id 以最後一行為準；record 為 null 代表「查無此 id」
+- 記憶體裡只留 {bgg_id: (fetched_at, 檔案位移)}，記錄本身需要時才讀
+- 每批抓完就 put_many() → flush + fsync，中途當掉下次也能接著跑
+- 過期的舊行累積太多時，compact() 會原子改寫成一 id 一行
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class RecordCache:
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._index: Dict[str, Tuple[float, int]] = {}
+        self._lines = 0
+        self._fh = None
+        self._load()
+
+    # ------------------------------
+    # 讀取
+    # ------------------------------
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with self.path.open("rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self._index[str(entry["bgg_id"])] = (float(entry["fetched_at"]), offset)
+                    self._lines += 1
+                except (ValueError, KeyError):
+                    # 最後一行寫到一半就當掉 → 略過
+                    pass
+                offset += len(line)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, bid: str) -> bool:
+        return str(bid) in self._index
+
+    def ids(self) -> List[str]:
+        return list(self._index)
+
+    def fetched_at(self, bid: str) -> Optional[float]:
+        hit = self._index.get(str(bid))
+        return hit[0] if hit else None
+
+    def is_fresh(self, bid: str, ttl_days: float, now: Optional[float] = None) -> bool:
+        ts = self.fetched_at(bid)
+        if ts is None:
+            return False
+        now = time.time() if now is None else now
+        return now - ts < ttl_days * 86400
+
+    def stale_ids(self, ids: Iterable[str], ttl_days: float) -> List[str]:
+        """回傳需要（重新）抓取的 id：沒抓過或超過 TTL。"""
+        now = time.time()
+        return [i for i in ids if not self.is_fresh(i, ttl_days, now)]
+
+    def get(self, bid: str) -> Optional[Dict]:
+        """取回快取中的記錄（不管是否過期）；沒有或查無此 id 則回傳 None。"""
+        hit = self._index.get(str(bid))
+        if hit is None:
+            return None
+        self._flush()
+        with self.path.open("rb") as f:
+            f.seek(hit[1])
+            return json.loads(f.readline()).get("record")
+
+    def iter_records(self, ids: Iterable[str]) -> Iterable[Dict]:
+        """依 ids 順序逐筆讀出快取記錄（只開一次檔）；沒有的 id 直接略過。"""
+        self._flush()
+        if not self.path.exists():
+            return
+        with self.path.open("rb") as f:
+            for bid in ids:
+                hit = self._index.get(str(bid))
+                if hit is None:
+                    continue
+                f.seek(hit[1])
+                rec = json.loads(f.readline()).get("record")
+                if rec is not None:
+                    yield rec
+
+    # ------------------------------
+    # 寫入
+    # ------------------------------
+    def put_many(self, entries: Iterable[Tuple[str, Optional[Dict]]]) -> None:
+        """一次寫入一批 (bgg_id, record) 並 fsync，確保這批進度不會因為當掉而遺失。"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._fh is None:
+            self._fh = self.path.open("ab")
+            if self._fh.tell() > 0 and self._last_byte() != b"\n":
+                # 上次寫到一半就當掉：先補換行，別讓新資料黏在壞掉的那行後面
+                self._fh.write(b"\n")
+        now = time.time()
+        for bid, rec in entries:
+            line = json.dumps(
+                {"bgg_id": str(bid), "fetched_at": now, "record": rec}, ensure_ascii=False
+            ).encode("utf-8") + b"\n"
+            offset = self._fh.tell()
+            self._fh.write(line)
+            self._index[str(bid)] = (now, offset)
+            self._lines += 1
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def _last_byte(self) -> bytes:
+        with self.path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1)
+
+    def _flush(self) -> None:
+        if self._fh is not None:
+            self._fh.flush()
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def compact(self, min_garbage: float = 0.3) -> bool:
+        """舊行（被覆蓋的）比例超過 min_garbage 才改寫；回傳是否有改寫。"""
+        if self._lines == 0 or (self._lines - len(self._index)) / self._lines < min_garbage:
+            return False
+        self.close()
+        tmp = self.path.with_suffix(".tmp")
+        new_index: Dict[str, Tuple[float, int]] = {}
+        with self.path.open("rb") as src, tmp.open("wb") as dst:
+            for bid, (ts, offset) in self._index.items():
+                src.seek(offset)
+                line = src.readline()
+                new_index[bid] = (ts, dst.tell())
+                dst.write(line)
+            dst.flush()
+            os.fsync(dst.fileno())
+        tmp.replace(self.path)
+        self._index = new_index
+        self._lines = len(new_index)
+        return True
+
+    def __enter__(self) -> "RecordCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bgg_client.py — 呼叫 BGG XML API2 的共用 client（fetch_bgg / resolve_bgg / fetch_version_image 都走這裡）
+
+    client = bgg_client.shared()
+    r = client.get(bgg_client.THING_URL, {"id": "13,822", "stats": 1}, stats=stats)
+    r.content / r.text
+
+- headers：User-Agent（BGG_UA）、Accept、Referer；token 先看 BGG_TOKEN，沒有再讀 data/bgg_token.txt
+- 連線：一個 requests.Session，連線池最多 BGG_POOL_SIZE 條，同時抓的執行緒共用
+- 限速：shared() 是整個程序共用的 client，只有一個令牌桶（BGG_RATE 次/秒）
+  → 管線裡幾個階段同時打 BGG，加起來也不會超過；429 會讓它降速，連續成功再慢慢回升
+- 重試：連線錯誤、202／429／5xx（呼叫端可以再加，例如搜尋的 401／403）用 rate_limit.Backoff 退避，
+  每次最多 BGG_MAX_BACKOFF 秒，有 Retry-After 就照它，最多 BGG_RETRY 次；用完丟 BGGError。
+  其他非 200 的狀態碼不重試，直接丟 BGGHTTPError（帶 status）
+- 回應快取（data/cache/bgg_http/，內容定址）：
+    objects/<前 2 碼>/<sha256>   回應本體，以內容的 sha256 命名（一樣的內容只存一份）
+    index.jsonl                  請求 key → {status, sha256, url}（bgg_cache.RecordCache）
+  請求 key = sha256(GET + URL + 排序過的參數)；token 不算在 key 裡。只存 200 的回應
+- 模式（BGG_HTTP_MODE）：
+    live    （預設）只連網，不讀也不寫回應快取
+    cache   快取裡 BGG_HTTP_TTL_DAYS 天內的回應直接用，其餘連網並存起來
+    record  一律連網，每個成功的回應都存起來
+    replay  只用存下來的回應：完全不連網、不限速、不 sleep；沒錄到的請求丟 ReplayMiss
+  → BGG_HTTP_MODE=record python -m scripts --force all 錄一次，
+    之後 BGG_HTTP_MODE=replay python -m scripts --force all --profile 就能離線重跑整條管線來 profile／benchmark
+    （replay 時 download_images 只用倉庫裡已有的圖，不連網；搭配各腳本自己的快取 TTL 設 0 才會每批都重問）
+
+用法：
+    python scripts/bgg_client.py            # 回應快取的統計
+    python scripts/bgg_client.py gc         # 刪掉 index 已經沒有指到的本體
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pathlib
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bgg_cache import RecordCache
+from rate_limit import RETRY_STATUS, Backoff, FetchStats, TokenBucket
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+TOKEN_FILE = ROOT / "data" / "bgg_token.txt"
+CACHE_DIR = ROOT / "data" / "cache" / "bgg_http"
+
+# 注意：不要用 www.boardgamegeek.com，會影響授權
+THING_URL = os.getenv("BGG_THING_URL", "https://boardgamegeek.com/xmlapi2/thing")
+SEARCH_URL = os.getenv("BGG_SEARCH_URL", "https://boardgamegeek.com/xmlapi2/search")
+
+MODES = ("live", "cache", "record", "replay")
+MODE = os.getenv("BGG_HTTP_MODE", "live").strip().lower() or "live"
+HTTP_TTL_DAYS = float(os.getenv("BGG_HTTP_TTL_DAYS", "7"))
+RATE = float(os.getenv("BGG_RATE", "0.5"))
+BURST = int(os.getenv("BGG_BURST", "2"))
+POOL_SIZE = int(os.getenv("BGG_POOL_SIZE", "8"))
+RETRY = int(os.getenv("BGG_RETRY", "6"))
+BACKOFF_BASE = float(os.getenv("BGG_BACKOFF_BASE", "2"))
+MAX_BACKOFF = float(os.getenv("BGG_MAX_BACKOFF", "60"))
+TIMEOUT = 60
+
+UA = os.getenv("BGG_UA", "game-guide-site/ci (+https://github.com/TELIFUJ/game-guide-site)")
+
+
+class BGGError(RuntimeError):
+    """重試用完仍失敗（暫時性錯誤，呼叫端不應該把結果記進快取）。"""
+
+
+class BGGHTTPError(BGGError):
+    """不重試的 HTTP 狀態碼（404…）。"""
+
+    def __init__(self, status: int, url: str, body: str = ""):
+        super().__init__(f"HTTP {status} ← {url}" + (f"；回應前 200 字：{body!r}" if body else ""))
+        self.status = status
+
+
+class ReplayMiss(BGGError):
+    """replay 模式下，這個請求沒有錄到的回應。"""
+
+
+@dataclass
+class BGGResponse:
+    status: int
+    content: bytes
+    url: str
+    cached: bool = False
+    parsed: Any = field(default=None, repr=False)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+
+def load_token() -> Optional[str]:
+    token = os.getenv("BGG_TOKEN", "").strip()
+    if token:
+        print("[INFO] 使用環境變數 BGG_TOKEN 的 BGG Token")
+        return token
+    if TOKEN_FILE.exists():
+        token = TOKEN_FILE.read_text("utf-8").strip()
+        if token:
+            print("[INFO] 使用 data/bgg_token.txt 內的 BGG Token")
+            return token
+    print("[INFO] 沒有 BGG Token，改用匿名模式")
+    return None
+
+
+def request_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """回應快取的 key：同一個 URL＋參數（不管參數順序）就是同一個 key。"""
+    query = urlencode(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    return hashlib.sha256(f"GET {url}?{query}".encode("utf-8")).hexdigest()
+
+
+class ResponseStore:
+    """內容定址的回應快取：本體存在 objects/<sha256>，index.jsonl 記請求 key → 本體。多執行緒共用。"""
+
+    def __init__(self, root: pathlib.Path = CACHE_DIR):
+        self.root = root
+        self.objects = root / "objects"
+        self._index = RecordCache(root / "index.jsonl")
+        self._lock = threading.Lock()
+
+    def _object(self, sha: str) -> pathlib.Path:
+        return self.objects / sha[:2] / sha
+
+    def get(self, key: str, ttl_days: Optional[float] = None) -> Optional[Tuple[Dict, bytes]]:
+        """(index 記錄, 本體)；沒有、過期（有給 ttl_days 的話）或本體不見了回傳 None。"""
+        with self._lock:
+            if key not in self._index or (ttl_days is not None and not self._index.is_fresh(key, ttl_days)):
+                return None
+            meta = self._index.get(key)
+        if not meta:
+            return None
+        try:
+            return meta, self._object(meta["sha256"]).read_bytes()
+        except OSError:
+            return None
+
+    def put(self, key: str, url: str, status: int, body: bytes) -> str:
+        """存一個回應；本體已經有了（內容相同）就只寫 index。回傳本體的 sha256。"""
+        sha = hashlib.sha256(body).hexdigest()
+        path = self._object(sha)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{sha}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(body)
+            tmp.replace(path)
+        with self._lock:
+            self._index.put_many([(key, {"status": status, "sha256": sha, "url": url})])
+        return sha
+
+    def stats(self) -> Dict[str, int]:
+        files = [p for p in self.objects.glob("*/*") if not p.name.endswith(".tmp")]
+        return {"requests": len(self._index), "objects": len(files), "bytes": sum(p.stat().st_size for p in files)}
+
+    def gc(self) -> int:
+        """刪掉 index 已經沒有指到的本體（同一個請求重錄過、內容變了）；回傳刪掉幾個。"""
+        with self._lock:
+            self._index.compact(min_garbage=0.0)
+            keep = {rec["sha256"] for rec in self._index.iter_records(self._index.ids())}
+        removed = 0
+        for p in self.objects.glob("*/*"):
+            if p.name not in keep:
+                p.unlink()
+                removed += 1
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._index.close()
+
+
+class BGGClient:
+    """
+    BGG XML API2 的 client：共用 headers／token、連線池、令牌桶、退避重試與回應快取。
+    一般用 shared()（整個程序一個）；benchmark 可以自己建一個，指定 rate／backoff／mode。
+    """
+
+    def __init__(
+        self,
+        mode: str = MODE,
+        rate: float = RATE,
+        burst: int = BURST,
+        pool_size: int = POOL_SIZE,
+        retries: int = RETRY,
+        backoff: Optional[Backoff] = None,
+        cache_dir: pathlib.Path = CACHE_DIR,
+        ttl_days: float = HTTP_TTL_DAYS,
+        token: Optional[str] = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"BGG_HTTP_MODE 只能是 {'/'.join(MODES)}：{mode!r}")
+        self.mode = mode
+        self.retries = retries
+        self.backoff = backoff or Backoff(base=BACKOFF_BASE, cap=MAX_BACKOFF)
+        self.ttl_days = ttl_days
+        self.bucket = TokenBucket(rate, burst=burst)
+        self.store = ResponseStore(cache_dir) if mode != "live" else None
+        self.session: Optional[requests.Session] = None
+        if mode != "replay":
+            self.session = requests.Session()
+            self.session.headers.update({
+                "User-Agent": UA,
+                "Accept": "application/xml",
+                "Referer": "https://boardgamegeek.com/",
+            })
+            if token:
+                self.session.headers["Authorization"] = f"Bearer {token}"
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(1, pool_size))
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+
+    def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        stats: Optional[FetchStats] = None,
+        retry_status: Iterable[int] = RETRY_STATUS,
+        parse: Optional[Callable[[bytes], Any]] = None,
+    ) -> BGGResponse:
+        """
+        GET url；回傳 200 的回應。parse 是回應本體的解析函式：
+        丟例外就當作壞掉的回應（退避後重試），成功的結果放在 r.parsed。
+        """
+        stats = stats or FetchStats()
+        key = request_key(url, params)
+        if self.mode in ("cache", "replay"):
+            hit = self.store.get(key, self.ttl_days if self.mode == "cache" else None)
+            if hit is not None:
+                meta, body = hit
+                stats.add(cached=1, bytes=len(body))
+                return BGGResponse(meta["status"], body, url, cached=True, parsed=parse(body) if parse else None)
+            if self.mode == "replay":
+                stats.add(failed=1)
+                raise ReplayMiss(f"沒有錄到這個請求：{url} {params}")
+
+        retry_status = tuple(retry_status)
+        for attempt in range(1, self.retries + 1):
+            stats.add(wait_sec=self.bucket.acquire())
+            stats.add(requests=1)
+            try:
+                r = self.session.get(url, params=params, timeout=TIMEOUT)
+            except requests.RequestException as e:
+                print(f"    [WARN] 連線失敗（第 {attempt}/{self.retries} 次）：{e}")
+                stats.add(sleep_sec=_sleep(self.backoff.delay(attempt)))
+                continue
+
+            if r.status_code in retry_status:
+                stats.retry(r.status_code)
+                if r.status_code == 429:
+                    self.bucket.penalize()
+                delay = self.backoff.delay(attempt, r.headers.get("Retry-After"))
+                print(f"    [INFO] HTTP {r.status_code}（第 {attempt}/{self.retries} 次），{delay:.1f}s 後重試...")
+                stats.add(sleep_sec=_sleep(delay))
+                continue
+
+            if r.status_code != 200:
+                stats.add(failed=1)
+                raise BGGHTTPError(r.status_code, r.url, r.text[:200].replace("\n", " "))
+
+            parsed = None
+            if parse is not None:
+                try:
+                    parsed = parse(r.content)
+                except Exception as e:
+                    print(f"    [WARN] 回應解析失敗（第 {attempt}/{self.retries} 次）：{e}")
+                    stats.add(sleep_sec=_sleep(self.backoff.delay(attempt)))
+                    continue
+
+            self.bucket.reward()
+            stats.add(ok=1, bytes=len(r.content))
+            if self.store is not None:
+                self.store.put(key, url, r.status_code, r.content)
+            return BGGResponse(r.status_code, r.content, url, parsed=parsed)
+
+        stats.add(failed=1)
+        raise BGGError(f"重試 {self.retries} 次仍失敗：{url}")
+
+    def close(self) -> None:
+        if self.session is not None:
+            self.session.close()
+        if self.store is not None:
+            self.store.close()
+
+    def __enter__(self) -> "BGGClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _sleep(sec: float) -> float:
+    time.sleep(sec)
+    return sec
+
+
+_shared: Optional[BGGClient] = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> BGGClient:
+    """整個程序共用的 client（第一次呼叫時建立；設定都來自環境變數）。"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = BGGClient(token=None if MODE == "replay" else load_token())
+            if MODE != "live":
+                print(f"[INFO] BGG_HTTP_MODE={MODE}，回應快取 → {CACHE_DIR}")
+        return _shared
+
+
+def main() -> None:
+    store = ResponseStore()
+    try:
+        if sys.argv[1:2] == ["gc"]:
+            print(f"[OK] 刪掉 {store.gc()} 個沒用到的回應本體")
+        st = store.stats()
+        print(f"{CACHE_DIR}：{st['requests']} 個請求，{st['objects']} 個本體，{st['bytes'] / 2**20:.1f} MB")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+build_image_variants.py — 把 site/assets/img 的原圖做成多尺寸、多格式的衍生圖（給前端 srcset）
+
+流程：
+1) 讀 bgg_data 記錄（本機目錄 catalog.py，跟其他單獨跑的步驟同一份），用跟 download_images.py 一樣的規則算出邏輯檔名，
+   再透過 image_store 的 manifest 找到 o/ 底下的實體原圖（還沒收編的舊檔也認得）
+2) 以原圖內容的 sha256 當 key（manifest.json 有就直接用，沒有才自己算）
+3) 每張原圖輸出 WIDTHS 各寬度 × FORMATS 各格式 → site/assets/img/v/{hash16}-{寬}.{ext}
+   - 不放大：比原圖寬的尺寸略過（原圖比最小尺寸還小時，只輸出原寬）
+   - AVIF 需要 Pillow 有 avif 支援，沒有就自動略過
+4) 所有衍生檔都在的 hash 直接跳過 → 增量；上游換圖 = hash 變了 = 只重做那一張
+5) 結果寫到 data/image_variants.json，build_json.py 會把 srcset 併進 games.json
+
+需要 Pillow（pip install pillow）。
+環境變數：
+    IMG_VARIANT_WORKERS (default: CPU 數)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow 是選用依賴，只有這個步驟需要
+    Image = None
+    features = None
+
+from catalog import Catalog
+from common_image import VARIANT_INDEX, image_filename, normalize_bgg_image_url
+from image_store import ImageStore, sha256_file
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT / "site" / "assets" / "img"
+OUT_DIR = SRC_DIR / "v"
+INDEX = VARIANT_INDEX
+
+WIDTHS = (160, 320, 640)
+# 格式 → (副檔名, Pillow save 參數)；srcset 會依這個順序給 <picture> 的 <source>
+FORMATS = {
+    "avif": ("avif", {"quality": 50, "speed": 8}),
+    "webp": ("webp", {"quality": 75, "method": 4}),
+    "jpeg": ("jpg", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+WORKERS = int(os.getenv("IMG_VARIANT_WORKERS", str(os.cpu_count() or 1)))
+
+
+def available_formats() -> List[str]:
+    fmts = []
+    for fmt in FORMATS:
+        if fmt == "avif" and not features.check("avif"):
+            continue
+        if fmt == "webp" and not features.check("webp"):
+            continue
+        fmts.append(fmt)
+    return fmts
+
+
+def target_widths(src_width: int) -> List[int]:
+    widths = [w for w in WIDTHS if w <= src_width]
+    return widths or [src_width]
+
+
+def variant_name(key: str, width: int, fmt: str) -> str:
+    return f"{key}-{width}.{FORMATS[fmt][0]}"
+
+
+def plan_sources(rows: List[Dict], store: ImageStore) -> Dict[str, Tuple[str, pathlib.Path]]:
+    """回傳 {bgg_id: (邏輯檔名, 本機原圖路徑)}（只收已下載的）。"""
+    out: Dict[str, Tuple[str, pathlib.Path]] = {}
+    for r in rows:
+        bid = r.get("bgg_id")
+        url = normalize_bgg_image_url(r.get("image_url") or r.get("image") or r.get("thumbnail"))
+        if not bid or not url:
+            continue
+        fname = image_filename(bid, url)
+        path = store.path_of(fname) or store.root / fname
+        if path.exists():
+            out[str(bid)] = (fname, path)
+    return out
+
+
+def render_variants(src: str, key: str, out_dir: str, fmts: List[str]) -> Tuple[str, Dict]:
+    """（在子程序執行）產生單張原圖的所有衍生圖，回傳 (key, index entry)。"""
+    out = pathlib.Path(out_dir)
+    with Image.open(src) as im:
+        im.load()
+        w, h = im.size
+        has_alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+        base = im.convert("RGBA" if has_alpha else "RGB")
+
+    srcset: Dict[str, List[Tuple[int, str]]] = {fmt: [] for fmt in fmts}
+    for width in target_widths(w):
+        height = max(1, round(h * width / w))
+        resized = base if width == w else base.resize((width, height), Image.LANCZOS)
+        for fmt in fmts:
+            name = variant_name(key, width, fmt)
+            dst = out / name
+            if not dst.exists():
+                img = resized.convert("RGB") if fmt == "jpeg" and has_alpha else resized
+                tmp = dst.with_name(dst.name + ".part")
+                img.save(tmp, format=fmt.upper(), **FORMATS[fmt][1])
+                os.replace(tmp, dst)
+            srcset[fmt].append((width, name))
+
+    return key, {"w": w, "h": h, "files": {fmt: [[wd, n] for wd, n in lst] for fmt, lst in srcset.items()}}
+
+
+def entry_complete(entry: Optional[Dict], out_dir: pathlib.Path, fmts: List[str]) -> bool:
+    if not entry:
+        return False
+    files = entry.get("files", {})
+    if any(fmt not in files for fmt in fmts):
+        return False
+    return all((out_dir / name).exists() for fmt in fmts for _, name in files[fmt])
+
+
+def load_index(path: pathlib.Path = INDEX) -> Dict:
+    if path.exists():
+        try:
+            return json.loads(path.read_text("utf-8"))
+        except ValueError:
+            pass
+    return {"version": 1, "sources": {}, "games": {}}
+
+
+def build_variants(
+    rows: List[Dict],
+    src_dir: pathlib.Path = SRC_DIR,
+    out_dir: pathlib.Path = OUT_DIR,
+    index_path: pathlib.Path = INDEX,
+    workers: int = WORKERS,
+) -> Dict[str, int]:
+    if Image is None:
+        raise SystemExit("[ERR] build_image_variants 需要 Pillow：pip install pillow")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fmts = available_formats()
+    index = load_index(index_path)
+    store = ImageStore(src_dir)
+    sources = plan_sources(rows, store)
+
+    games: Dict[str, str] = {}
+    todo: Dict[str, str] = {}
+    for bid, (fname, path) in sources.items():
+        sha = (store.get(fname) or {}).get("sha256") or sha256_file(path)
+        key = sha[:16]
+        games[bid] = key
+        if key not in todo and not entry_complete(index["sources"].get(key), out_dir, fmts):
+            todo[key] = str(path)
+
+    stats = {"sources": len(set(games.values())), "built": 0, "failed": 0, "reused": 0}
+    stats["reused"] = stats["sources"] - len(todo)
+    if todo:
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+            futs = {pool.submit(render_variants, src, key, str(out_dir), fmts): key for key, src in todo.items()}
+            for fut, key in futs.items():
+                try:
+                    _, entry = fut.result()
+                except Exception as e:
+                    print(f"[ERR] 無法處理 {todo[key]}：{e}")
+                    stats["failed"] += 1
+                    continue
+                index["sources"][key] = entry
+                stats["built"] += 1
+
+    index["games"] = {bid: key for bid, key in games.items() if key in index["sources"]}
+    tmp = index_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(index, ensure_ascii=False, separators=(",", ":")), "utf-8")
+    tmp.replace(index_path)
+    return stats
+
+
+def main():
+    with Catalog() as catalog:
+        rows = catalog.rows()
+    if not rows:
+        raise SystemExit("[ERR] 沒有 bgg_data（目錄跟 data/bgg_data.json 都沒有）")
+
+    t0 = time.monotonic()
+    st = build_variants(rows)
+    print(
+        f"build_image_variants: 原圖 {st['sources']} 張，新產生 {st['built']}，沿用 {st['reused']}，"
+        f"失敗 {st['failed']}；{time.monotonic() - t0:.1f}s → {OUT_DIR}"
+    )
+    print(f"→ 索引：{INDEX}")
+
+
+if __name__ == "__main__":
+    main()
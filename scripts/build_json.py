@@ -1,147 +1,231 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-從 data/bgg_data.json 產生：
+從 bgg_data 記錄（本機目錄 catalog.py；目錄裡沒有或檔案比較新時讀 data/bgg_data.json）
+產生 data/games_full.json（完整欄位，方便檢查）。單獨跑各步驟時這裡是最後一步：
+前面各步驟只改了目錄，data/bgg_data.json 也在這裡一起匯出（有改動才寫）。
+網站讀的 site/data/games.json 由 publish_games.py 從這個檔轉成精簡格式（site_payload.py）。
 
-1) data/games_full.json  ─ 完整欄位，方便檢查
-2) site/data/games.json   ─ 網站實際讀取用（欄位同上，只是壓縮格式）
-
-會輸出的重點欄位（前端現在都會吃）：
+會輸出的重點欄位：
 - id, name, year
 - minplayers, maxplayers, minplaytime, maxplaytime
 - rating, rating_avg, rating_bayes, usersrated, users_rated
 - weight, weight_avg, mechanism_count
 - image, thumbnail, image_override, image_version_id
+- image_variants（有跑 build_image_variants.py 才有：本機縮圖的 src / srcset）
 - categories, mechanisms
 - bgg_id, bgg_url, source
 - name_zh, name_en, alias_zh, description
 - price_msrp_twd, price_twd, used_price_twd, price_note, used_note
+- price_rule（價格規則補上的欄位 → 哪一條規則，見 price_rules.py）、category_zh
 - manual_override, stock
+
+增量重建（build_incremental；管線裡 build_records 在 build_json 階段先算好記錄，
+套衍生圖、寫檔在 attach_image_variants 階段，build_json 不必等圖片）：
+- 狀態都在目錄的 built 表：每款遊戲的 games_full 記錄、指紋、輸出順序，以及它在上次輸出檔裡的 byte 範圍
+- 指紋算的是輸入：bgg_data 記錄（manual.csv 的覆寫、價格規則都已經套在裡面）＋要套的衍生圖；
+  程式碼（SALT_MODULES）改過就全部作廢。在轉換之前就比對，沒變的遊戲不會跑 _compat
+- 指紋沒變、輸出檔也沒被別的程式動過（大小＋mtime 跟目錄記的一樣）→ 直接從舊檔切出原本那段 JSON
+  → 只改一個價格時只重算、只重新序列化那一款
+- 沒有任何遊戲變動、順序一樣、輸出檔也沒被別的程式動過 → 完全不寫檔
+- 寫完輸出檔才在一個 transaction 裡更新 built（只寫有變的列、只改位置有變的列、刪掉這次沒有的列）
+  並記下輸出檔的大小＋mtime；publish_games 看到輸出檔沒被動過，就直接串流讀 built
 """
 
 from __future__ import annotations
-import json
 import pathlib
-from typing import Any, Dict
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from catalog import Catalog
+from common_image import load_image_variants
+from fingerprint import Delta, code_salt, record_digest
+from game_record import Game, make_id
+from json_stream import JsonArrayWriter, encode
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "data"
-SITE_DATA_DIR = ROOT / "site" / "data"
 
 BGG_JSON = DATA_DIR / "bgg_data.json"
 OUT_FULL = DATA_DIR / "games_full.json"
-OUT_SITE = SITE_DATA_DIR / "games.json"
 
-
-def _make_id(rec: Dict[str, Any]) -> str:
-    """以名稱 + bgg_id 產生穩定 id。"""
-    bgg_id = str(rec.get("bgg_id") or "").strip()
-    base = (rec.get("name") or rec.get("name_en") or rec.get("name_zh") or "").strip()
-    slug = base.replace(" ", "_").replace("/", "-")
-    if bgg_id:
-        return f"{slug}-{bgg_id}" if slug else bgg_id
-    return slug or bgg_id or "unknown"
+# 這些模組改了，舊的 built 記錄、輸出檔片段都不能用（games_full 的形狀在 game_record.Game.to_full）
+SALT_MODULES = ("build_json", "game_record", "json_stream")
 
 
 def _compat(rec: Dict[str, Any]) -> Dict[str, Any]:
-    """統一欄位名稱＋補齊需要的欄位。"""
-    r = dict(rec)
-
-    # 舊欄位名稱兼容
-    r.setdefault("min_players", r.get("minplayers"))
-    r.setdefault("max_players", r.get("maxplayers"))
-    r.setdefault("min_playtime", r.get("minplaytime"))
-    r.setdefault("max_playtime", r.get("maxplaytime"))
-    r.setdefault("users_rated", r.get("usersrated"))
-    r.setdefault("weight", r.get("weight_avg"))
-
-    categories = r.get("categories") or []
-    mechanisms = r.get("mechanisms") or r.get("mechanics") or []
-
-    # 基本欄位
-    out: Dict[str, Any] = {
-        "id": _make_id(r),
-        "name": r.get("name") or r.get("name_en") or r.get("name_zh") or "",
-        "year": r.get("year"),
-        "minplayers": r.get("min_players"),
-        "maxplayers": r.get("max_players"),
-        "minplaytime": r.get("min_playtime"),
-        "maxplaytime": r.get("max_playtime"),
-        "weight": r.get("weight"),
-        "weight_avg": r.get("weight"),
-        "rating_avg": r.get("rating_avg") or r.get("rating"),
-        "rating": r.get("rating_avg") or r.get("rating"),
-        "rating_bayes": r.get("rating_bayes"),
-        "users_rated": r.get("users_rated"),
-        "usersrated": r.get("users_rated"),
-        "image": r.get("image"),
-        "thumbnail": r.get("thumbnail"),
-        "categories": categories,
-        "mechanisms": mechanisms,
-        "mechanism_count": r.get("mechanism_count") or len(mechanisms),
-        "source": r.get("source") or "bgg",
-        "bgg_id": r.get("bgg_id"),
-    }
-
-    # BGG 連結
-    bgg_id = r.get("bgg_id")
-    bgg_url = r.get("bgg_url")
-    if not bgg_url and bgg_id:
-        bgg_url = f"https://boardgamegeek.com/boardgame/{bgg_id}"
-    if bgg_url:
-        out["bgg_url"] = bgg_url
-
-    # 覆寫＋說明類欄位
-    for key in [
-        "name_zh",
-        "name_en",
-        "alias_zh",
-        "description",
-        "price_msrp_twd",
-        "price_twd",
-        "used_price_twd",
-        "price_note",
-        "used_note",
-        "manual_override",
-        "stock",
-        "image_override",
-        "image_version_id",
-    ]:
-        if key in r and r[key] not in (None, ""):
-            out[key] = r[key]
-
-    # 搜尋用關鍵字（如果有的話也保留）
-    if "search_keywords" in r and isinstance(r["search_keywords"], list):
-        out["search_keywords"] = r["search_keywords"]
-
-    return out
+    """bgg_data 記錄 → games_full 記錄（欄位對應、補齊規則見 game_record.Game.to_full）。"""
+    return Game.adopt(rec).to_full()  # to_full 只讀 rec、回傳新的 dict，不必先複製
+
+
+def _attach_variants(g: Dict[str, Any], v: Optional[Dict]) -> bool:
+    """本機衍生圖（srcset）：有 image_override 的遊戲尊重 override，不套用。"""
+    if v and not g.get("image_override"):
+        g["image_variants"] = v
+        return True
+    return False
+
+
+def build_records(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """bgg_data 記錄 → games_full 記錄（還沒套本機衍生圖，見 build_incremental）。"""
+    return [_compat(r) for r in rows]
+
+
+def build_games(rows: List[Dict[str, Any]], variants: Optional[Dict[str, Dict]] = None) -> Tuple[List[Dict], int]:
+    """bgg_data 記錄 → 網站用記錄（全部重算）；回傳 (games, 套用本機 srcset 的筆數)。"""
+    games = build_records(rows)
+    variants = load_image_variants() if variants is None else variants
+    attached = 0
+    for g in games:
+        attached += _attach_variants(g, variants.get(str(g.get("bgg_id") or "")))
+    return games, attached
+
+
+@dataclass
+class BuildResult:
+    rows: int
+    delta: Delta
+    reordered: bool
+    wrote: bool
+    attached: int
+    games: Optional[List[Dict[str, Any]]]  # 套好衍生圖、跟輸出檔內容相同的記錄（有給 records 才有）
+
+
+def build_incremental(
+    rows: List[Dict[str, Any]],
+    variants: Optional[Dict[str, Dict]] = None,
+    outputs: Tuple[Tuple[pathlib.Path, Optional[int]], ...] = ((OUT_FULL, 2),),
+    catalog: Optional[Catalog] = None,
+    records: Optional[List[Dict[str, Any]]] = None,
+) -> BuildResult:
+    """
+    bgg_data 記錄 → outputs（(路徑, indent) 清單），跟 build_games + json.dump 逐字相同，
+    但只有輸入有變的遊戲才轉換、重新序列化（規則見模組說明）。
+    records：build_records(rows) 已經算好的結果（管線的 build_json 階段）→ 直接拿來用，
+    套好衍生圖後放在 BuildResult.games（records 本身不會被改）；沒給就只轉換有變的遊戲，games 是 None。
+    沒給 catalog 就開預設的目錄。
+    """
+    if catalog is None:
+        with Catalog() as catalog:
+            return build_incremental(rows, variants, outputs, catalog, records)
+
+    salt = code_salt(*SALT_MODULES)
+    recompute = catalog.get_meta("built_salt") != salt  # 程式改過 → 舊的記錄、輸出檔片段都不能用
+    variants = load_image_variants() if variants is None else variants
+    old = catalog.built_state()
+
+    # 目錄記下、之後沒被動過的輸出檔 → 可以切片重用；有一份不能切，沒變的遊戲也得重新序列化
+    reuse: Dict[str, bytes] = {}
+    if not recompute:
+        for path, _ in outputs:
+            if catalog.output_current(path):
+                reuse[path.name] = path.read_bytes()
+    games: Optional[List[Dict[str, Any]]] = None if records is None else []
+    need_all = games is not None or len(reuse) < len(outputs)
+
+    # (key, bgg_id, 指紋, 上次的狀態（要重算就是 None）, 要重新序列化的記錄)
+    plan: List[Tuple[str, Any, str, Optional[Tuple[str, int, Dict]], Optional[Dict[str, Any]]]] = []
+    seen = set()
+    delta = Delta()
+    attached = 0
+    moved = False
+    for pos, r in enumerate(rows):
+        view = Game.adopt(r)
+        bgg_id = view.get("bgg_id")
+        bid = str(bgg_id or "")
+        key = bid.strip() or make_id(view)
+        while key in seen:  # 同一個 bgg_id 出現兩次（理論上不會）
+            key += "+"
+        seen.add(key)
+        v = variants.get(bid)
+        if not v or view.get("image_override"):
+            v = None
+        fp = record_digest(r, v)
+        prev = old.pop(key, None)
+        if prev is None:
+            delta.added += 1
+        elif recompute or prev[0] != fp:
+            delta.changed += 1
+            prev = None
+        else:
+            delta.unchanged += 1
+            moved |= prev[1] != pos
+        g = None
+        if prev is None or need_all:
+            g = _compat(r) if records is None else records[pos]
+            if v:
+                g = dict(g)
+                _attach_variants(g, v)
+            if games is not None:
+                games.append(g)
+        attached += v is not None
+        plan.append((key, bgg_id, fp, prev, g))
+    removed = list(old)
+    delta.removed = len(removed)
+
+    if not delta and not moved and all(p.name in reuse for p, _ in outputs):
+        return BuildResult(len(plan), delta, moved, False, attached, games)
+
+    spans: List[Dict[str, List[int]]] = [{} for _ in plan]
+    writers = [JsonArrayWriter(path, indent=indent) for path, indent in outputs]
+    for w in writers:
+        w.__enter__()
+    try:
+        for (key, bgg_id, fp, prev, g), sp in zip(plan, spans):
+            for w in writers:
+                name = w.path.name
+                span = prev[2].get(name) if prev else None
+                old_bytes = reuse.get(name)
+                if span and old_bytes is not None:
+                    frag = old_bytes[span[0]:span[1]]
+                else:
+                    frag = w.fragment(encode(g, w.indent))
+                sp[name] = list(w.write_fragment(frag))
+    except BaseException as e:
+        for w in writers:
+            w.__exit__(type(e), e, None)
+        raise
+    for w in writers:
+        w.__exit__(None, None, None)
+
+    # 輸出檔已經換好才更新 built；這中間當掉的話，輸出檔跟目錄記的對不上 → 下次全部重新序列化、publish_games 讀檔
+    changed, relocated = [], []
+    for pos, ((key, bgg_id, fp, prev, g), sp) in enumerate(zip(plan, spans)):
+        if prev is None:
+            changed.append((key, bgg_id, pos, fp, g, sp))
+        elif prev[1] != pos or prev[2] != sp:
+            relocated.append((pos, sp, key))
+    with catalog.transaction():
+        catalog.update_built(changed, relocated, removed)
+        catalog.set_meta("built_salt", salt)
+        for path, _ in outputs:
+            catalog.mark_output(path)
+    if changed or relocated or removed:
+        print(f"[INFO] 目錄 built：寫入 {len(changed)}、換位置 {len(relocated)}、刪除 {len(removed)} 列")
+    return BuildResult(len(plan), delta, moved, True, attached, games)
 
 
 def main() -> None:
-    if not BGG_JSON.exists():
-        raise SystemExit(f"[ERROR] 找不到 {BGG_JSON}")
-
-    SITE_DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    with BGG_JSON.open("r", encoding="utf-8") as f:
-        rows = json.load(f)
-
-    if not isinstance(rows, list):
-        raise SystemExit("[ERROR] bgg_data.json 內容不是 list")
-
-    games = [_compat(r) for r in rows]
-
-    # 完整版（含縮排）
-    with OUT_FULL.open("w", encoding="utf-8") as f:
-        json.dump(games, f, ensure_ascii=False, indent=2)
-
-    # 網站用版本（壓縮）
-    with OUT_SITE.open("w", encoding="utf-8") as f:
-        json.dump(games, f, ensure_ascii=False, separators=(",", ":"))
-
-    print(f"games_full.json rows={len(games)} → {OUT_FULL}")
-    print(f"site/data/games.json rows={len(games)} → {OUT_SITE}")
-
+    variants = load_image_variants()
+    t0 = time.monotonic()
+    with Catalog() as catalog:
+        rows = catalog.rows(BGG_JSON)
+        if not rows:
+            raise SystemExit(f"[ERROR] 沒有 bgg_data（目錄跟 {BGG_JSON} 都沒有）")
+        b = build_incremental(rows, variants, catalog=catalog)
+        exported = catalog.export_rows(BGG_JSON)
+    print(f"[INFO] build_json: {b.delta.summary()}" + ("（順序有變）" if b.reordered else ""))
+    if exported is not None:
+        print(f"bgg_data.json rows={exported} → {BGG_JSON}")
+
+    if b.wrote:
+        print(f"games_full.json rows={b.rows} → {OUT_FULL}")
+    else:
+        print("[INFO] 沒有任何遊戲變動，輸出檔維持原樣")
+    if variants:
+        print(f"image_variants: {b.attached} 款套用本機 srcset")
+    print(f"[STAT] build_json {time.monotonic() - t0:.3f}s")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+catalog.py — 本機 SQLite 目錄（data/cache/catalog.sqlite3，不進版控）
+
+以前每一步都是「整個 JSON 檔讀進來 → 改 → 整個寫回去」。單獨跑各個 scripts 時，目錄才是資料本身：
+各階段從這裡讀、只改自己碰到的那幾列（包在一個 transaction 裡，中途當掉不會留下改一半的狀態），
+data/*.json 由 build_json 在最後各匯出一次：
+
+    bgg_records  BGG 抓回來的原始記錄（fetch_bgg）          bgg_id → record（JSON；NULL = BGG 查無此 id）
+    fetch_meta   抓取紀錄（fetch_bgg 的 TTL 看這裡）        bgg_id → fetched_at、status（ok / missing）
+    overrides    manual.csv 的覆寫列                         bgg_id → fields（CSV 那一列）
+                 （apply_taxonomy_and_price 同步：只寫有變的列、刪掉 CSV 已經沒有的，再從這裡讀出來套用）
+    bgg_data     data/bgg_data.json 的每一筆               position → bgg_id、record
+                 （fetch_bgg 重設 → apply_taxonomy_and_price → fetch_version_image → normalize_bgg_data 各自更新）
+    built        games_full.json 的每一筆（build_json）     key → bgg_id、position（輸出順序）、fp（指紋）、
+                                                           spans（在輸出檔裡的 byte 範圍，增量重建切片用）、record
+                 （merge_bgg_into_full 也直接改這裡的 record，再匯出 games_full.json）
+    meta         其他狀態（輸出檔的大小＋mtime、bgg_data 是否還沒匯出…）
+
+- 記錄一律存成緊湊 JSON 文字，欄位順序跟原本一樣，匯出時逐字還原
+- 寫入用 upsert，內容沒變的列不會被改寫（sha 一樣就略過）
+- 匯出 = 一個 SELECT … ORDER BY position，邊讀邊寫（JsonArrayWriter），不用整份放記憶體；
+  publish_games 在 built 跟 games_full.json 一致時直接串流讀 built
+- data/*.json 仍然是正式的輸出（進版控、給其他工具看）。目錄壞了或刪掉：bgg_data 從 data/bgg_data.json 匯入、
+  built 由下一次 build_json 重建；data/bgg_data.json 被別的程式改過（手動編輯、git pull）也會重新匯入
+- 跑整條管線（pipeline.py）時記錄在階段之間直接以 Python 物件傳遞，bgg_data.json 是 normalize 階段的產出檔；
+  之後單獨跑的 script 看到檔案換了，就會從檔案重新匯入
+
+用法：
+    python scripts/catalog.py                 # 各表筆數
+    python scripts/catalog.py export          # 匯出還沒寫出的 data/bgg_data.json，以及 built → data/games_full.json
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import pathlib
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from json_stream import JsonArrayWriter
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+DB_PATH = ROOT / "data" / "cache" / "catalog.sqlite3"
+BGG_DATA = ROOT / "data" / "bgg_data.json"
+GAMES_FULL = ROOT / "data" / "games_full.json"
+
+SCHEMA_VERSION = 3
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bgg_records (
+    bgg_id TEXT PRIMARY KEY,
+    record TEXT,
+    sha TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fetch_meta (
+    bgg_id TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS overrides (
+    bgg_id TEXT PRIMARY KEY,
+    fields TEXT NOT NULL,
+    sha TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bgg_data (
+    position INTEGER PRIMARY KEY,
+    bgg_id TEXT,
+    record TEXT NOT NULL,
+    sha TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS built (
+    key TEXT PRIMARY KEY,
+    bgg_id TEXT,
+    position INTEGER NOT NULL,
+    fp TEXT NOT NULL,
+    spans TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS built_position ON built(position);
+CREATE INDEX IF NOT EXISTS built_bgg_id ON built(bgg_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+TABLES = ("bgg_records", "fetch_meta", "overrides", "bgg_data", "built")
+# v1 → v3：built 多了 spans 欄。built 是衍生資料，砍掉讓下一次 build_json 重建（overrides 表照舊保留）
+# v2 → v3：v2 曾經拿掉 overrides 表，SCHEMA 的 CREATE IF NOT EXISTS 會補回來，下次 apply_taxonomy_and_price 重新同步
+MIGRATE_V1 = """
+DROP TABLE IF EXISTS built;
+DELETE FROM meta WHERE key LIKE 'output:%' OR key = 'built_salt';
+"""
+DIRTY_KEY = "bgg_data_dirty"  # bgg_data 表有改動、還沒匯出成 data/bgg_data.json
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _sha(text: Optional[str]) -> str:
+    return hashlib.blake2b((text or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _stamp(path: pathlib.Path) -> str:
+    st = path.stat()
+    return json.dumps([st.st_size, st.st_mtime_ns])
+
+
+class Catalog:
+    def __init__(self, path: pathlib.Path = DB_PATH):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None：自己下 BEGIN / COMMIT；timeout：管線平行跑時等別的階段寫完
+        self.conn = sqlite3.connect(str(path), timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, 1, 2, SCHEMA_VERSION):
+            raise SystemExit(f"[ERR] {path} 的版本是 {version}（預期 {SCHEMA_VERSION}）；刪掉它重跑即可重建")
+        if version == 1:
+            self.conn.executescript(MIGRATE_V1)
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._depth = 0
+
+    # ------------------------------
+    # transaction
+    # ------------------------------
+    @contextmanager
+    def transaction(self) -> Iterator["Catalog"]:
+        """BEGIN IMMEDIATE … COMMIT；例外就 ROLLBACK。巢狀使用時只有最外層真的開／關 transaction。"""
+        if self._depth:
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._depth = 1
+        try:
+            yield self
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        else:
+            self.conn.execute("COMMIT")
+        finally:
+            self._depth = 0
+
+    def _upsert(self, table: str, column: str, rows: Iterable[Tuple[str, Any]]) -> int:
+        """(bgg_id, 值) → 寫入；內容（sha）沒變的列不動。回傳實際寫入幾列。"""
+        sql = (
+            f"INSERT INTO {table}(bgg_id, {column}, sha) VALUES (?, ?, ?) "
+            f"ON CONFLICT(bgg_id) DO UPDATE SET {column} = excluded.{column}, sha = excluded.sha "
+            f"WHERE {table}.sha != excluded.sha"
+        )
+        before = self.conn.total_changes
+        params = []
+        for bid, value in rows:
+            text = None if value is None else _dumps(value)
+            params.append((str(bid), text, _sha(text)))
+        with self.transaction():
+            self.conn.executemany(sql, params)
+        return self.conn.total_changes - before
+
+    def counts(self) -> Dict[str, int]:
+        return {t: self.conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in TABLES}
+
+    # ------------------------------
+    # bgg_records / fetch_meta
+    # ------------------------------
+    def put_fetched(self, entries: Iterable[Tuple[str, Optional[Dict]]], fetched_at: Optional[float] = None) -> int:
+        """一批抓取結果 (bgg_id, record | None) → bgg_records + fetch_meta（同一個 transaction）。"""
+        entries = [(str(bid), rec) for bid, rec in entries]
+        now = time.time() if fetched_at is None else fetched_at
+        with self.transaction():
+            changed = self._upsert("bgg_records", "record", entries)
+            self.conn.executemany(
+                "INSERT INTO fetch_meta(bgg_id, fetched_at, status) VALUES (?, ?, ?) "
+                "ON CONFLICT(bgg_id) DO UPDATE SET fetched_at = excluded.fetched_at, status = excluded.status",
+                [(bid, now, "missing" if rec is None else "ok") for bid, rec in entries],
+            )
+        return changed
+
+    def stale_ids(self, ids: Iterable[str], ttl_days: float) -> List[str]:
+        """ids 裡需要（重新）抓的：沒抓過，或上次抓已經超過 ttl_days 天。"""
+        cutoff = time.time() - ttl_days * 86400
+        fresh = {bid for (bid,) in self.conn.execute("SELECT bgg_id FROM fetch_meta WHERE fetched_at > ?", (cutoff,))}
+        return [str(i) for i in ids if str(i) not in fresh]
+
+    def get_record(self, bid: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT record FROM bgg_records WHERE bgg_id = ?", (str(bid),)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def iter_records(self, ids: Iterable[str]) -> Iterator[Dict]:
+        """依 ids 順序逐筆讀出 BGG 記錄；沒有的、查無此 id 的略過。"""
+        cur = self.conn.cursor()
+        for bid in ids:
+            row = cur.execute("SELECT record FROM bgg_records WHERE bgg_id = ?", (str(bid),)).fetchone()
+            if row and row[0] is not None:
+                yield json.loads(row[0])
+
+    # ------------------------------
+    # overrides
+    # ------------------------------
+    def sync_overrides(self, overrides: Dict[str, Dict[str, Any]]) -> Tuple[int, int]:
+        """manual.csv 的 {bgg_id: 列} → overrides 表（只寫有變的、刪掉 CSV 已經沒有的）；回傳 (寫入, 刪除)。"""
+        keep = {str(k) for k in overrides}
+        with self.transaction():
+            changed = self._upsert("overrides", "fields", overrides.items())
+            gone = [bid for (bid,) in self.conn.execute("SELECT bgg_id FROM overrides") if bid not in keep]
+            self.conn.executemany("DELETE FROM overrides WHERE bgg_id = ?", [(k,) for k in gone])
+        return changed, len(gone)
+
+    def overrides(self) -> Dict[str, Dict[str, Any]]:
+        """{bgg_id: manual.csv 那一列}"""
+        return {bid: json.loads(text) for bid, text in self.conn.execute("SELECT bgg_id, fields FROM overrides")}
+
+    # ------------------------------
+    # bgg_data
+    # ------------------------------
+    def put_rows(self, rows: Iterable[Dict], dirty: bool = True) -> Tuple[int, int]:
+        """
+        整份 bgg_data 記錄（依順序，可以是串流）→ bgg_data 表：內容沒變的列不動、多出來的尾巴刪掉；
+        回傳 (筆數, 寫入幾列)。dirty：有改到就記成「還沒匯出」（從檔案匯入時不用）。
+        """
+        n = 0
+
+        def params():
+            nonlocal n
+            for n, rec in enumerate(rows, 1):
+                text = _dumps(rec)
+                yield n - 1, None if rec.get("bgg_id") is None else str(rec["bgg_id"]), text, _sha(text)
+
+        before = self.conn.total_changes
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT INTO bgg_data(position, bgg_id, record, sha) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(position) DO UPDATE SET bgg_id = excluded.bgg_id, record = excluded.record, "
+                "sha = excluded.sha WHERE bgg_data.sha != excluded.sha",
+                params(),
+            )
+            self.conn.execute("DELETE FROM bgg_data WHERE position >= ?", (n,))
+            changed = self.conn.total_changes - before
+            if changed and dirty:
+                self.set_meta(DIRTY_KEY, "1")
+        return n, changed
+
+    def iter_rows(self) -> Iterator[Dict]:
+        """bgg_data 的記錄，依順序串流讀出。"""
+        for (text,) in self.conn.execute("SELECT record FROM bgg_data ORDER BY position"):
+            yield json.loads(text)
+
+    def rows(self, path: pathlib.Path = BGG_DATA) -> List[Dict]:
+        """
+        目前的 bgg_data 記錄。path 不是目錄上次匯入／匯出的那份（目錄剛建立、檔案被別的程式改過）
+        → 先從檔案匯入；檔案不存在就只看目錄。
+        """
+        if path.exists() and not self.output_current(path):
+            try:
+                data = json.loads(path.read_text("utf-8"))
+            except ValueError as e:
+                raise SystemExit(f"[ERROR] {path} 不是合法的 JSON：{e}")
+            if not isinstance(data, list):
+                raise SystemExit(f"[ERROR] {path.name} 內容不是 list")
+            if self.get_meta(DIRTY_KEY):
+                print(f"[WARN] {path.name} 被別的程式改過，目錄裡還沒匯出的改動以檔案為準")
+            with self.transaction():
+                self.put_rows(data, dirty=False)
+                self.set_meta(DIRTY_KEY, None)
+                self.mark_output(path)
+            return data
+        return list(self.iter_rows())
+
+    def export_rows(self, path: pathlib.Path = BGG_DATA, indent: Optional[int] = 2) -> Optional[int]:
+        """bgg_data 有還沒匯出的改動（或 path 不存在）才寫 path；回傳筆數，沒寫就是 None。"""
+        if path.exists() and not self.get_meta(DIRTY_KEY):
+            return None
+        with JsonArrayWriter(path, indent=indent) as w:
+            for rec in self.iter_rows():
+                w.write(rec)
+        with self.transaction():
+            self.set_meta(DIRTY_KEY, None)
+            self.mark_output(path)
+        return w.count
+
+    # ------------------------------
+    # built
+    # ------------------------------
+    def built_state(self) -> Dict[str, Tuple[str, int, Dict[str, List[int]]]]:
+        """{key: (指紋, position, {輸出檔名: [start, end]})}（不讀記錄本身）。"""
+        return {
+            k: (fp, pos, json.loads(spans))
+            for k, fp, pos, spans in self.conn.execute("SELECT key, fp, position, spans FROM built")
+        }
+
+    def update_built(self, changed: Iterable[Tuple[str, Any, int, str, Dict, Dict]],
+                     moved: Iterable[Tuple[int, Dict, str]] = (), removed: Iterable[str] = ()) -> int:
+        """
+        changed：(key, bgg_id, position, 指紋, games_full 記錄, spans) → 新增／覆蓋
+        moved  ：(position, spans, key) → 記錄沒變，只改順序／在輸出檔裡的位置
+        removed：key → 刪除
+        全部在同一個 transaction；回傳寫入的列數。
+        """
+        before = self.conn.total_changes
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT INTO built(key, bgg_id, position, fp, spans, record) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET bgg_id = excluded.bgg_id, position = excluded.position, "
+                "fp = excluded.fp, spans = excluded.spans, record = excluded.record",
+                [(k, None if b is None else str(b), pos, fp, _dumps(spans), _dumps(rec))
+                 for k, b, pos, fp, rec, spans in changed],
+            )
+            self.conn.executemany("UPDATE built SET position = ?, spans = ? WHERE key = ?",
+                                  [(pos, _dumps(spans), k) for pos, spans, k in moved])
+            self.conn.executemany("DELETE FROM built WHERE key = ?", [(k,) for k in removed])
+        return self.conn.total_changes - before
+
+    def iter_built(self) -> Iterator[Dict]:
+        """games_full 的記錄，依輸出順序串流讀出（一個查詢，不會整份放進記憶體）。"""
+        for (text,) in self.conn.execute("SELECT record FROM built ORDER BY position"):
+            yield json.loads(text)
+
+    def iter_built_items(self) -> Iterator[Tuple[str, Dict]]:
+        """(key, games_full 記錄)，依輸出順序；要改回去（put_built_records）的地方用。"""
+        for key, text in self.conn.execute("SELECT key, record FROM built ORDER BY position"):
+            yield key, json.loads(text)
+
+    def put_built_records(self, records: Iterable[Tuple[str, Dict]]) -> int:
+        """
+        直接改 built 的記錄（build_json 以外的地方，例如 merge_bgg_into_full）；回傳改了幾列。
+        指紋清空：下一次 build_json 一定重算這幾筆。之後要 export_built 才會寫進輸出檔。
+        """
+        before = self.conn.total_changes
+        with self.transaction():
+            self.conn.executemany("UPDATE built SET record = ?, fp = '' WHERE key = ?",
+                                  [(_dumps(rec), k) for k, rec in records])
+        return self.conn.total_changes - before
+
+    def export_built(self, path: pathlib.Path = GAMES_FULL, indent: Optional[int] = 2) -> int:
+        """built → games_full.json（跟 build_json 寫的逐字相同）；順便更新各列在這個檔裡的 spans。回傳筆數。"""
+        moved = []  # 查詢讀完才寫回（邊讀邊改同一張表會亂）
+        with JsonArrayWriter(path, indent=indent) as w:
+            for key, spans, text in self.conn.execute("SELECT key, spans, record FROM built ORDER BY position"):
+                span = list(w.write(json.loads(text)))
+                old = json.loads(spans)
+                if old.get(path.name) != span:
+                    old[path.name] = span
+                    moved.append((_dumps(old), key))
+        with self.transaction():
+            self.conn.executemany("UPDATE built SET spans = ? WHERE key = ?", moved)
+            self.mark_output(path)
+        return w.count
+
+    # ------------------------------
+    # meta
+    # ------------------------------
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        with self.transaction():
+            self.conn.execute(
+                "INSERT INTO meta(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    def mark_output(self, path: pathlib.Path) -> None:
+        """記下 path 現在的大小＋mtime：這份檔案跟目錄一致。"""
+        self.set_meta(f"output:{path.name}", _stamp(path))
+
+    def output_current(self, path: pathlib.Path) -> bool:
+        """path 是目錄記下的那份（之後沒被別的程式動過）。"""
+        return path.exists() and self.get_meta(f"output:{path.name}") == _stamp(path)
+
+    # ------------------------------
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main(argv: List[str]) -> None:
+    with Catalog() as cat:
+        if argv[:1] == ["export"]:
+            n = cat.export_rows()
+            if n is not None:
+                print(f"[OK] 匯出 {n} 筆 → {BGG_DATA}")
+            n = cat.export_built()
+            print(f"[OK] 匯出 {n} 筆 → {GAMES_FULL}")
+            return
+        for table, n in cat.counts().items():
+            print(f"{table:12} {n}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,8 +1,16 @@
 from __future__ import annotations
+import hashlib
+import json
+import pathlib
 from urllib.parse import urlparse, urlunparse
 
 IMG_EXTS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif")
 
+# build_image_variants.py 的輸出索引，以及衍生圖在網站上的路徑前綴（相對於 site/）
+VARIANT_INDEX = pathlib.Path(__file__).resolve().parents[1] / "data" / "image_variants.json"
+VARIANT_WEB_PREFIX = "assets/img/v/"
+VARIANT_FALLBACK = ("jpeg", 320)
+
 def _force_https(u: str) -> str:
     if not u: return ""
     u = u.strip()
@@ -32,3 +40,43 @@ def normalize_bgg_image_url(url: str | None) -> str:
         return ""
 
     return u
+
+def hash_url(url: str) -> str:
+    return hashlib.md5(url.encode("utf-8")).hexdigest()[:8]
+
+def image_filename(bid, url: str) -> str:
+    """本機圖檔名稱：{bgg_id}-{md5(url)[:8]}{ext}（url 需先經過 normalize_bgg_image_url）。"""
+    ext = pathlib.Path(urlparse(url).path).suffix or ".jpg"
+    return f"{bid}-{hash_url(url)}{ext}"
+
+def variant_web_entry(entry: dict, prefix: str = VARIANT_WEB_PREFIX) -> dict:
+    """衍生圖索引的一筆 → 前端用的 {src, w, h, srcset: {格式: "路徑 160w, ..."}}。"""
+    files = entry["files"]
+    fmt, width = VARIANT_FALLBACK
+    fallback = files.get(fmt) or next(iter(files.values()))
+    src = min(fallback, key=lambda x: abs(x[0] - width))[1]
+    return {
+        "src": prefix + src,
+        "w": entry["w"],
+        "h": entry["h"],
+        "srcset": {f: ", ".join(f"{prefix}{n} {wd}w" for wd, n in lst) for f, lst in files.items()},
+    }
+
+def load_image_variants(path: pathlib.Path = VARIANT_INDEX) -> dict:
+    """讀衍生圖索引 → {bgg_id: variant_web_entry}；還沒跑過 build_image_variants 就回傳 {}。"""
+    if not path.exists():
+        return {}
+    try:
+        index = json.loads(path.read_text("utf-8"))
+    except ValueError:
+        return {}
+    return image_variants_from_index(index)
+
+def image_variants_from_index(index: dict) -> dict:
+    """衍生圖索引（data/image_variants.json 的內容）→ {bgg_id: variant_web_entry}。"""
+    sources = index.get("sources", {})
+    return {
+        bid: variant_web_entry(sources[key])
+        for bid, key in index.get("games", {}).items()
+        if key in sources
+    }
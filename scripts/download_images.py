@@ -4,39 +4,77 @@
 download_images.py — 下載 BGG 圖片到 site/assets/img
 
 規格：
-- 讀取 data/bgg_data.json
+- 讀取 bgg_data 記錄（本機目錄 catalog.py，跟其他單獨跑的步驟同一份）
 - 對每一筆：
     * 取 image_url 或 image 或 thumbnail
     * 整理成穩定 HTTPS 原圖網址
-    * 用 URL 做 md5 前 8 碼當檔名：{bgg_id}-{hash}{ext}
-- 實體檔案寫入 site/assets/img
-  → 前端只要用 "assets/img/..." 就能讀到
+    * 用 URL 做 md5 前 8 碼當邏輯檔名：{bgg_id}-{hash}{ext}
+- 實體檔案寫入 site/assets/img/o/{sha16}{ext}（image_store.py 的內容定址倉庫）
+  → 邏輯檔名 → 實體檔的對應記在 site/assets/img/manifest.json；內容相同的圖只存一份
+
+下載方式：
+- 共用一個 requests.Session（連線池），IMG_CONCURRENCY 條執行緒同時下載
+- 同一個 host 最多 IMG_PER_HOST 個同時連線
+- 邊下載邊寫到 .part，完整收到（長度也對）才 rename 進倉庫
+  → 中途當掉只會留下 .part，下次啟動時清掉重抓，不會有「壞檔被 exists() 永久略過」
+- 環境變數：
+    IMG_CONCURRENCY     (default: 8)
+    IMG_PER_HOST        (default: 4)
+    IMG_REVALIDATE_DAYS (default: 7)  # 超過幾天沒確認過的圖，重跑時發條件式請求
+
+Manifest（site/assets/img/manifest.json）：
+- 每個檔案記錄 url / etag / last_modified / size / sha256 / checked_at
+- 已存在的檔案超過 IMG_REVALIDATE_DAYS 天沒確認 → 帶 If-None-Match / If-Modified-Since 重問，
+  304 就不下載內容；200 代表上游換圖了，重新下載覆蓋
+- 舊版直接放在 img/ 底下的檔案會被收編搬進 o/（sha256 在本機算），之後以檔案時間做 If-Modified-Since
+
+用法：
+    python scripts/download_images.py            # 下載／重新確認
+    python scripts/download_images.py --verify   # 只比對 manifest（大小＋sha256），完全不連網
+    python scripts/download_images.py --verify --fix   # 同上，並刪掉壞檔讓下次重抓
 """
 
+import argparse
 import hashlib
-import json
+import os
 import pathlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
 import requests
+from requests.adapters import HTTPAdapter
 
-from common_image import normalize_bgg_image_url  # 同目錄的 common_image.py
+from catalog import Catalog
+from common_image import image_filename, normalize_bgg_image_url  # 同目錄的 common_image.py
+from image_store import ImageStore
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
-DATA = ROOT / "data" / "bgg_data.json"
 OUT = ROOT / "site" / "assets" / "img"
 OUT.mkdir(parents=True, exist_ok=True)
 
+CONCURRENCY = int(os.getenv("IMG_CONCURRENCY", "8"))
+PER_HOST = int(os.getenv("IMG_PER_HOST", "4"))
+REVALIDATE_DAYS = float(os.getenv("IMG_REVALIDATE_DAYS", "7"))
+CHUNK = 64 * 1024
+PART_SUFFIX = ".part"
 
-def hash_url(url: str) -> str:
-    return hashlib.md5(url.encode("utf-8")).hexdigest()[:8]
 
+def conditional_headers(entry: Dict) -> Dict[str, str]:
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
 
-def main():
-    if not DATA.exists():
-        raise SystemExit(f"[ERR] 找不到 {DATA}")
-
-    rows = json.loads(DATA.read_text("utf-8"))
-    downloaded = 0
 
+def plan_downloads(rows: List[Dict]) -> List[Tuple[str, str, str]]:
+    """整理出 (bgg_id, url, 檔名) 清單；同一個檔名只會出現一次。"""
+    jobs: Dict[str, Tuple[str, str, str]] = {}
     for r in rows:
         bid = r.get("bgg_id")
         if not bid:
@@ -50,25 +88,196 @@ def main():
         if not url:
             continue
 
-        ext = pathlib.Path(url).suffix or ".jpg"
-        fname = f"{bid}-{hash_url(url)}{ext}"
-        path = OUT / fname
+        fname = image_filename(bid, url)
+        jobs.setdefault(fname, (str(bid), url, fname))
+    return list(jobs.values())
 
-        if path.exists():
-            continue
+
+def clean_partials(out_dir: pathlib.Path) -> int:
+    """清掉上次中斷留下的 .part 檔（含 o/ 底下的）。"""
+    n = 0
+    for p in list(out_dir.glob(f"*{PART_SUFFIX}")) + list(out_dir.glob(f"*/.*{PART_SUFFIX}")):
+        p.unlink(missing_ok=True)
+        n += 1
+    return n
+
+
+class HostLimiter:
+    """每個 host 一個 Semaphore，限制同一台主機的同時連線數。"""
+
+    def __init__(self, per_host: int):
+        self.per_host = max(1, per_host)
+        self._sems: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            sem = self._sems.get(host)
+            if sem is None:
+                sem = self._sems[host] = threading.Semaphore(self.per_host)
+            return sem
+
+
+@dataclass
+class FetchResult:
+    status: int
+    size: int = 0
+    sha256: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+def fetch_to_file(
+    session: requests.Session,
+    url: str,
+    part: pathlib.Path,
+    headers: Optional[Dict[str, str]] = None,
+) -> Optional[FetchResult]:
+    """
+    串流下載到 part（暫存檔），同時算 sha256；收進倉庫（rename）由呼叫端負責。
+    headers 可帶條件式請求；伺服器回 304 時不寫任何檔案，回傳 status=304。
+    HTTP 非 200/304、內容為空或長度不符時回傳 None（暫存檔會刪掉）。
+    """
+    try:
+        with session.get(url, timeout=30, stream=True, headers=headers) as resp:
+            if resp.status_code == 304:
+                return FetchResult(304)
+            if resp.status_code != 200:
+                print(f"[WARN] HTTP {resp.status_code} → {url}")
+                return None
+            expected = resp.headers.get("Content-Length")
+            h = hashlib.sha256()
+            size = 0
+            with part.open("wb") as f:
+                for chunk in resp.iter_content(CHUNK):
+                    f.write(chunk)
+                    h.update(chunk)
+                    size += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            result = FetchResult(
+                200, size, h.hexdigest(), resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+            )
+        if size == 0 or (expected and expected.isdigit() and int(expected) != size):
+            print(f"[WARN] 內容不完整（{size}/{expected} bytes）→ {url}")
+            part.unlink(missing_ok=True)
+            return None
+        return result
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+
+
+def download_all(
+    jobs: List[Tuple[str, str, str]],
+    out_dir: pathlib.Path = OUT,
+    concurrency: int = CONCURRENCY,
+    per_host: int = PER_HOST,
+    revalidate_days: float = REVALIDATE_DAYS,
+) -> Dict[str, float]:
+    """
+    下載 jobs 裡倉庫還沒有的圖，並對過期的既有圖發條件式請求；結束時更新 manifest。
+    回傳統計（downloaded / updated / not_modified / deduped / skipped / adopted / failed / bytes / elapsed）。
+    """
+    stats = {
+        "downloaded": 0, "updated": 0, "not_modified": 0, "deduped": 0,
+        "skipped": 0, "adopted": 0, "failed": 0, "bytes": 0,
+    }
+    lock = threading.Lock()
+    limiter = HostLimiter(per_host)
+    store = ImageStore(out_dir)
+    now = time.time()
+    t0 = time.monotonic()
+
+    todo = []
+    for job in jobs:
+        _, url, fname = job
+        legacy = out_dir / fname
+        if legacy.exists():
+            # 舊版直接放在 img/ 底下的檔案 → 搬進內容定址倉庫
+            store.adopt(legacy, fname, url)
+            stats["adopted"] += 1
+        entry = store.get(fname)
+        if store.has(fname) and now - entry.get("checked_at", 0) < revalidate_days * 86400:
+            stats["skipped"] += 1
+        else:
+            todo.append(job)
+
+    with requests.Session() as s:
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(1, concurrency))
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+
+        def work(job: Tuple[str, str, str]) -> None:
+            bid, url, fname = job
+            entry = store.get(fname) if store.has(fname) else None
+            part = store.part_path(fname)
+            try:
+                with limiter(url):
+                    res = fetch_to_file(s, url, part, conditional_headers(entry) if entry else None)
+            except Exception as e:
+                print(f"[ERR] download fail {bid} → {url} ; {e}")
+                res = None
+            if res is None:
+                with lock:
+                    stats["failed"] += 1
+                return
+            if res.status == 304:
+                store.touch(fname)
+                with lock:
+                    stats["not_modified"] += 1
+                return
+            meta = {
+                "url": url,
+                "etag": res.etag,
+                "last_modified": res.last_modified,
+                "size": res.size,
+                "sha256": res.sha256,
+            }
+            stored = store.commit(part, fname, meta)
+            with lock:
+                stats["updated" if entry else "downloaded"] += 1
+                stats["bytes"] += res.size
+                if not stored:
+                    stats["deduped"] += 1
+            print(f"[OK] {'updated' if entry else 'saved'} {fname}{'' if stored else '（內容重複，共用既有檔）'}")
 
         try:
-            resp = requests.get(url, timeout=30)
-            if resp.status_code == 200 and resp.content:
-                path.write_bytes(resp.content)
-                downloaded += 1
-                print(f"[OK] saved {fname}")
-            else:
-                print(f"[WARN] HTTP {resp.status_code} for {bid} → {url}")
-        except Exception as e:
-            print(f"[ERR] download fail {bid} → {url} ; {e}")
-
-    print(f"download_images: 新下載 {downloaded} 張圖；輸出目錄：{OUT}")
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                list(pool.map(work, todo))
+        finally:
+            store.save()
+
+    stats["elapsed"] = time.monotonic() - t0
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="下載 BGG 圖片到 site/assets/img")
+    ap.add_argument("--verify", action="store_true", help="只依 manifest 離線檢查檔案，不連網")
+    ap.add_argument("--fix", action="store_true", help="搭配 --verify：刪掉壞檔，下次重新下載")
+    args = ap.parse_args()
+
+    if args.verify:
+        raise SystemExit(1 if ImageStore(OUT).verify(fix=args.fix) else 0)
+
+    with Catalog() as catalog:
+        rows = catalog.rows()
+    if not rows:
+        raise SystemExit("[ERR] 沒有 bgg_data（目錄跟 data/bgg_data.json 都沒有）")
+    removed = clean_partials(OUT)
+    if removed:
+        print(f"[INFO] 清掉上次中斷留下的 {removed} 個 .part 檔")
+
+    st = download_all(plan_downloads(rows))
+    mb = st["bytes"] / 2**20
+    print(
+        f"download_images: 新下載 {st['downloaded']} 張圖，上游更新 {st['updated']}，"
+        f"304 未變更 {st['not_modified']}（略過 {st['skipped']}，收編 {st['adopted']}，"
+        f"內容重複 {st['deduped']}，失敗 {st['failed']}）；"
+        f"{mb:.1f} MB / {st['elapsed']:.1f}s = {mb / max(st['elapsed'], 1e-9):.2f} MB/s；輸出目錄：{OUT}"
+    )
 
 
 if __name__ == "__main__":
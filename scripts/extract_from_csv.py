@@ -8,28 +8,37 @@ CSV 欄位：name_zh,bgg_id,...
 
 import csv
 import pathlib
+from typing import List
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 CSV_PATH = ROOT / "data" / "manual.csv"  # 你 CSV 的檔名
 OUT = ROOT / "data" / "bgg_ids.txt"
 
-def main():
-    if not CSV_PATH.exists():
-        print(f"[ERR] 找不到 CSV：{CSV_PATH}")
-        return
-
+def extract_ids(csv_path: pathlib.Path = CSV_PATH) -> List[int]:
+    """回傳 CSV 裡出現過的 BGG ID（去重、排序）。"""
     ids = set()
 
-    with CSV_PATH.open("r", encoding="utf-8") as f:
+    with csv_path.open("r", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             bid = row.get("bgg_id")
             if bid and bid.isdigit():
                 ids.add(int(bid))
 
-    ids = sorted(ids)
+    return sorted(ids)
+
 
+def write_ids(ids: List[int]) -> None:
     OUT.write_text("\n".join(str(i) for i in ids), "utf-8")
+
+
+def main():
+    if not CSV_PATH.exists():
+        print(f"[ERR] 找不到 CSV：{CSV_PATH}")
+        return
+
+    ids = extract_ids()
+    write_ids(ids)
     print(f"[OK] 已產生 bgg_ids.txt，共 {len(ids)} 個 BGG ID")
 
 if __name__ == "__main__":
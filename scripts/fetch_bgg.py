@@ -7,47 +7,79 @@ fetch_bgg.py — 用 XML API2 取回 BGG 資料（含評分／分類／機制／
 1) 從 data/bgg_ids.txt 讀取所有 BGG ID（由 extract_from_csv.py 產生）
 2) 依規則「每批最多 20 個 id」呼叫：
    https://boardgamegeek.com/xmlapi2/thing?id=...&stats=1&type=boardgame,boardgameexpansion
-3) 解析 XML → 存成 data/bgg_data.json
+3) 解析 XML → 每批寫進本機目錄 data/cache/catalog.sqlite3 的 bgg_records / fetch_meta（catalog.py，一批一個 transaction）
+4) 依 bgg_ids.txt 的順序把目錄的 bgg_data 表重設成這些記錄（只改有變的列）；
+   data/bgg_data.json 等後面的步驟都套完，由 build_json 匯出（或 python scripts/catalog.py export）
+
+記憶體：
+- XML 用 iterparse 逐個 <item> 解析，讀完就清掉
+- 抓到的記錄直接進目錄，不會全部留在記憶體；重設 bgg_data 表也是一筆一筆串流
+  → 目錄從 1k 變 100k 款，峰值記憶體大致不變（見 benchmarks/bench_stream_memory.py）
+
+快取：
+- 抓過且還沒超過 BGG_CACHE_TTL_DAYS（預設 7 天）的 id 不會再抓（看目錄的 fetch_meta）
+- 每批抓完立刻寫進目錄，中途當掉重跑會從斷掉的地方接著抓
+- BGG_CACHE_TTL_DAYS=0 → 全部重抓
+- 舊版的快取檔 data/cache/bgg_records.jsonl：目錄還沒有任何抓取紀錄時匯入一次，之後就不再讀它
 
 說明：
-- 若有 data/bgg_token.txt，會讀裡面的 Token，塞進 Authorization: Bearer <token> header
-- 若沒有 token，一樣可以匿名呼叫（只是理論上配額比較低）
+- HTTP 都走 bgg_client.shared()：token（BGG_TOKEN 或 data/bgg_token.txt，沒有就匿名）、連線池、
+  整個程序共用的令牌桶（BGG_RATE 次/秒）、202／429／5xx 退避重試（BGG_RETRY 次，有上限）都在那裡；
+  BGG_HTTP_MODE=record／replay 可以錄下回應、之後離線重跑
+- 多批同時抓（BGG_CONCURRENCY 條執行緒）
+- 環境變數：
+    BGG_CONCURRENCY  (default: 2)    # 同時進行的請求數
+    BGG_QUEUE_SIZE   (default: 8)    # 抓到但還沒解析的 XML 最多暫存幾批
+    BGG_PARSE_WORKERS(default: min(4, CPU 數))  # 解析用的 process 數
+    BGG_THING_URL    (optional)      # 測試／benchmark 用，指向本機 stub
 """
 
-import json
+import io
+import os
 import pathlib
-import time
-from typing import List, Dict, Optional
+import queue
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Callable, Iterator, List, Dict, Optional
 
-import requests
 from lxml import etree
 
+import bgg_client
+from bgg_cache import RecordCache
+from bgg_client import BGGClient, BGGError
+from catalog import Catalog
+from rate_limit import FetchStats
+
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 IDS_TXT = ROOT / "data" / "bgg_ids.txt"
-OUT_JSON = ROOT / "data" / "bgg_data.json"
-TOKEN_FILE = ROOT / "data" / "bgg_token.txt"
+LEGACY_CACHE = ROOT / "data" / "cache" / "bgg_records.jsonl"
+
+# 預設 7 天內抓過的就不再抓（每週跑一次 → 大約每週刷新一輪）
+TTL_DAYS = float(os.getenv("BGG_CACHE_TTL_DAYS", "7"))
 
 # 一批最多 20 個（XML API2 規則）
 BATCH_SIZE = 20
-SLEEP_SEC = 5.0
 
-# 注意：不要用 www.boardgamegeek.com，會影響授權
-BASE_URL = "https://boardgamegeek.com/xmlapi2/thing"
+CONCURRENCY = int(os.getenv("BGG_CONCURRENCY", "2"))
+
+# 抓取／解析管線：queue 上限、解析 worker 數、批次數達多少才改用多 process 解析
+QUEUE_SIZE = int(os.getenv("BGG_QUEUE_SIZE", "8"))
+PARSE_WORKERS = int(os.getenv("BGG_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARSE_PROCESS_MIN_BATCHES = 10
+
+BASE_URL = bgg_client.THING_URL
 
 
 # ------------------------------
 # 工具函式
 # ------------------------------
-def load_token() -> Optional[str]:
-    if TOKEN_FILE.exists():
-        token = TOKEN_FILE.read_text("utf-8").strip()
-        if token:
-            print("[INFO] 使用 data/bgg_token.txt 內的 BGG Token")
-            return token
-    print("[INFO] 找不到 data/bgg_token.txt，改用匿名模式")
-    return None
-
-
 def load_ids() -> List[str]:
     if not IDS_TXT.exists():
         raise SystemExit(f"[ERR] 找不到 {IDS_TXT}，請先跑 scripts/extract_from_csv.py")
@@ -85,37 +117,29 @@ def _safe_int(v: Optional[str]) -> Optional[int]:
         return None
 
 
-def fetch_batch(session: requests.Session, token: Optional[str], batch_ids: List[str]) -> Optional[bytes]:
+def fetch_batch(
+    client: BGGClient,
+    batch_ids: List[str],
+    stats: Optional[FetchStats] = None,
+    base_url: str = BASE_URL,
+) -> Optional[bytes]:
     """
     呼叫 XML API2 /thing，注意：
     - 參數是 id=（不是 ids）
     - 一次最多 20 個 id
     - stats=1 才會有評分資料
+    限速、退避重試由 client 處理；重試用完或其他 HTTP 錯誤時印出原因、回傳 None（這批略過）
     """
     params = {
         "id": ",".join(batch_ids),  # 重點 1：這裡一定要是 id（不是 ids）
         "stats": 1,
         "type": "boardgame,boardgameexpansion",
     }
-
-    headers = {}
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-
-    while True:
-        r = session.get(BASE_URL, params=params, headers=headers, timeout=30)
-        if r.status_code == 202:
-            print("    [INFO] HTTP 202（排隊中），稍後重試一次...")
-            time.sleep(SLEEP_SEC)
-            continue
-
-        if r.status_code != 200:
-            print(f"    [ERROR] HTTP {r.status_code}，這批 id 被略過：{batch_ids}")
-            body = r.text[:200].replace("\n", " ")
-            print(f"           回應前 200 字：{body!r}")
-            return None
-
-        return r.content
+    try:
+        return client.get(base_url, params, stats=stats).content
+    except BGGError as e:
+        print(f"    [ERROR] {e}，這批 id 被略過：{batch_ids}")
+        return None
 
 
 def parse_xml(xml_bytes: bytes) -> List[Dict]:
@@ -125,113 +149,255 @@ def parse_xml(xml_bytes: bytes) -> List[Dict]:
     - 新增：min_players / max_players / min_playtime / max_playtime
     - 圖片：image_url = image or thumbnail
     """
-    root = etree.fromstring(xml_bytes)
-    out: List[Dict] = []
-
-    for item in root.findall("item"):
-        bid = item.get("id")
-
-        # 名稱與年份
-        name_node = item.find("name[@type='primary']")
-        name = name_node.get("value") if name_node is not None else None
-
-        year_node = item.find("yearpublished")
-        year = _safe_int(year_node.get("value")) if year_node is not None else None
-
-        # 玩家數與時間
-        def _get_int(tag: str) -> Optional[int]:
-            node = item.find(tag)
-            return _safe_int(node.get("value")) if node is not None else None
-
-        min_players = _get_int("minplayers")
-        max_players = _get_int("maxplayers")
-        min_playtime = _get_int("minplaytime")
-        max_playtime = _get_int("maxplaytime")
-
-        # 評分區塊
-        stats = item.find("statistics/ratings")
-        rating_bayes = rating_avg = users_rated = weight = None
-        if stats is not None:
-            bayes_node = stats.find("bayesaverage")
-            avg_node = stats.find("average")
-            users_node = stats.find("usersrated")
-            weight_node = stats.find("averageweight")
-
-            rating_bayes = _safe_float(bayes_node.get("value")) if bayes_node is not None else None
-            rating_avg = _safe_float(avg_node.get("value")) if avg_node is not None else None
-            users_rated = _safe_int(users_node.get("value")) if users_node is not None else None
-            weight = _safe_float(weight_node.get("value")) if weight_node is not None else None
-
-        # 分類／機制
-        categories = [lnk.get("value") for lnk in item.findall("link[@type='boardgamecategory']")]
-        mechanisms = [lnk.get("value") for lnk in item.findall("link[@type='boardgamemechanic']")]
+    return list(iter_parse_xml(xml_bytes))
 
+
+def iter_parse_xml(xml_bytes: bytes) -> Iterator[Dict]:
+    """
+    串流版 parse_xml：用 iterparse 一次只處理一個 <item>，
+    讀完就 clear() 並刪掉前面的兄弟節點，整份回應不會整棵樹留在記憶體裡。
+    """
+    for _, item in etree.iterparse(io.BytesIO(xml_bytes), events=("end",), tag="item"):
+        yield _parse_item(item)
+        item.clear()
+        parent = item.getparent()
+        while item.getprevious() is not None:
+            del parent[0]
+
+
+def _parse_item(item) -> Dict:
+    bid = item.get("id")
+
+    # 名稱與年份
+    name_node = item.find("name[@type='primary']")
+    name = name_node.get("value") if name_node is not None else None
+
+    year_node = item.find("yearpublished")
+    year = _safe_int(year_node.get("value")) if year_node is not None else None
+
+    # 玩家數與時間
+    def _get_int(tag: str) -> Optional[int]:
+        node = item.find(tag)
+        return _safe_int(node.get("value")) if node is not None else None
+
+    min_players = _get_int("minplayers")
+    max_players = _get_int("maxplayers")
+    min_playtime = _get_int("minplaytime")
+    max_playtime = _get_int("maxplaytime")
+
+    # 評分區塊
+    stats = item.find("statistics/ratings")
+    rating_bayes = rating_avg = users_rated = weight = None
+    if stats is not None:
+        bayes_node = stats.find("bayesaverage")
+        avg_node = stats.find("average")
+        users_node = stats.find("usersrated")
+        weight_node = stats.find("averageweight")
+
+        rating_bayes = _safe_float(bayes_node.get("value")) if bayes_node is not None else None
+        rating_avg = _safe_float(avg_node.get("value")) if avg_node is not None else None
+        users_rated = _safe_int(users_node.get("value")) if users_node is not None else None
+        weight = _safe_float(weight_node.get("value")) if weight_node is not None else None
+
+    # 分類／機制
+    categories = [lnk.get("value") for lnk in item.findall("link[@type='boardgamecategory']")]
+    mechanisms = [lnk.get("value") for lnk in item.findall("link[@type='boardgamemechanic']")]
+
+    # 圖片
+    thumb_node = item.find("thumbnail")
+    image_node = item.find("image")
+    thumbnail = thumb_node.text if thumb_node is not None else None
+    image = image_node.text if image_node is not None else None
+    image_url = image or thumbnail
+
+    return {
+        "bgg_id": bid,
+        "name": name,
+        "year": year,
+        # 玩家數／時間（新欄位 + 舊名字一起寫，給後面相容）
+        "min_players": min_players,
+        "max_players": max_players,
+        "min_playtime": min_playtime,
+        "max_playtime": max_playtime,
+        "minplayers": min_players,
+        "maxplayers": max_players,
+        "minplaytime": min_playtime,
+        "maxplaytime": max_playtime,
+        # 評分
+        "rating_bayes": rating_bayes,
+        "rating_avg": rating_avg,
+        "users_rated": users_rated,
+        "weight": weight,
+        # 類別／機制
+        "categories": categories,
+        "mechanisms": mechanisms,
         # 圖片
-        thumb_node = item.find("thumbnail")
-        image_node = item.find("image")
-        thumbnail = thumb_node.text if thumb_node is not None else None
-        image = image_node.text if image_node is not None else None
-        image_url = image or thumbnail
-
-        out.append(
-            {
-                "bgg_id": bid,
-                "name": name,
-                "year": year,
-                # 玩家數／時間（新欄位 + 舊名字一起寫，給後面相容）
-                "min_players": min_players,
-                "max_players": max_players,
-                "min_playtime": min_playtime,
-                "max_playtime": max_playtime,
-                "minplayers": min_players,
-                "maxplayers": max_players,
-                "minplaytime": min_playtime,
-                "maxplaytime": max_playtime,
-                # 評分
-                "rating_bayes": rating_bayes,
-                "rating_avg": rating_avg,
-                "users_rated": users_rated,
-                "weight": weight,
-                # 類別／機制
-                "categories": categories,
-                "mechanisms": mechanisms,
-                # 圖片
-                "thumbnail": thumbnail,
-                "image": image_url,
-                "image_url": image_url,
-            }
-        )
-
-    return out
+        "thumbnail": thumbnail,
+        "image": image_url,
+        "image_url": image_url,
+    }
+
+
+# ------------------------------
+# 批次排程
+# ------------------------------
+def iter_batches(ids: List[str], size: int = BATCH_SIZE) -> List[List[str]]:
+    return [ids[i : i + size] for i in range(0, len(ids), size)]
+
+
+def _make_parse_pool(total: int, workers: int) -> Executor:
+    """批次多時用多個 process 解析（吃多核心）；批次少時開 process 不划算，用一條執行緒就好。"""
+    if total >= PARSE_PROCESS_MIN_BATCHES and workers > 1:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=1)
+
+
+def fetch_all(
+    ids: List[str],
+    client: Optional[BGGClient] = None,
+    concurrency: int = CONCURRENCY,
+    base_url: str = BASE_URL,
+    stats: Optional[FetchStats] = None,
+    on_batch: Optional[Callable[[List[str], List[Dict]], None]] = None,
+    collect: bool = True,
+    parse_workers: int = PARSE_WORKERS,
+) -> List[Dict]:
+    """
+    抓取／解析管線：
+    - concurrency 條抓取執行緒共用 client（預設 bgg_client.shared()：連線池＋令牌桶），
+      抓到的原始 XML bytes 丟進有上限的 queue
+    - 主執行緒從 queue 取出，交給解析池（批次多時是 ProcessPool），同時在解析中的批次有上限
+      → 解析跟不上時 queue 會滿，抓取端自然被擋住；解析本身不會卡住下一個請求
+    - 解析完成的批次在主執行緒依序交給 on_batch(batch_ids, rows)
+    - 主執行緒出錯（on_batch 寫目錄失敗、Ctrl-C…）→ 設 stop：還沒開始的批次不抓，
+      卡在 queue 滿的抓取端放棄放入，清空 queue，等執行緒都結束後再把原本的例外丟出去
+
+    回傳的 rows 會照 ids 原本的批次順序排好（跟以前單執行緒版一致）。
+    collect=False：不保留結果（回傳空 list），搭配 on_batch 串流處理大目錄用。
+    """
+    batches = iter_batches(ids)
+    total = len(batches)
+    stats = stats or FetchStats()
+    client = client or bgg_client.shared()
+    results: List[Optional[List[Dict]]] = [None] * total
+    raw: "queue.Queue[tuple]" = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    max_parsing = max(2, parse_workers * 2)
+
+    def handle(fut: Future, idx: int) -> None:
+        try:
+            rows = fut.result()
+        except Exception as e:
+            print(f"    [ERROR] 解析失敗，這批 id 被略過：{batches[idx]}（{e}）")
+            stats.add(failed=1)
+            return
+        stats.add(items=len(rows))
+        if collect:
+            results[idx] = rows
+        if on_batch is not None:
+            on_batch(batches[idx], rows)
+
+    def fetch(idx: int) -> None:
+        if stop.is_set():
+            return
+        batch = batches[idx]
+        print(f"[{idx + 1}/{total}] Fetch id={','.join(batch)}")
+        xml_bytes = None
+        try:
+            xml_bytes = fetch_batch(client, batch, stats=stats, base_url=base_url)
+        except Exception as e:
+            # fetch_batch 自己只處理 BGGError；其他例外（連線、OSError…）不能悶在沒人看的 future 裡
+            print(f"    [ERROR] 抓取失敗，這批 id 被略過：{batch}（{e}）")
+            stats.add(failed=1)
+        finally:
+            # 失敗也要放一個 None 進去，主執行緒才知道這批結束了；
+            # 主執行緒已經不收了（stop）就別一直擋在滿的 queue 上
+            while not stop.is_set():
+                try:
+                    raw.put((idx, xml_bytes), timeout=0.2)
+                    break
+                except queue.Full:
+                    continue
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as fetchers, \
+            _make_parse_pool(total, parse_workers) as parsers:
+        for idx in range(total):
+            fetchers.submit(fetch, idx)
+
+        parsing: Dict[Future, int] = {}
+        try:
+            for _ in range(total):
+                idx, xml_bytes = raw.get()
+                if xml_bytes is None:
+                    # 這一批失敗就算了，先不要讓整個流程掛掉
+                    continue
+                if len(parsing) >= max_parsing:
+                    done, _ = wait(parsing, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        handle(fut, parsing.pop(fut))
+                parsing[parsers.submit(parse_xml, xml_bytes)] = idx
+
+            for fut in list(parsing):
+                handle(fut, parsing.pop(fut))
+        except BaseException:
+            # 先讓抓取端停下來、清掉 queue，離開 with 時才不會卡在等執行緒；例外照原樣往外丟
+            stop.set()
+            for fut in parsing:
+                fut.cancel()
+            while True:
+                try:
+                    raw.get_nowait()
+                except queue.Empty:
+                    break
+            raise
+
+    stats.finish()
+    return [row for rows in results if rows for row in rows]
 
 
 # ------------------------------
 # main
 # ------------------------------
-def main():
-    token = load_token()
-    ids = load_ids()
+def import_legacy_cache(catalog: Catalog, path: pathlib.Path = LEGACY_CACHE) -> int:
+    """舊版快取檔 bgg_records.jsonl → 目錄（只在目錄還沒有任何抓取紀錄時做，保留原本的抓取時間）；回傳筆數。"""
+    if not path.exists() or catalog.counts()["fetch_meta"]:
+        return 0
+    with RecordCache(path) as cache, catalog.transaction():
+        for bid in cache.ids():
+            catalog.put_fetched([(bid, cache.get(bid))], cache.fetched_at(bid))
+    return len(cache)
+
+
+def refresh_cache(catalog: Catalog, ids: List[str], stats: FetchStats) -> None:
+    """
+    把 ids 裡沒抓過或過期的部分抓回來寫進目錄的 bgg_records / fetch_meta（一批一個 transaction；
+    全部都新鮮就不連網）。
+    """
+    n = import_legacy_cache(catalog)
+    if n:
+        print(f"[INFO] 從舊快取檔匯入 {n} 筆 → {catalog.path}（之後不再讀 {LEGACY_CACHE.name}）")
+    todo = catalog.stale_ids(ids, TTL_DAYS)
+    print(f"[INFO] 快取命中 {len(ids) - len(todo)} 筆，需要抓取 {len(todo)} 筆（TTL {TTL_DAYS:g} 天）")
 
-    all_rows: List[Dict] = []
-    total_batches = (len(ids) + BATCH_SIZE - 1) // BATCH_SIZE
+    def commit(batch: List[str], rows: List[Dict]) -> None:
+        got = {str(r["bgg_id"]): r for r in rows}
+        # 沒回傳的 id 也記下來（record=null），避免每次都重問
+        catalog.put_fetched([(bid, got.get(bid)) for bid in batch])
 
-    with requests.Session() as s:
-        for idx, start in enumerate(range(0, len(ids), BATCH_SIZE), start=1):
-            batch = ids[start : start + BATCH_SIZE]
-            print(f"[{idx}/{total_batches}] Fetch id={','.join(batch)}")
+    if todo:
+        fetch_all(todo, stats=stats, on_batch=commit, collect=False)
 
-            xml_bytes = fetch_batch(s, token, batch)
-            if xml_bytes is None:
-                # 這一批失敗就算了，先不要讓整個流程掛掉
-                continue
 
-            rows = parse_xml(xml_bytes)
-            all_rows.extend(rows)
+def main():
+    ids = load_ids()
+    stats = FetchStats()
 
-            time.sleep(SLEEP_SEC)
+    with Catalog() as catalog:
+        refresh_cache(catalog, ids, stats)
+        n, changed = catalog.put_rows(catalog.iter_records(ids))
 
-    OUT_JSON.write_text(json.dumps(all_rows, ensure_ascii=False, indent=2), "utf-8")
-    print(f"[OK] 共寫入 {len(all_rows)} 筆 → {OUT_JSON}")
+    print(f"[OK] 共 {n} 筆 → 目錄 bgg_data（改了 {changed} 列；data/bgg_data.json 由 build_json 匯出）")
+    print(f"[STAT] {stats.summary()}")
 
 
 if __name__ == "__main__":
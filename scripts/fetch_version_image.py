@@ -1,75 +1,124 @@
 # scripts/fetch_version_image.py
-import os, json, time, requests, xml.etree.ElementTree as ET
+"""
+有 image_version_id 的遊戲改用該版本（boardgameversion）的封面圖。
+
+- 版本圖幾乎不會變 → 查過的結果記在 data/cache/bgg_versions.jsonl（bgg_cache.RecordCache，
+  key 是 version id），BGG_VERSION_TTL_DAYS（預設 90）天內不再問；沒有新的 version id 就完全不連網
+- 要問的 version id 每 20 個併成一個 thing 請求；HTTP 走 bgg_client.shared()
+  （跟 fetch_bgg 共用連線池、令牌桶與退避重試，BGG_HTTP_MODE=replay 時不連網）
+- 抓失敗的那批不寫快取，下次再問
+- 單獨跑時讀、寫本機目錄（catalog.py）的 bgg_data 表，只改有變的列；data/bgg_data.json 由 build_json 最後匯出
+- 環境變數：
+    BGG_VERSION_TTL_DAYS (default: 90)
+    BGG_THING_URL        (optional)  # 測試用，指向本機 stub
+"""
+import os, xml.etree.ElementTree as ET
 from pathlib import Path
+from typing import Dict, List, Optional
 
-INOUT = Path("data/bgg_data.json")
-API   = "https://boardgamegeek.com/xmlapi2/thing"
+import bgg_client
+from bgg_cache import RecordCache
+from bgg_client import BGGClient
+from catalog import Catalog
+from rate_limit import FetchStats
 
-UA = os.getenv("BGG_UA", "game-guide-site/ci (+https://github.com/TELIFUJ/game-guide-site)")
-TOKEN = os.getenv("BGG_TOKEN", "").strip()
+ROOT  = Path(__file__).resolve().parents[1]
+CACHE = ROOT / "data" / "cache" / "bgg_versions.jsonl"
+API   = bgg_client.THING_URL
 
-HEADERS = {
-    "User-Agent": UA,
-    "Accept": "application/xml",
-    "Referer": "https://boardgamegeek.com/",
-}
-if TOKEN:
-    HEADERS["Authorization"] = f"Bearer {TOKEN}"
+BATCH_SIZE = 20
+TTL_DAYS   = float(os.getenv("BGG_VERSION_TTL_DAYS", "90"))
 
-def _get(url, params=None, backoff=2, attempt=1, max_attempts=8):
-    r = requests.get(url, params=params, timeout=60, headers=HEADERS)
-    if r.status_code in (202, 429, 500, 502, 503, 504) and attempt < max_attempts:
-        time.sleep(backoff)
-        return _get(url, params, min(backoff * 1.7, 16), attempt + 1, max_attempts)
-    r.raise_for_status()
-    return r
+def parse_versions(xml_text) -> Dict[str, Optional[str]]:
+    """{version_id: 封面圖網址或 None}；image 優先，沒有才用 thumbnail。"""
+    out = {}
+    for it in ET.fromstring(xml_text).findall("item"):
+        img = it.find("image"); thumb = it.find("thumbnail")
+        out[it.get("id")] = (img.text if img is not None else None) or (thumb.text if thumb is not None else None)
+    return out
 
-def fetch_version(v_id: int):
-    r = _get(API, params={"type": "boardgameversion", "id": str(v_id)})
-    root = ET.fromstring(r.text)
-    it   = root.find("item")
-    if it is None: return None
-    img = it.find("image"); thumb = it.find("thumbnail")
-    return (img.text if img is not None else None) or (thumb.text if thumb is not None else None)
+def fetch_versions(client: BGGClient, vids: List[str], stats=None) -> Dict[str, Optional[str]]:
+    """一次問一批（最多 BATCH_SIZE 個）version id；回應裡沒有的 id 當作沒有圖。失敗丟 bgg_client.BGGError。"""
+    r = client.get(API, {"type": "boardgameversion", "id": ",".join(vids)}, stats=stats)
+    found = parse_versions(r.content)
+    return {v: found.get(v) for v in vids}
 
-def main():
-    if not INOUT.exists():
-        print("No data/bgg_data.json; skip."); return
+def resolve_version_images(vids: List[str], cache_path: Path = CACHE,
+                           ttl_days: float = TTL_DAYS) -> Dict[str, Optional[str]]:
+    """version id → 圖片網址；快取裡新鮮的直接用，其餘分批問 BGG（失敗的那批不會出現在結果裡）。"""
+    vids = list(dict.fromkeys(vids))
+    with RecordCache(cache_path) as cache:
+        todo = cache.stale_ids(vids, ttl_days)
+        if todo:
+            stats = FetchStats()
+            client = bgg_client.shared()
+            for i in range(0, len(todo), BATCH_SIZE):
+                batch = todo[i:i + BATCH_SIZE]
+                try:
+                    got = fetch_versions(client, batch, stats)
+                except Exception as e:
+                    print(f"Version fetch failed {','.join(batch)}: {e}")
+                    continue
+                cache.put_many((v, {"image": u} if u else None) for v, u in got.items())
+                stats.add(items=len(batch))
+            stats.finish()
+            print(f"[STAT] versions: 快取 {len(vids) - len(todo)}，問 BGG {len(todo)}；{stats.summary()}")
+        out = {}
+        for v in vids:
+            if v in cache:
+                rec = cache.get(v)
+                out[v] = rec.get("image") if rec else None
+        cache.compact()
+    return out
 
-    rows = json.loads(INOUT.read_text(encoding="utf-8"))
-    changed = False
+def _version_id(raw) -> Optional[str]:
+    v = (raw or "").strip() if isinstance(raw, str) else (str(raw).strip() if raw is not None else "")
+    if not v: return None
+    try:
+        return str(int(v))
+    except Exception:
+        print(f"Skip invalid image_version_id: {v}")
+        return None
 
+def apply_version_images(rows) -> bool:
+    """有 image_version_id 的遊戲改用該版本的封面圖；回傳是否有改動。"""
+    wanted = []
     for r in rows:
         if r.get("image_override"):  # 尊重 override
             continue
+        vid = _version_id(r.get("image_version_id"))
+        if vid:
+            wanted.append((r, vid))
+    if not wanted:
+        return False
 
-        raw = r.get("image_version_id")
-        v = (raw or "").strip() if isinstance(raw, str) else (str(raw).strip() if raw is not None else "")
-        if not v: continue
-
-        try:
-            vid = int(v)
-        except Exception:
-            print(f"Skip invalid image_version_id: {v}")
+    urls = resolve_version_images([vid for _, vid in wanted])
+    changed = False
+    for r, vid in wanted:
+        if vid not in urls:
+            continue  # 這次抓失敗，維持原圖
+        url = urls[vid]
+        if not url:
+            print(f"No image for version {vid}")
             continue
+        if r.get("image_url") != url or r.get("image_version_used") != int(vid):
+            r["image_url"] = url
+            r["image_version_used"] = int(vid)
+            changed = True
+            print(f"Using version {vid} image for bgg_id={r.get('bgg_id') or r.get('id')}")
+    return changed
 
-        try:
-            url = fetch_version(vid)
-            if url:
-                r["image_url"] = url
-                r["image_version_used"] = vid
-                changed = True
-                print(f"Using version {vid} image for bgg_id={r.get('bgg_id') or r.get('id')}")
-            else:
-                print(f"No image for version {vid}")
-        except Exception as e:
-            print(f"Version fetch failed {vid}: {e}")
+def main():
+    with Catalog() as catalog:
+        rows = catalog.rows()
+        if not rows:
+            print("No bgg_data in catalog; skip."); return
 
-    if changed:
-        INOUT.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
-        print("fetch_version_image: updated data/bgg_data.json")
-    else:
-        print("fetch_version_image: no change")
+        if apply_version_images(rows):
+            _, n = catalog.put_rows(rows)
+            print(f"fetch_version_image: updated {n} rows in catalog bgg_data")
+        else:
+            print("fetch_version_image: no change")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fingerprint.py — 逐筆記錄的指紋（sha256）＋增量重建用的快取
+
+    index = RecordIndex(CACHE, salt=code_salt("build_json"))
+    for key, rec in ...:
+        fp = record_digest(rec)
+        hit = index.get(key, fp)          # 指紋一樣 → 上次的結果
+        if hit is None:
+            hit = index.put(key, fp, {"out": expensive(rec)})
+    delta = index.finish()                # 新增／變更／刪除／沿用 各幾筆
+    index.save()
+
+- 快取檔放 data/cache/（不進版控）；salt（通常是程式碼的 hash）不同時整個作廢，改了邏輯就會全部重算
+- 只有真的有變動時才會寫回快取檔
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import pathlib
+import pickle
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+SCRIPTS = pathlib.Path(__file__).resolve().parent
+CHUNK = 64 * 1024
+
+
+def sha256_file(path: pathlib.Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def digest(*values: Any) -> str:
+    """JSON 值的穩定 sha256（key 排序、無空白）；多個值視為一個 list。"""
+    value = values[0] if len(values) == 1 else list(values)
+    blob = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def record_digest(*values: Any) -> str:
+    """
+    逐筆記錄用的快速指紋（pickle + blake2b，約為 digest 的 3 倍快）。
+    對 dict 的 key 順序敏感：順序不同只會被當成「有變」而重算，不會漏算。
+    """
+    return hashlib.blake2b(pickle.dumps(values, protocol=5), digest_size=16).hexdigest()
+
+
+def code_salt(*modules: str) -> str:
+    """scripts/ 底下這些模組原始碼的 hash。"""
+    h = hashlib.sha256()
+    for m in modules:
+        h.update((SCRIPTS / f"{m}.py").read_bytes())
+    return h.hexdigest()
+
+
+@dataclass
+class Delta:
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def summary(self) -> str:
+        return f"新增 {self.added}，變更 {self.changed}，刪除 {self.removed}，沿用 {self.unchanged}"
+
+
+class RecordIndex:
+    """{key: {"fp": 指紋, ...payload}}；get/put 過的 key 視為這次還在，finish() 時其餘的算刪除。"""
+
+    def __init__(self, path: pathlib.Path, salt: str = ""):
+        self.path = path
+        self.salt = salt
+        self.records: Dict[str, Dict] = {}
+        self.meta: Dict[str, Any] = {}
+        self.delta = Delta()
+        self._seen: set = set()
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text("utf-8"))
+        except ValueError:
+            print(f"[WARN] {self.path} 壞掉了，全部重算")
+            return
+        if data.get("salt") != self.salt:
+            self._dirty = True  # 程式改過 → 舊結果不能用
+            return
+        self.records = data.get("records", {})
+        self.meta = data.get("meta", {})
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, key: str, fp: str) -> Optional[Dict]:
+        """指紋相同就回傳上次存的 payload，否則 None（之後應該 put）。"""
+        self._seen.add(key)
+        hit = self.records.get(key)
+        if hit is not None and hit.get("fp") == fp:
+            self.delta.unchanged += 1
+            return hit
+        return None
+
+    def put(self, key: str, fp: str, payload: Dict) -> Dict:
+        self._seen.add(key)
+        if key in self.records:
+            self.delta.changed += 1
+        else:
+            self.delta.added += 1
+        entry = dict(payload, fp=fp)
+        self.records[key] = entry
+        self._dirty = True
+        return entry
+
+    def update(self, key: str, **payload: Any) -> None:
+        """只改 payload（例如輸出位置），不算進 delta。"""
+        self.records[key].update(payload)
+        self._dirty = True
+
+    def finish(self) -> Delta:
+        gone = [k for k in self.records if k not in self._seen]
+        for k in gone:
+            del self.records[k]
+        self.delta.removed += len(gone)
+        if gone:
+            self._dirty = True
+        return self.delta
+
+    def set_meta(self, **kw: Any) -> None:
+        if any(self.meta.get(k) != v for k, v in kw.items()):
+            self.meta.update(kw)
+            self._dirty = True
+
+    def save(self) -> bool:
+        """有變動才寫檔；回傳是否有寫。"""
+        if not self._dirty:
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        body = {"version": 1, "salt": self.salt, "meta": self.meta, "records": self.records}
+        tmp.write_text(json.dumps(body, ensure_ascii=False, separators=(",", ":")), "utf-8")
+        tmp.replace(self.path)
+        self._dirty = False
+        return True
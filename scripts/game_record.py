@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+game_record.py — 各階段共用的遊戲記錄（Game）
+
+以前每個腳本都拿 dict 傳來傳去，各自處理一套舊欄位名（minplayers／min_players、weight／weight_avg、
+rating／rating_avg、usersrated／users_rated、mechanics／mechanisms…），還常常先 dict(rec) 複製一份再改。
+Game 把這些集中在一個地方：
+
+- Game 只是包在原本 dict 外面的一層（__slots__ 只有一個欄位），不會逐欄複製：
+    Game.adopt(rec)      直接接手 rec（之後對 Game 的修改就是對 rec 的修改）；只讀的地方用這個，幾乎不花時間
+    Game.from_dict(rec)  先 dict(rec) 複製一份再接手（跟舊版各腳本開頭的 dict(rec) 一樣的成本），rec 不會被改到
+  記憶體跟直接用 dict 差不多（每筆多一個小外殼，約多 2–3%），目的是省掉複製跟統一欄位名，不是省記憶體
+- 讀取時才對應舊欄位名（ALIASES）：同一個值有好幾個名字時，取第一個有值的（標準名優先）
+- 寫入標準欄位時，記錄裡原本就有的舊名字也一起更新 → 記錄的形狀（新舊欄位名都在）不會變，
+  讀舊名字的下游照常運作
+- 屬性存取：g.year、g.categories = [...]（FIELDS 裡的名字都可以）
+- 也可以當 dict 用：get / [] / in / setdefault / pop，舊欄位名一樣查得到
+  → 還沒改寫的程式（price_rules、apply_taxonomy_and_price…）拿到 Game 也能照常運作
+- raw：底下的 dict（原本的形狀，寫 bgg_data.json 用）
+- to_dict()：只留標準欄位名的新 dict（舊名字換成標準名，其餘照原本的順序），給網站 payload 這類只認標準名的地方
+- to_full()：games_full.json 的形狀（新舊欄位名都寫，網站、舊工具都讀得到；原本 build_json._compat 的邏輯）
+
+要加欄位就加在 FIELDS；舊名字加在 ALIASES。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+FIELDS: Tuple[str, ...] = (
+    "id",
+    "bgg_id",
+    "name",
+    "name_en",
+    "name_zh",
+    "alias_zh",
+    "year",
+    "min_players",
+    "max_players",
+    "min_playtime",
+    "max_playtime",
+    "rating_bayes",
+    "rating_avg",
+    "users_rated",
+    "weight",
+    "categories",
+    "mechanisms",
+    "mechanism_count",
+    "category_zh",
+    "image",
+    "thumbnail",
+    "image_url",
+    "image_override",
+    "image_version_id",
+    "image_version_used",
+    "image_variants",
+    "bgg_url",
+    "source",
+    "description",
+    "search_keywords",
+    "price_msrp_twd",
+    "price_twd",
+    "used_price_twd",
+    "price_note",
+    "used_note",
+    "price_rule",
+    "manual_override",
+    "stock",
+)
+
+# 舊欄位名 → 標準欄位
+ALIASES: Dict[str, str] = {
+    "minplayers": "min_players",
+    "maxplayers": "max_players",
+    "minplaytime": "min_playtime",
+    "maxplaytime": "max_playtime",
+    "usersrated": "users_rated",
+    "weight_avg": "weight",
+    "rating": "rating_avg",
+    "bayes": "rating_bayes",
+    "bayesaverage": "rating_bayes",
+    "mechanics": "mechanisms",
+    "price": "price_twd",
+}
+
+# 標準欄位 → 可以從哪些 key 讀（標準名在前）；直接讀 dict 的程式用這個，不必先轉成 Game
+SOURCES: Dict[str, Tuple[str, ...]] = {f: (f,) for f in FIELDS}
+for _old, _new in ALIASES.items():
+    SOURCES[_new] += (_old,)
+
+# 任一個名字（標準名或舊名）→ 讀取時要依序看的 key
+_LOOKUP: Dict[str, Tuple[str, ...]] = {f: SOURCES[f] for f in FIELDS}
+for _old, _new in ALIASES.items():
+    _LOOKUP[_old] = SOURCES[_new]
+_ALIAS_NAMES = frozenset(ALIASES)
+
+# games_full.json 原樣帶過去的欄位（有值才寫）
+FULL_PASSTHROUGH = (
+    "name_zh",
+    "name_en",
+    "alias_zh",
+    "description",
+    "price_msrp_twd",
+    "price_twd",
+    "used_price_twd",
+    "price_note",
+    "used_note",
+    "price_rule",
+    "category_zh",
+    "manual_override",
+    "stock",
+    "image_override",
+    "image_version_id",
+)
+
+_MISSING = object()
+
+
+def _empty(v: Any) -> bool:
+    return v is None or v == "" or v == "-" or v == []
+
+
+def bgg_url_for(bgg_id: Any) -> Optional[str]:
+    return f"https://boardgamegeek.com/boardgame/{bgg_id}" if bgg_id else None
+
+
+def make_id(rec: Any) -> str:
+    """以名稱 + bgg_id 產生穩定 id（rec 可以是 dict 或 Game）。"""
+    bgg_id = str(rec.get("bgg_id") or "").strip()
+    base = (rec.get("name") or rec.get("name_en") or rec.get("name_zh") or "").strip()
+    slug = base.replace(" ", "_").replace("/", "-")
+    if bgg_id:
+        return f"{slug}-{bgg_id}" if slug else bgg_id
+    return slug or bgg_id or "unknown"
+
+
+def _field(name: str) -> property:
+    def fget(self: "Game") -> Any:
+        v = self.get(name, _MISSING)
+        if v is _MISSING:
+            raise AttributeError(name)
+        return v
+
+    def fset(self: "Game", value: Any) -> None:
+        self[name] = value
+
+    def fdel(self: "Game") -> None:
+        self.pop(name, None)
+
+    return property(fget, fset, fdel)
+
+
+class Game:
+    __slots__ = ("_d",)
+
+    def __init__(self, **fields: Any) -> None:
+        self._d: Dict[str, Any] = {}
+        for k, v in fields.items():
+            self[k] = v
+
+    @classmethod
+    def adopt(cls, rec: Dict[str, Any]) -> "Game":
+        """直接接手 rec（不複製）；rec 已經是 Game 就原樣回傳。"""
+        if isinstance(rec, Game):
+            return rec
+        g = cls.__new__(cls)
+        g._d = rec
+        return g
+
+    @classmethod
+    def from_dict(cls, rec: Dict[str, Any]) -> "Game":
+        """任何一種舊形狀的 dict → 新的 Game（複製一份，不改動 rec）。"""
+        return cls.adopt(dict(rec._d if isinstance(rec, Game) else rec))
+
+    @property
+    def raw(self) -> Dict[str, Any]:
+        return self._d
+
+    # ---- 當 dict 用 ----
+
+    def get(self, key: str, default: Any = None) -> Any:
+        d = self._d
+        sources = _LOOKUP.get(key)
+        if sources is None or len(sources) == 1:
+            return d.get(key if sources is None else sources[0], default)
+        # 同一個值有好幾個名字：第一個有值的；都是空值就取第一個出現的
+        first = _MISSING
+        for k in sources:
+            v = d.get(k, _MISSING)
+            if v is _MISSING:
+                continue
+            if not _empty(v):
+                return v
+            if first is _MISSING:
+                first = v
+        return default if first is _MISSING else first
+
+    def __getitem__(self, key: str) -> Any:
+        v = self.get(key, _MISSING)
+        if v is _MISSING:
+            raise KeyError(key)
+        return v
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        d = self._d
+        sources = _LOOKUP.get(key, (key,))
+        d[sources[0]] = value
+        for k in sources[1:]:
+            if k in d:  # 舊名字也在 → 一起更新，不然讀到的可能是舊值
+                d[k] = value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key: str, default: Any = _MISSING) -> Any:
+        v = self.get(key, _MISSING)
+        if v is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        for k in _LOOKUP.get(key, (key,)):
+            self._d.pop(k, None)
+        return v
+
+    def _names(self) -> Iterable[str]:
+        """標準欄位名（照原本的順序）；沒有舊名字時就是底下 dict 的 keys，不另外建東西。"""
+        d = self._d
+        if d.keys().isdisjoint(_ALIAS_NAMES):
+            return d.keys()
+        return dict.fromkeys(ALIASES.get(k, k) for k in d).keys()
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._names())
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        get = self.get
+        return ((k, get(k)) for k in self._names())
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return len(self._names())
+
+    def __eq__(self, other: Any) -> bool:
+        # 跟 Game 比：兩邊都換成標準名再比；跟 dict 比：dict 照原樣（跟 to_dict() 比）
+        d = self._d
+        is_game = isinstance(other, Game)
+        if is_game:
+            other = other._d
+        if not isinstance(other, dict):
+            return False
+        if d.keys().isdisjoint(_ALIAS_NAMES) and (not is_game or other.keys().isdisjoint(_ALIAS_NAMES)):
+            return d == other  # 沒有舊名字時 to_dict() 就是 d 的複本，直接比
+        return self.to_dict() == (Game.adopt(other).to_dict() if is_game else other)
+
+    __hash__ = None  # 可變物件，跟 dict 一樣不能當 key
+
+    def __repr__(self) -> str:
+        return f"Game({self.to_dict()!r})"
+
+    def copy(self) -> "Game":
+        return Game.from_dict(self._d)
+
+    # ---- 轉回 JSON 形狀 ----
+
+    def to_dict(self) -> Dict[str, Any]:
+        """只留標準欄位名的新 dict：舊名字換成標準名（值照 get 的規則），其餘 key 照原本的順序。"""
+        d = self._d
+        if d.keys().isdisjoint(_ALIAS_NAMES):
+            return dict(d)
+        out: Dict[str, Any] = {}
+        for k in d:
+            name = ALIASES.get(k, k)
+            if name not in out:
+                out[name] = self.get(name)
+        return out
+
+    def to_full(self) -> Dict[str, Any]:
+        """games_full.json 的一筆：新舊欄位名都寫、補上 id / name / bgg_url / mechanism_count / source。"""
+        get = self.get
+        mechanisms = get("mechanisms") or []
+        out: Dict[str, Any] = {
+            "id": make_id(self),
+            "name": get("name") or get("name_en") or get("name_zh") or "",
+            "year": get("year"),
+            "minplayers": get("min_players"),
+            "maxplayers": get("max_players"),
+            "minplaytime": get("min_playtime"),
+            "maxplaytime": get("max_playtime"),
+            "weight": get("weight"),
+            "weight_avg": get("weight"),
+            "rating_avg": get("rating_avg") or None,  # BGG 沒人評分時是 0.0，當成沒有
+            "rating": get("rating_avg") or None,
+            "rating_bayes": get("rating_bayes"),
+            "users_rated": get("users_rated"),
+            "usersrated": get("users_rated"),
+            "image": get("image"),
+            "thumbnail": get("thumbnail"),
+            "categories": get("categories") or [],
+            "mechanisms": mechanisms,
+            "mechanism_count": get("mechanism_count") or len(mechanisms),
+            "source": get("source") or "bgg",
+            "bgg_id": get("bgg_id"),
+        }
+        bgg_url = get("bgg_url") or bgg_url_for(get("bgg_id"))
+        if bgg_url:
+            out["bgg_url"] = bgg_url
+        for key in FULL_PASSTHROUGH:
+            v = get(key)
+            if v not in (None, ""):
+                out[key] = v
+        if isinstance(get("search_keywords"), list):
+            out["search_keywords"] = get("search_keywords")
+        return out
+
+
+for _f in FIELDS:
+    setattr(Game, _f, _field(_f))
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+image_store.py — site/assets/img 的內容定址（content-addressed）圖檔倉庫
+
+結構：
+    site/assets/img/manifest.json      邏輯檔名 → {url, etag, last_modified, size, sha256, object, checked_at}
+    site/assets/img/o/{sha16}{ext}     實體檔案，以內容 sha256 前 16 碼命名
+    site/assets/img/v/...              build_image_variants.py 的衍生圖
+
+- 邏輯檔名沿用 download_images 的 {bgg_id}-{md5(url)[:8]}{ext}，只存在 manifest 裡
+- 內容相同的圖（不同遊戲、不同網址）只會存一份 o/ 檔案
+- 舊版直接放在 site/assets/img/ 底下的檔案，會在 download_images 執行時自動收編搬進 o/
+
+指令：
+    python scripts/image_store.py verify [--fix]   # 離線比對 manifest（大小＋sha256）
+    python scripts/image_store.py gc [--apply]     # 找出沒有任何遊戲用到的檔案；--apply 才真的刪
+    python scripts/image_store.py gc --dir assets/img   # 也可以檢查其他（舊的）圖檔目錄
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import threading
+import time
+from email.utils import formatdate
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from common_image import VARIANT_WEB_PREFIX, image_filename, normalize_bgg_image_url
+from fingerprint import sha256_file
+from site_payload import load as load_site_payload
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+STORE_DIR = ROOT / "site" / "assets" / "img"
+GAMES_JSON = ROOT / "site" / "data" / "games.json"
+BGG_JSON = ROOT / "data" / "bgg_data.json"
+FULL_JSON = ROOT / "data" / "games_full.json"
+
+MANIFEST_NAME = "manifest.json"
+OBJECT_DIR = "o"
+VARIANT_DIR = "v"
+
+
+def object_name(sha256: str, logical: str) -> str:
+    return sha256[:16] + (pathlib.PurePath(logical).suffix.lower() or ".jpg")
+
+
+class ImageStore:
+    """manifest＋o/ 目錄；多執行緒共用時，修改 manifest 的操作都有加鎖。"""
+
+    def __init__(self, root: pathlib.Path = STORE_DIR):
+        self.root = root
+        self.objects = root / OBJECT_DIR
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.files: Dict[str, Dict] = self._load()
+        self._lock = threading.Lock()
+
+    # ------------------------------
+    # manifest
+    # ------------------------------
+    def _load(self) -> Dict[str, Dict]:
+        path = self.root / MANIFEST_NAME
+        if not path.exists():
+            return {}
+        try:
+            data = json.loads(path.read_text("utf-8"))
+        except ValueError:
+            print(f"[WARN] {path} 壞掉了，當作空的 manifest")
+            return {}
+        files = data.get("files", {}) if isinstance(data, dict) else {}
+        # version 1 的 manifest 沒有 object 欄位 → 補上（實體檔由 adopt 時搬移）
+        for logical, entry in files.items():
+            if entry.get("sha256") and not entry.get("object"):
+                entry["object"] = object_name(entry["sha256"], logical)
+        return files
+
+    def save(self) -> None:
+        path = self.root / MANIFEST_NAME
+        tmp = path.with_suffix(".tmp")
+        with self._lock:
+            body = {"version": 2, "files": dict(sorted(self.files.items()))}
+            tmp.write_text(json.dumps(body, ensure_ascii=False, indent=1), "utf-8")
+        tmp.replace(path)
+
+    def get(self, logical: str) -> Optional[Dict]:
+        return self.files.get(logical)
+
+    def path_of(self, logical: str) -> Optional[pathlib.Path]:
+        """邏輯檔名 → 實體檔路徑（不存在則 None）。"""
+        entry = self.files.get(logical)
+        if entry and entry.get("object"):
+            p = self.objects / entry["object"]
+            if p.exists():
+                return p
+        return None
+
+    def has(self, logical: str) -> bool:
+        return self.path_of(logical) is not None
+
+    # ------------------------------
+    # 寫入
+    # ------------------------------
+    def part_path(self, logical: str) -> pathlib.Path:
+        return self.objects / f".{logical}.part"
+
+    def commit(self, part: pathlib.Path, logical: str, meta: Dict) -> bool:
+        """
+        把下載完成的 .part 收進倉庫；meta 需含 sha256。
+        內容已存在（別的邏輯檔名有同樣的圖）就丟掉 .part，回傳 False（= 去重）。
+        """
+        obj = object_name(meta["sha256"], logical)
+        dst = self.objects / obj
+        with self._lock:
+            if dst.exists():
+                part.unlink(missing_ok=True)
+                stored = False
+            else:
+                os.replace(part, dst)
+                stored = True
+            self.files[logical] = dict(meta, object=obj, checked_at=time.time())
+        return stored
+
+    def adopt(self, legacy: pathlib.Path, logical: str, url: str) -> Dict:
+        """把舊版直接放在 root 的檔案搬進 o/（只在本機算 hash，不連網）。"""
+        st = legacy.stat()
+        sha = sha256_file(legacy)
+        entry = {
+            "url": url,
+            "etag": None,
+            # 舊檔沒有 validator → 拿檔案時間當 Last-Modified，之後就能發條件式請求
+            "last_modified": formatdate(st.st_mtime, usegmt=True),
+            "size": st.st_size,
+            "sha256": sha,
+        }
+        obj = object_name(sha, logical)
+        with self._lock:
+            if (self.objects / obj).exists():
+                legacy.unlink()
+            else:
+                os.replace(legacy, self.objects / obj)
+            self.files[logical] = dict(entry, object=obj, checked_at=time.time())
+        return self.files[logical]
+
+    def touch(self, logical: str) -> None:
+        with self._lock:
+            self.files[logical]["checked_at"] = time.time()
+
+    def drop(self, logical: str) -> None:
+        with self._lock:
+            self.files.pop(logical, None)
+
+    # ------------------------------
+    # 檢查
+    # ------------------------------
+    def verify(self, fix: bool = False) -> int:
+        """離線比對 manifest：缺檔、大小不符、sha256 不符；回傳問題數。"""
+        bad: List[Tuple[str, str]] = []
+        checked: Dict[str, Optional[str]] = {}
+        for logical, entry in self.files.items():
+            obj = entry.get("object") or ""
+            path = self.objects / obj
+            if obj not in checked:
+                if not obj or not path.exists():
+                    checked[obj] = "missing"
+                elif path.stat().st_size != entry.get("size"):
+                    checked[obj] = f"size {path.stat().st_size} != {entry.get('size')}"
+                elif sha256_file(path) != entry.get("sha256"):
+                    checked[obj] = "sha256 mismatch"
+                else:
+                    checked[obj] = None
+            if checked[obj]:
+                bad.append((logical, checked[obj]))
+
+        objects = {p.name for p in self.objects.iterdir() if p.is_file() and not p.name.startswith(".")}
+        untracked = objects - {e.get("object") for e in self.files.values()}
+        for logical, why in bad:
+            print(f"[BAD] {logical}: {why}")
+        print(
+            f"verify: manifest={len(self.files)} objects={len(objects)} ok={len(self.files) - len(bad)} "
+            f"bad={len(bad)} untracked={len(untracked)}"
+        )
+
+        if fix and bad:
+            for logical, _ in bad:
+                obj = self.files[logical].get("object")
+                if obj:
+                    (self.objects / obj).unlink(missing_ok=True)
+                self.drop(logical)
+            self.save()
+            print(f"[INFO] 已移除 {len(bad)} 個壞檔／失效項目，下次執行會重新下載")
+        return len(bad)
+
+
+# ------------------------------
+# GC
+# ------------------------------
+def referenced(games_json: pathlib.Path = GAMES_JSON, bgg_json: pathlib.Path = BGG_JSON,
+               full_json: pathlib.Path = FULL_JSON) -> Tuple[Set[str], Set[str]]:
+    """
+    回傳 (邏輯檔名集合, 衍生圖檔名集合)。引用的範圍跟 download_images 下載的範圍一致，
+    否則 gc 刪掉的圖下次又會被抓回來：
+    - bgg_data.json 的每一筆（不管有沒有上架、有沒有被 manual_override 濾掉）：image_url / image / thumbnail
+    - games_full.json、games.json 每一筆的 image / thumbnail / image_url，以及 image_variants 的 src / srcset
+    """
+    logical: Set[str] = set()
+    variants: Set[str] = set()
+
+    def add(bid, url) -> None:
+        u = normalize_bgg_image_url(url)
+        if bid and u:
+            logical.add(image_filename(bid, u))
+
+    for r in _load_rows(bgg_json):
+        # 跟 download_images.plan_downloads 挑網址的順序一樣
+        add(r.get("bgg_id"), r.get("image_url") or r.get("image") or r.get("thumbnail"))
+    for path in (full_json, games_json):
+        for r in _load_rows(path):
+            for key in ("image", "thumbnail", "image_url"):
+                add(r.get("bgg_id"), r.get(key))
+            v = r.get("image_variants") or {}
+            for src in [v.get("src", "")] + [p for s in (v.get("srcset") or {}).values() for p in s.split(",")]:
+                src = src.strip().split(" ")[0]
+                if src.startswith(VARIANT_WEB_PREFIX):
+                    variants.add(src[len(VARIANT_WEB_PREFIX):])
+    return logical, variants
+
+
+def _load_rows(path: pathlib.Path) -> List[Dict]:
+    if not path.exists():
+        return []
+    data = json.loads(path.read_text("utf-8"))
+    if isinstance(data, dict) and "schema" in data:
+        data = load_site_payload(path)  # 網站用的精簡格式：清單＋明細
+    elif isinstance(data, dict):
+        data = data.get("rows") or data.get("games") or []
+    return [r for r in data if isinstance(r, dict)]
+
+
+def _size(paths: Iterable[pathlib.Path]) -> int:
+    return sum(p.stat().st_size for p in paths if p.exists())
+
+
+def gc(root: pathlib.Path = STORE_DIR, apply: bool = False, games_json: pathlib.Path = GAMES_JSON) -> Dict[str, int]:
+    """
+    找出沒有任何遊戲用到的檔案（範圍見 referenced：bgg_data.json＋games_full.json＋games.json）：
+    - manifest 項目沒被引用 → 移除；其 o/ 物件若也沒有別的項目用 → 刪除
+    - v/ 衍生圖沒被引用 → 刪除
+    - root 底下的舊版散檔沒被引用 → 刪除；有被引用的留著（download_images 收編時會去重），
+      重複內容只計入 duplicate_bytes
+    apply=False 時只報告不刪。
+    """
+    logical_refs, variant_refs = referenced(games_json)
+    has_manifest = (root / MANIFEST_NAME).exists()
+    store = ImageStore(root) if has_manifest else None
+    doomed: List[pathlib.Path] = []
+    dropped: List[str] = []
+
+    if store is not None:
+        dropped = [lg for lg in store.files if lg not in logical_refs]
+        live_objects = {e.get("object") for lg, e in store.files.items() if lg in logical_refs}
+        doomed += [p for p in store.objects.iterdir() if p.is_file() and p.name not in live_objects]
+
+    vdir = root / VARIANT_DIR
+    if vdir.exists():
+        doomed += [p for p in vdir.iterdir() if p.is_file() and p.name not in variant_refs]
+
+    # root 底下的散檔：沒被引用的刪；被引用的只統計重複內容
+    seen: Set[str] = set()
+    duplicate = 0
+    for p in sorted(root.iterdir()):
+        if not p.is_file() or p.name == MANIFEST_NAME or p.suffix == ".tmp":
+            continue
+        if p.name not in logical_refs:
+            doomed.append(p)
+            continue
+        sha = sha256_file(p)
+        if sha in seen:
+            duplicate += p.stat().st_size
+        seen.add(sha)
+
+    before = _size(q for q in root.rglob("*") if q.is_file())
+    reclaim = _size(doomed)
+    report = {
+        "files_before": sum(1 for q in root.rglob("*") if q.is_file()),
+        "bytes_before": before,
+        "unreferenced_files": len(doomed),
+        "dropped_manifest_entries": len(dropped),
+        "bytes_reclaimed": reclaim,
+        "bytes_after": before - reclaim,
+        "duplicate_bytes": duplicate,
+        "applied": int(apply),
+    }
+    for p in doomed:
+        print(f"[GC] {'rm' if apply else 'would rm'} {p.relative_to(root)} ({p.stat().st_size} bytes)")
+    if apply:
+        for p in doomed:
+            p.unlink(missing_ok=True)
+        if store is not None and dropped:
+            for lg in dropped:
+                store.drop(lg)
+            store.save()
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="site/assets/img 內容定址倉庫工具")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    v = sub.add_parser("verify", help="離線比對 manifest")
+    v.add_argument("--fix", action="store_true", help="刪掉壞檔，下次重新下載")
+    g = sub.add_parser("gc", help="找出／刪除沒有任何遊戲用到的圖檔")
+    g.add_argument("--apply", action="store_true", help="真的刪除（預設只報告）")
+    g.add_argument("--dir", type=pathlib.Path, action="append", help="要檢查的目錄（預設 site/assets/img，可重複）")
+    args = ap.parse_args()
+
+    if args.cmd == "verify":
+        raise SystemExit(1 if ImageStore().verify(fix=args.fix) else 0)
+
+    for d in args.dir or [STORE_DIR]:
+        d = d if d.is_absolute() else (ROOT / d)
+        r = gc(d, apply=args.apply)
+        mb = 1 / 2**20
+        print(
+            f"image_store gc {d.relative_to(ROOT)}: 檔案 {r['files_before']} 個 {r['bytes_before'] * mb:.1f} MB；"
+            f"未引用／重複 {r['unreferenced_files']} 個，"
+            f"{'已回收' if args.apply else '可回收'} {r['bytes_reclaimed'] * mb:.1f} MB "
+            f"→ {r['bytes_after'] * mb:.1f} MB"
+            + ("" if args.apply else "（加 --apply 才會刪除）")
+        )
+        if r["duplicate_bytes"]:
+            print(f"[INFO] 另有 {r['duplicate_bytes'] * mb:.1f} MB 是被引用的重複內容，download_images 收編進 o/ 時會只留一份")
+
+
+if __name__ == "__main__":
+    main()
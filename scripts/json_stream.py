@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+json_stream.py — 邊產生邊寫出 JSON 陣列，不用先把整個 list 放在記憶體
+
+    with JsonArrayWriter(path) as w:
+        for rec in records:
+            w.write(rec)
+
+- 輸出跟 json.dumps(list, ensure_ascii=False, indent=2) 逐字相同（indent=None 則為壓縮格式）
+- 先寫到 .tmp，全部寫完才 replace，中途失敗不會留下寫一半的檔案
+- write / write_fragment 會回傳該元素在檔案裡的 byte 範圍 [start, end)；
+  增量重建時可以從上次的輸出檔直接切出沒變的元素，不必重新序列化
+"""
+
+from __future__ import annotations
+
+import json
+import pathlib
+from typing import Any, Optional, Tuple
+
+
+def encode(obj: Any, indent: Optional[int] = 2) -> str:
+    """單一元素的 JSON 文字（跟 json.dumps 同格式）。"""
+    if indent is None:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(obj, ensure_ascii=False, indent=indent)
+
+
+class JsonArrayWriter:
+    def __init__(self, path: pathlib.Path, indent: Optional[int] = 2):
+        self.path = path
+        self.indent = indent
+        self.count = 0
+        self.pos = 0  # 目前寫到第幾個 byte
+        self._tmp = path.with_suffix(path.suffix + ".tmp")
+        self._fh = None
+        self._pad = b"" if indent is None else b"\n" + b" " * indent
+
+    def __enter__(self) -> "JsonArrayWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = self._tmp.open("wb")
+        self._put(b"[")
+        return self
+
+    def _put(self, data: bytes) -> None:
+        self._fh.write(data)
+        self.pos += len(data)
+
+    def fragment(self, text: str) -> bytes:
+        """encode() 的結果 → 它在這個檔案裡的樣子（陣列元素多一層縮排）。"""
+        if self.indent is None:
+            return text.encode("utf-8")
+        return text.replace("\n", "\n" + " " * self.indent).encode("utf-8")
+
+    def write(self, obj: Any) -> Tuple[int, int]:
+        return self.write_fragment(self.fragment(encode(obj, self.indent)))
+
+    def write_fragment(self, frag: bytes) -> Tuple[int, int]:
+        """寫入 fragment()（或從同樣 indent 的舊輸出檔切出來的一段）；回傳它的 [start, end)。"""
+        if self.count:
+            self._put(b",")
+        self._put(self._pad)
+        start = self.pos
+        self._put(frag)
+        self.count += 1
+        return start, self.pos
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self._fh.close()
+            self._tmp.unlink(missing_ok=True)
+            return
+        if self.count and self.indent is not None:
+            self._put(b"\n")
+        self._put(b"]")
+        self._fh.close()
+        self._tmp.replace(self.path)
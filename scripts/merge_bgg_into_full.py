@@ -4,8 +4,8 @@
 merge_bgg_into_full.py — 評分＋圖片＋分類／機制 merge 版
 
 用途：
-- 從 data/bgg_data.json 讀取 BGG 資料
-- 依 bgg_id 對應到 data/games_full.json
+- 從本機目錄（catalog.py）的 bgg_data 表讀取 BGG 資料（data/bgg_data.json 比較新時先匯入）
+- 依 bgg_id 對應到目錄 built 表裡的 games_full 記錄（也就是 data/games_full.json 的內容）
 - 補上／更新：
     * rating_bayes
     * rating_avg
@@ -15,11 +15,20 @@ merge_bgg_into_full.py — 評分＋圖片＋分類／機制 merge 版
     * image（只補原本沒有的）
 
 會先把舊的 games_full.json 備份成 data/games_full_before_merge.json
+
+讀寫都走目錄：
+- games_full.json 要是目錄記下的那份（build_json 寫的、之後沒被別的程式動過），不然先跑 build_json.py
+- 記錄從 built 表逐筆串流讀出；merge 是冪等的，比對本身很便宜，只有真的被改到的記錄才寫回 built
+  （一個 transaction），再從 built 匯出 games_full.json；沒有任何一筆被改到就什麼都不寫
+- 被改過的記錄指紋會清掉 → 下一次 build_json 以 bgg_data 為準重算這幾筆
 """
 
-import json
 import pathlib
 import shutil
+import time
+
+from catalog import Catalog
+from game_record import Game
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 FULL = ROOT / "data" / "games_full.json"
@@ -34,12 +43,81 @@ def norm_id(x):
     return s or None
 
 
+def pick(src: dict, *keys):
+    """從 src 中依序取第一個有值的 key。"""
+    for k in keys:
+        if k in src and src[k] not in (None, "", "-"):
+            return src[k]
+    return None
+
+
+def merge_record(g: dict, src: dict) -> dict:
+    """把 src（BGG 記錄）補進 g（就地修改）；回傳這次動到哪幾類欄位。"""
+    # ---------- 評分欄位 ----------
+    before = (
+        g.get("rating_bayes"),
+        g.get("rating_avg"),
+        g.get("users_rated"),
+        g.get("weight"),
+    )
+
+    src = Game.adopt(src)  # 只讀；BGG 記錄的舊欄位名（rating、usersrated、weight_avg…）由 Game 對應
+    rb = pick(src, "rating_bayes")
+    ra = pick(src, "rating_avg")
+    ur = pick(src, "users_rated")
+    wt = pick(src, "weight")
+
+    if rb is not None:
+        g["rating_bayes"] = rb
+    if ra is not None:
+        g["rating_avg"] = ra
+    if ur is not None:
+        g["users_rated"] = ur
+    if wt is not None:
+        g["weight"] = wt
+
+    after = (
+        g.get("rating_bayes"),
+        g.get("rating_avg"),
+        g.get("users_rated"),
+        g.get("weight"),
+    )
+
+    # ---------- 分類／機制：只補空的 ----------
+    cats_src = src.get("categories") or []
+    mechs_src = src.get("mechanisms") or []
+    changed_cm = False
+
+    if cats_src and not g.get("categories"):
+        g["categories"] = cats_src
+        changed_cm = True
+    if mechs_src and not g.get("mechanisms"):
+        g["mechanisms"] = mechs_src
+        changed_cm = True
+
+    # ---------- 圖片：只補沒有的 ----------
+    changed_img = False
+    if not g.get("image"):
+        img = src.get("image") or src.get("thumbnail")
+        if img:
+            g["image"] = img
+            changed_img = True
+
+    return {"rating": after != before, "cats_mech": changed_cm, "image": changed_img}
+
+
 def main():
-    if not FULL.exists():
-        print(f"[ERR] 找不到 {FULL}")
+    with Catalog() as catalog:
+        merge(catalog)
+
+
+def merge(catalog: Catalog) -> None:
+    bgg_data = catalog.rows(BGG)
+    if not bgg_data:
+        print(f"[ERR] 目錄跟 {BGG} 都沒有 BGG 資料")
         return
-    if not BGG.exists():
-        print(f"[ERR] 找不到 {BGG}")
+    if not catalog.output_current(FULL):
+        print(f"[ERR] {FULL} 不是目錄記下的那份（還沒跑過 build_json，或檔案被別的程式改過）；先跑 build_json.py")
         return
 
     # 備份一份舊的 games_full.json
@@ -49,8 +127,6 @@ def main():
     else:
         print(f"[INFO] 已存在備份：{BACKUP}（不覆蓋）")
 
-    full_data = json.loads(FULL.read_text("utf-8"))
-    bgg_data = json.loads(BGG.read_text("utf-8"))
     print(f"[INFO] BGG 資料筆數：{len(bgg_data)}")
 
     # 依 bgg_id 建索引
@@ -60,19 +136,16 @@ def main():
         if bid:
             bgg_by_id[bid] = r
 
+    t0 = time.monotonic()
+    total = 0
     matched = 0
     rating_upd = 0
     img_upd = 0
     cats_mech_upd = 0
+    updates = []
 
-    def pick(src: dict, *keys):
-        """從 src 中依序取第一個有值的 key。"""
-        for k in keys:
-            if k in src and src[k] not in (None, "", "-"):
-                return src[k]
-        return None
-
-    for g in full_data:
+    for key, g in catalog.iter_built_items():
+        total += 1
         bid = norm_id(g.get("bgg_id"))
         if not bid:
             continue
@@ -82,68 +155,28 @@ def main():
             continue
 
         matched += 1
-
-        # ---------- 評分欄位 ----------
-        before = (
-            g.get("rating_bayes"),
-            g.get("rating_avg"),
-            g.get("users_rated"),
-            g.get("weight"),
-        )
-
-        rb = pick(src, "rating_bayes", "bayes", "bayesaverage")
-        ra = pick(src, "rating_avg", "rating")
-        ur = pick(src, "users_rated", "usersrated")
-        wt = pick(src, "weight", "weight_avg")
-
-        if rb is not None:
-            g["rating_bayes"] = rb
-        if ra is not None:
-            g["rating_avg"] = ra
-        if ur is not None:
-            g["users_rated"] = ur
-        if wt is not None:
-            g["weight"] = wt
-
-        after = (
-            g.get("rating_bayes"),
-            g.get("rating_avg"),
-            g.get("users_rated"),
-            g.get("weight"),
-        )
-        if after != before:
-            rating_upd += 1
-
-        # ---------- 分類／機制：只補空的 ----------
-        cats_src = src.get("categories") or []
-        mechs_src = src.get("mechanisms") or []
-        changed_cm = False
-
-        if cats_src and not g.get("categories"):
-            g["categories"] = cats_src
-            changed_cm = True
-        if mechs_src and not g.get("mechanisms"):
-            g["mechanisms"] = mechs_src
-            changed_cm = True
-
-        if changed_cm:
-            cats_mech_upd += 1
-
-        # ---------- 圖片：只補沒有的 ----------
-        if not g.get("image"):
-            img = src.get("image") or src.get("thumbnail")
-            if img:
-                g["image"] = img
-                img_upd += 1
-
-    FULL.write_text(json.dumps(full_data, ensure_ascii=False, indent=2), "utf-8")
-
-    print(f"[OK] merge_bgg_into_full 完成；總筆數={len(full_data)}")
-    print(f"     有對到 BGG 的遊戲：{matched}")
+        merged = dict(g)
+        flags = merge_record(merged, src)
+        rating_upd += flags["rating"]
+        cats_mech_upd += flags["cats_mech"]
+        img_upd += flags["image"]
+        if merged != g:
+            updates.append((key, merged))
+
+    if updates:
+        # 記錄跟輸出檔一起換：匯出失敗就整個 rollback，built 跟 games_full.json 不會對不上
+        with catalog.transaction():
+            catalog.put_built_records(updates)
+            catalog.export_built(FULL)
+
+    print(f"[OK] merge_bgg_into_full 完成；總筆數={total}")
+    print(f"     有對到 BGG 的遊戲：{matched}（改到 {len(updates)} 筆，寫回目錄 built）")
     print(f"     評分／評分人數欄位更新：{rating_upd} 次")
     print(f"     圖片更新（含補空白）：{img_upd} 筆")
     print(f"     補上分類／機制：{cats_mech_upd} 筆")
-
+    if not updates:
+        print("[INFO] 沒有任何遊戲被更新，games_full.json 維持原樣")
+    print(f"[STAT] merge_bgg_into_full {time.monotonic() - t0:.3f}s")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+metrics.py — 每次跑管線的各階段指標（寫成 JSON 報告）＋選用的 cProfile
+
+    run = RunMetrics(profile=True)
+    with run.stage("build_json", records_in=len(rows)) as m:
+        ...
+        m.records_out = len(games)
+    run.write()                # → data/cache/runs/<run_id>.json（不進版控）
+
+每個階段記：
+- wall_s / cpu_s：牆鐘時間、這個階段所在執行緒的 CPU 時間（time.thread_time；解析用的子程序不算在內）
+- peak_rss_mb：階段執行期間取樣到的最高 RSS（背景執行緒每 RSS_INTERVAL 秒讀一次 /proc/self/statm；
+  沒有 /proc 的系統退回 ru_maxrss，也就是整個程序到目前為止的最高值）。平行跑的階段共用同一個程序，數字會互相包含
+- records_in / records_out：上游給的筆數、這個階段輸出的筆數
+- http：階段裡建立的每個 rate_limit.FetchStats 都會自動記進來（requests / ok / failed / 回應快取命中 cached / 202、429… 重試次數 /
+  bytes / 令牌桶等待 / 退避 sleep）；沒有用 FetchStats 的地方用 add_http() 自己報
+- profile（--profile 時）：該階段的 cProfile 存成 <run_id>/<stage>.prof（可以用 snakeviz、pstats 看），
+  報告裡另外放 cumtime 前 PROFILE_TOP 名，以及 sleep／等鎖的總時間（分得出慢是在睡、在解析還是在序列化）
+
+階段裡的程式用 current() 拿到目前階段的指標（每個執行緒各自的；不在階段裡就是 None）。
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import os
+import pathlib
+import pstats
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource  # Unix 才有；沒有就不記 RSS
+except ImportError:
+    resource = None
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+RUNS_DIR = ROOT / "data" / "cache" / "runs"
+
+REPORT_VERSION = 1
+RSS_INTERVAL = float(os.getenv("METRICS_RSS_INTERVAL", "0.05"))
+PROFILE_TOP = 25
+# 這些內建函式的時間算「在等」：sleep、等鎖（queue、Future 都是等鎖）、等 socket
+WAIT_FUNCS = re.compile(r"\b(sleep|acquire|select|poll|recv_into)\b")
+
+_local = threading.local()
+
+
+def _rss_bytes() -> Optional[int]:
+    """目前的 RSS；沒有 /proc 就回傳 ru_maxrss（最高值）。"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb if sys.platform == "darwin" else kb * 1024  # macOS 的單位是 byte
+
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return None if n is None else round(n / 2**20, 1)
+
+
+class StageMetrics:
+    """一個階段的指標；由 RunMetrics.stage() 建立。"""
+
+    def __init__(self, name: str, records_in: Optional[int] = None):
+        self.name = name
+        self.status = "running"
+        self.records_in = records_in
+        self.records_out: Optional[int] = None
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.rss_start: Optional[int] = _rss_bytes()
+        self.rss_peak: Optional[int] = self.rss_start
+        self.http: Dict[str, Any] = {}
+        self.profile: Optional[Dict[str, Any]] = None
+        self._fetch_stats: List[Any] = []
+        self._lock = threading.Lock()
+
+    def sample(self, rss: Optional[int]) -> None:
+        if rss is not None and (self.rss_peak is None or rss > self.rss_peak):
+            self.rss_peak = rss
+
+    def add_http(self, retries: Optional[Dict[Any, int]] = None, **counts: float) -> None:
+        """requests / ok / failed / items / bytes / wait_s / sleep_s 累加；retries = {狀態碼: 次數}。"""
+        with self._lock:
+            for k, v in counts.items():
+                self.http[k] = self.http.get(k, 0) + v
+            if retries:
+                r = self.http.setdefault("retries", {})
+                for status, n in retries.items():
+                    r[str(status)] = r.get(str(status), 0) + n
+
+    def _collect_http(self) -> None:
+        for st in self._fetch_stats:
+            self.add_http(
+                retries=st.retries, requests=st.requests, ok=st.ok, failed=st.failed, cached=st.cached, items=st.items,
+                bytes=st.bytes, wait_s=round(st.wait_sec, 3), sleep_s=round(st.sleep_sec, 3),
+            )
+        self._fetch_stats.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.status not in ("ok", "failed"):  # 跳過、被擋下的階段只記狀態
+            return {"status": self.status}
+        out: Dict[str, Any] = {
+            "status": self.status,
+            "wall_s": round(self.wall_s, 3),
+            "cpu_s": round(self.cpu_s, 3),
+            "rss_start_mb": _mb(self.rss_start),
+            "peak_rss_mb": _mb(self.rss_peak),
+            "records_in": self.records_in,
+            "records_out": self.records_out,
+        }
+        if self.http:
+            out["http"] = self.http
+        if self.profile:
+            out["profile"] = self.profile
+        return out
+
+
+def current() -> Optional[StageMetrics]:
+    """這個執行緒正在跑的階段；不在階段裡就是 None。"""
+    return getattr(_local, "stage", None)
+
+
+def attach_http(stats: Any) -> None:
+    """FetchStats 建立時呼叫：階段結束時把它的計數記進該階段。"""
+    m = current()
+    if m is not None:
+        m._fetch_stats.append(stats)
+
+
+def add_http(**counts: Any) -> None:
+    """沒有用 FetchStats 的地方（例如下載圖片）直接報 HTTP 計數給目前的階段。"""
+    m = current()
+    if m is not None:
+        m.add_http(**counts)
+
+
+def _profile_summary(prof: cProfile.Profile) -> Dict[str, Any]:
+    st = pstats.Stats(prof, stream=io.StringIO())
+    rows = []
+    wait = 0.0
+    for (filename, line, func), (_, ncalls, tottime, cumtime, _) in st.stats.items():
+        if filename == "~" and WAIT_FUNCS.search(func):  # 內建函式，例如 <built-in method time.sleep>
+            wait += tottime
+        rows.append({"function": f"{pathlib.PurePath(filename).name}:{line}({func})", "ncalls": ncalls,
+                     "tottime": round(tottime, 4), "cumtime": round(cumtime, 4)})
+    rows.sort(key=lambda r: r["cumtime"], reverse=True)
+    return {"total_s": round(st.total_tt, 3), "wait_s": round(wait, 3), "top": rows[:PROFILE_TOP]}
+
+
+class RunMetrics:
+    """一次執行（整條管線）的指標：各階段＋整體。"""
+
+    def __init__(self, profile: bool = False, out_dir: pathlib.Path = RUNS_DIR):
+        self.run_id = time.strftime("%Y%m%d-%H%M%S")
+        self.profile = profile
+        self.out_dir = out_dir
+        self.started_at = time.time()
+        self._t0 = time.monotonic()
+        self._cpu0 = time.process_time()
+        self.stages: Dict[str, StageMetrics] = {}
+        self.rss_peak: Optional[int] = _rss_bytes()
+        self._active: List[StageMetrics] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="metrics-rss", daemon=True)
+        self._sampler.start()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(RSS_INTERVAL):
+            rss = _rss_bytes()
+            with self._lock:
+                if rss is not None and (self.rss_peak is None or rss > self.rss_peak):
+                    self.rss_peak = rss
+                for m in self._active:
+                    m.sample(rss)
+
+    def mark(self, name: str, status: str) -> None:
+        """沒有執行的階段（跳過、上游失敗）也記一筆狀態。"""
+        with self._lock:
+            self.stages.setdefault(name, StageMetrics(name)).status = status
+
+    @contextmanager
+    def stage(self, name: str, records_in: Optional[int] = None) -> Iterator[StageMetrics]:
+        m = StageMetrics(name, records_in)
+        with self._lock:
+            self.stages[name] = m
+            self._active.append(m)
+        _local.stage = m
+        prof = cProfile.Profile() if self.profile else None
+        t0, cpu0 = time.monotonic(), time.thread_time()
+        if prof is not None:
+            prof.enable()
+        try:
+            yield m
+            m.status = "ok"
+        except BaseException:
+            m.status = "failed"
+            raise
+        finally:
+            if prof is not None:
+                prof.disable()
+            m.wall_s = time.monotonic() - t0
+            m.cpu_s = time.thread_time() - cpu0
+            m.sample(_rss_bytes())
+            _local.stage = None
+            with self._lock:
+                self._active.remove(m)
+            m._collect_http()
+            if prof is not None:
+                path = self.out_dir / self.run_id / f"{name}.prof"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                prof.dump_stats(str(path))
+                m.profile = dict(_profile_summary(prof), file=str(path))
+
+    def report(self) -> Dict[str, Any]:
+        cpu_children = None
+        if resource is not None:
+            ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+            cpu_children = round(ru.ru_utime + ru.ru_stime, 3)
+        with self._lock:
+            stages = {name: m.to_dict() for name, m in self.stages.items()}
+        return {
+            "version": REPORT_VERSION,
+            "run_id": self.run_id,
+            "argv": sys.argv[1:],
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_at)),
+            "wall_s": round(time.monotonic() - self._t0, 3),
+            "cpu_s": round(time.process_time() - self._cpu0, 3),
+            "cpu_children_s": cpu_children,
+            "peak_rss_mb": _mb(self.rss_peak),
+            "profile": self.profile,
+            "stages": stages,
+        }
+
+    def write(self, path: Optional[pathlib.Path] = None) -> pathlib.Path:
+        """寫出報告（預設 data/cache/runs/<run_id>.json）；回傳路徑。"""
+        self.close()
+        path = path or self.out_dir / f"{self.run_id}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(self.report(), ensure_ascii=False, indent=2) + "\n", "utf-8")
+        tmp.replace(path)
+        return path
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._sampler.is_alive():
+            self._sampler.join()
+
+
+def main() -> None:
+    """印出最近一次（或指定的）報告摘要。"""
+    if len(sys.argv) > 1:
+        path = pathlib.Path(sys.argv[1])
+    else:
+        runs = sorted(RUNS_DIR.glob("*.json"))
+        if not runs:
+            raise SystemExit(f"[ERR] {RUNS_DIR} 底下沒有報告")
+        path = runs[-1]
+    rep = json.loads(path.read_text("utf-8"))
+    print(f"{path.name}：wall {rep['wall_s']}s，cpu {rep['cpu_s']}s，peak rss {rep['peak_rss_mb']} MB")
+    print(f"{'stage':<26} {'status':<10} {'wall':>8} {'cpu':>8} {'rss':>8} {'in':>7} {'out':>7} "
+          f"{'http':>6} {'http sleep':>10} {'prof wait':>9}")
+    for name, s in rep["stages"].items():
+        if "wall_s" not in s:  # 沒有執行的階段
+            print(f"{name:<26} {s['status']}")
+            continue
+        http = s.get("http") or {}
+        prof = s.get("profile") or {}
+        sleep = f"{http.get('sleep_s', 0) + http.get('wait_s', 0):.1f}s" if http else "-"
+        wait = f"{prof['wait_s']:.1f}s" if prof else "-"
+        print(f"{name:<26} {s['status']:<10} {s['wall_s']:>7.2f}s {s['cpu_s']:>7.2f}s {s['peak_rss_mb'] or 0:>6.0f}MB "
+              f"{'-' if s['records_in'] is None else s['records_in']:>7} "
+              f"{'-' if s['records_out'] is None else s['records_out']:>7} "
+              f"{http.get('requests', '-'):>6} {sleep:>10} {wait:>9}")
+
+if __name__ == "__main__":
+    main()
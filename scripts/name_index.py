@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+name_index.py — 本機的名稱 → BGG id 索引（resolve_bgg 搜尋前先查這裡）
+
+來源（都是已經有 bgg_id 的資料）：
+- data/bgg_data.json：name（BGG 主名稱）、name_zh、name_en_override、alias_zh
+- data/manual.csv：有 bgg_id 的列的 name_zh、name_en_override、alias_zh
+  （alias_zh 可用 、 , ， / ; ； | 分隔多個別名）
+
+比對方式跟 resolve_bgg 挑 BGG 搜尋結果的規則一樣（norm_name 之後）：
+    3 = 名稱完全相同，2 = 名稱以 query 開頭，1 = 名稱包含 query
+- 完全相同：查 dict
+- 開頭／包含：名稱切成 2-gram 建倒排索引，query 的 2-gram 取交集後再逐一確認
+  → 不用掃過全部名稱，中文、英文都適用
+- 最高分的候選如果指到不同的 id（例如基本版跟擴充同名）就當作沒命中，交給 API
+
+NAME_INDEX_MIN_SCORE（預設 3）：至少要幾分才直接採用本機結果；
+設成 2 會連「唯一的開頭相符」也採用，但目錄裡只有擴充時可能會誤判成擴充。
+
+用法：
+    python scripts/name_index.py "卡卡頌" "Carcassonne"   # 看看會對到哪個 id
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import pathlib
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+BGG_DATA = ROOT / "data" / "bgg_data.json"
+MANUAL = ROOT / "data" / "manual.csv"
+
+NAME_FIELDS = ("name", "name_zh", "name_en_override")
+ALIAS_SEP = re.compile(r"[、,，/;；|｜]")
+GRAM = 2
+MIN_SCORE = int(os.getenv("NAME_INDEX_MIN_SCORE", "3"))
+
+
+def norm_name(s: str) -> str:
+    s = s.lower()
+    s = re.sub(r"[ \t\n\r\-\–\—:•·\.,!\"'®™()\[\]{}]", "", s)
+    return s
+
+
+def _grams(s: str) -> Set[str]:
+    return {s[i:i + GRAM] for i in range(len(s) - GRAM + 1)}
+
+
+def _int_or_none(x) -> Optional[int]:
+    try:
+        return int(float(str(x).strip()))
+    except (TypeError, ValueError):
+        return None
+
+
+def record_names(rec: Dict) -> Iterable[str]:
+    """一筆記錄（bgg_data 或 manual.csv 的列）上所有可以拿來比對的名稱。"""
+    for f in NAME_FIELDS:
+        v = rec.get(f)
+        if isinstance(v, str) and v.strip():
+            yield v
+    alias = rec.get("alias_zh")
+    if isinstance(alias, str):
+        for a in ALIAS_SEP.split(alias):
+            if a.strip():
+                yield a
+
+
+class NameIndex:
+    """norm_name 後的名稱 → id；另有 2-gram 倒排索引處理開頭／包含比對。"""
+
+    def __init__(self) -> None:
+        self.exact: Dict[str, Set[int]] = {}
+        self.names: List[str] = []  # 不重複的正規化名稱，位置 = 倒排索引裡的編號
+        self.grams: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, bid: int, name: str) -> None:
+        n = norm_name(name)
+        if not n:
+            return
+        ids = self.exact.get(n)
+        if ids is None:
+            ids = self.exact[n] = set()
+            pos = len(self.names)
+            self.names.append(n)
+            for g in _grams(n):
+                self.grams.setdefault(g, []).append(pos)
+        ids.add(bid)
+
+    def add_record(self, rec: Dict) -> None:
+        bid = _int_or_none(rec.get("bgg_id"))
+        if not bid:
+            return
+        for name in record_names(rec):
+            self.add(bid, name)
+
+    @classmethod
+    def build(cls, records: Iterable[Dict]) -> "NameIndex":
+        idx = cls()
+        for rec in records:
+            idx.add_record(rec)
+        return idx
+
+    @classmethod
+    def load(cls, bgg_data: pathlib.Path = BGG_DATA, manual: pathlib.Path = MANUAL) -> "NameIndex":
+        """從 bgg_data.json 與 manual.csv 建索引；檔案不存在就略過。"""
+        idx = cls()
+        if bgg_data.exists():
+            for rec in json.loads(bgg_data.read_text("utf-8")):
+                idx.add_record(rec)
+        if manual.exists():
+            with manual.open(encoding="utf-8-sig", newline="") as f:
+                for row in csv.DictReader(f):
+                    idx.add_record(row)
+        return idx
+
+    def _containing(self, target: str) -> List[str]:
+        """名稱包含 target 的所有正規化名稱（2-gram 交集 → 逐一確認）。"""
+        if len(target) < GRAM:
+            return [n for n in self.names if target in n]
+        postings = []
+        for g in _grams(target):
+            p = self.grams.get(g)
+            if p is None:
+                return []
+            postings.append(p)
+        postings.sort(key=len)
+        cand = set(postings[0])
+        for p in postings[1:]:
+            cand.intersection_update(p)
+            if not cand:
+                return []
+        return [self.names[i] for i in cand if target in self.names[i]]
+
+    def match(self, q: str) -> Optional[Tuple[int, int]]:
+        """回傳 (id, 分數)；沒有候選、或最高分的候選指到不只一個 id 時回傳 None。"""
+        target = norm_name(q or "")
+        if not target:
+            return None
+        ids = self.exact.get(target)
+        if ids:
+            return (next(iter(ids)), 3) if len(ids) == 1 else None
+        best_score, best_ids = 0, set()
+        for name in self._containing(target):
+            score = 2 if name.startswith(target) else 1
+            if score > best_score:
+                best_score, best_ids = score, set(self.exact[name])
+            elif score == best_score:
+                best_ids |= self.exact[name]
+        if len(best_ids) != 1:
+            return None
+        return next(iter(best_ids)), best_score
+
+    def resolve(self, q: str, min_score: int = MIN_SCORE) -> Optional[int]:
+        """分數夠高才回傳 id；否則 None（該去問 API）。"""
+        hit = self.match(q)
+        if hit is None or hit[1] < min_score:
+            return None
+        return hit[0]
+
+
+def main() -> None:
+    idx = NameIndex.load()
+    print(f"[INFO] 名稱索引：{len(idx)} 個名稱，{len(idx.grams)} 個 {GRAM}-gram")
+    for q in sys.argv[1:]:
+        hit = idx.match(q)
+        print(f"{q!r} → {hit[0]}（分數 {hit[1]}）" if hit else f"{q!r} → 沒有唯一的本機結果")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,46 +3,55 @@
 """
 normalize_bgg_data.py — 2025 最終穩定版
 欄位相容處理 + 清洗資料 + 合併分類 / 機制
+單獨跑時讀、寫本機目錄（catalog.py）的 bgg_data 表，只改有變的列；data/bgg_data.json 由 build_json 最後匯出
 """
 
-import json, pathlib
+from typing import Dict, List
 
-ROOT = pathlib.Path(__file__).resolve().parents[1]
-F = ROOT / "data" / "bgg_data.json"
+from catalog import Catalog
+from game_record import Game
 
-if not F.exists():
-    print("bgg_data.json 不存在")
-    exit(0)
 
-data = json.loads(F.read_text("utf-8"))
-out = []
+# 舊版只補這幾個標準欄位名；其他舊名字照原樣留著
+PLAYER_TIME_FIELDS = ("min_players", "max_players", "min_playtime", "max_playtime")
 
-for g in data:
-    g2 = dict(g)
 
-    # 欄位相容：舊名 → 新名
-    if "minplayers" in g2:
-        g2["min_players"] = g2.get("minplayers")
-    if "maxplayers" in g2:
-        g2["max_players"] = g2.get("maxplayers")
-    if "minplaytime" in g2:
-        g2["min_playtime"] = g2.get("minplaytime")
-    if "maxplaytime" in g2:
-        g2["max_playtime"] = g2.get("maxplaytime")
+def normalize(g: Dict) -> Dict:
+    # 複製一份（不動上游的記錄）；舊欄位名（minplayers…）留著，下游還有程式讀舊名字
+    rec = Game.from_dict(g)
+
+    # 欄位相容：有舊名字的補上標準名（值照 Game 的規則：標準名有值優先）
+    for f in PLAYER_TIME_FIELDS:
+        if f in rec:
+            rec[f] = rec[f]
 
     # 合併分類
-    cats = set(g2.get("categories", []))
-    if g2.get("category_zh"):
-        cats.add(g2["category_zh"])
+    cats = set(rec.get("categories") or [])
+    if rec.get("category_zh"):
+        cats.add(rec.get("category_zh"))
 
     # 合併機制
-    mechs = set(g2.get("mechanisms", []))
+    mechs = set(rec.get("mechanisms") or [])
+
+    rec.categories = sorted(cats)
+    rec.mechanisms = sorted(mechs)
+    return rec.raw
+
+
+def normalize_rows(data: List[Dict]) -> List[Dict]:
+    return [normalize(g) for g in data]
+
 
-    g2["categories"] = sorted(list(cats))
-    g2["mechanisms"] = sorted(list(mechs))
+def main():
+    with Catalog() as catalog:
+        data = catalog.rows()
+        if not data:
+            print("bgg_data 不存在（目錄跟 data/bgg_data.json 都沒有）")
+            return
+        _, changed = catalog.put_rows(normalize_rows(data))
 
-    out.append(g2)
+    print(f"[OK] normalize_bgg_data.py 完成（目錄 bgg_data 改了 {changed} 列）")
 
-F.write_text(json.dumps(out, ensure_ascii=False, indent=2), "utf-8")
 
-print("[OK] normalize_bgg_data.py 完成")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pipeline.py — 把各個 scripts 串成一條 DAG，在同一個 process 裡跑完（python -m scripts）
+
+階段（→ 表示依賴）：
+
+    extract_from_csv → fetch_bgg → apply_taxonomy_and_price → fetch_version_image
+        ├→ download_images → build_image_variants ─┐
+        └→ normalize_bgg_data → build_json ────────┴→ attach_image_variants → publish_games
+
+- 記錄在階段之間直接以 Python 物件傳遞，不再每一步都重讀／重寫 data/bgg_data.json
+- 沒有依賴關係的階段同時跑（圖片下載＋衍生圖 與 normalize＋build_json 並行），最多 PIPELINE_JOBS 個
+- build_json 只算 games_full 記錄；本機衍生圖到 attach_image_variants 才套上，並寫出 data/games_full.json
+- 每個階段的「輸入指紋」= 程式碼 + 上游輸出 + 讀到的檔案（manual.csv…）的 sha256；
+  跟上次一樣、產出檔也沒被動過 → 直接跳過，下游需要時才從產出檔讀回來
+- 有跑的階段如果輸出跟上次一模一樣，下游的指紋也不會變 → 下游照樣跳過
+- fetch_bgg / download_images 每次都會跑（它們自己有 TTL／revalidate 判斷，沒事做時不連網）
+- 狀態記在 data/cache/pipeline_state.json；中間產物在 data/cache/pipeline/
+- 每次執行寫一份 JSON 報告到 data/cache/runs/<run_id>.json（metrics.py）：各階段的 wall／CPU 時間、峰值 RSS、
+  輸入／輸出筆數、HTTP 計數（請求、202／429 重試、bytes、等待與退避 sleep）；
+  --profile 另外存每個階段的 cProfile（分得出慢在 sleep、解析還是序列化）
+- fetch_bgg（bgg_records / fetch_meta）、apply_taxonomy_and_price（overrides）、attach_image_variants（built）
+  也更新本機目錄 data/cache/catalog.sqlite3（catalog.py），各自只動自己碰到的列；各階段在自己的執行緒開自己的連線。
+  目錄的 bgg_data 表這裡不動：bgg_data.json 是 normalize 階段的產出檔，之後單獨跑的 script 看到檔案換了會從檔案重新匯入
+
+注意：apply_taxonomy_and_price 排在 fetch_version_image 前面 ——
+image_version_id / image_override 是 manual.csv 套上去的，順序反過來 fetch_version_image 會看不到。
+
+用法：
+    python -m scripts                       # 跑全部（沒變的自動跳過）
+    python -m scripts build_json            # 只跑到 build_json（含上游）
+    python -m scripts --force fetch_bgg     # 指定階段強制重跑；--force all 全部重跑
+    python -m scripts --dry-run             # 只列出會跑哪些階段
+    python -m scripts --list                # 列出階段與依賴
+    python -m scripts --profile             # 每個階段都跑 cProfile（階段改成一個一個跑）
+    python scripts/metrics.py               # 看最近一次的報告摘要
+    BGG_HTTP_MODE=record python -m scripts --force all   # 錄下這次所有 BGG API 回應（bgg_client.py）
+    BGG_HTTP_MODE=replay python -m scripts --force all   # 用錄下的回應離線重跑（不連網，圖片只用本機已有的）
+環境變數：
+    PIPELINE_JOBS (default: 2)  # 同時跑的階段數
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import pathlib
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fingerprint import digest, sha256_file
+from json_stream import JsonArrayWriter
+from metrics import RunMetrics
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+SCRIPTS = pathlib.Path(__file__).resolve().parent
+DATA = ROOT / "data"
+CACHE_DIR = DATA / "cache"
+STATE_FILE = CACHE_DIR / "pipeline_state.json"
+ARTIFACT_DIR = CACHE_DIR / "pipeline"
+MANUAL_CSV = DATA / "manual.csv"
+PRICE_RULES = DATA / "price_rules.json"
+TAXONOMY_MAPS = (DATA / "category_map_zh.csv", DATA / "mechanism_map_zh.csv")
+
+JOBS = int(os.getenv("PIPELINE_JOBS", "2"))
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[..., Any]  # run(*上游輸出) → 這個階段的輸出（要能轉成 JSON）
+    deps: Tuple[str, ...] = ()
+    files: Tuple[pathlib.Path, ...] = ()  # 額外讀取的輸入檔
+    modules: Tuple[str, ...] = ()  # 程式碼有改就重跑（scripts/ 底下的模組名）
+    artifact: Optional[pathlib.Path] = None  # 輸出存哪（預設 data/cache/pipeline/{name}.json）
+    indent: Optional[int] = None
+    always: bool = False  # 不看指紋，每次都跑
+    writes_artifact: bool = False  # run 自己會寫產出檔（例如增量重建只重新序列化有變的記錄）
+
+    @property
+    def artifact_path(self) -> pathlib.Path:
+        return self.artifact or ARTIFACT_DIR / f"{self.name}.json"
+
+
+class Pipeline:
+    def __init__(self, stages: Sequence[Stage], state_path: pathlib.Path = STATE_FILE,
+                 metrics: Optional[RunMetrics] = None):
+        self.stages: Dict[str, Stage] = {}
+        for st in stages:
+            missing = [d for d in st.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"stage {st.name} 依賴未宣告（或順序在後）的階段：{missing}")
+            self.stages[st.name] = st
+        self.state_path = state_path
+        self.state: Dict[str, Dict] = self._load_state()
+        self.values: Dict[str, Any] = {}
+        self.metrics = metrics
+        self._lock = threading.Lock()
+
+    # ------------------------------
+    # 狀態
+    # ------------------------------
+    def _load_state(self) -> Dict[str, Dict]:
+        if self.state_path.exists():
+            try:
+                return json.loads(self.state_path.read_text("utf-8")).get("stages", {})
+            except ValueError:
+                pass
+        return {}
+
+    def save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        with self._lock:
+            body = {"version": 1, "stages": self.state}
+            tmp.write_text(json.dumps(body, ensure_ascii=False, indent=1, sort_keys=True), "utf-8")
+        tmp.replace(self.state_path)
+
+    def order(self, targets: Sequence[str] = ()) -> List[str]:
+        """targets 及其所有上游（宣告順序即拓撲順序）；沒給 targets 就是全部。"""
+        if not targets:
+            return list(self.stages)
+        want = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise SystemExit(f"[ERR] 沒有這個階段：{name}")
+            if name not in want:
+                want.add(name)
+                stack.extend(self.stages[name].deps)
+        return [n for n in self.stages if n in want]
+
+    def key(self, st: Stage, outs: Dict[str, str]) -> str:
+        return digest({
+            "code": {m: sha256_file(SCRIPTS / f"{m}.py") for m in st.modules},
+            "deps": {d: outs[d] for d in st.deps},
+            "files": {str(p.relative_to(ROOT)): sha256_file(p) if p.exists() else None for p in st.files},
+        })
+
+    def fresh(self, st: Stage, key: str) -> bool:
+        prev = self.state.get(st.name)
+        path = st.artifact_path
+        return bool(
+            prev
+            and prev.get("key") == key
+            and path.exists()
+            and sha256_file(path) == prev.get("artifact_sha256")
+        )
+
+    # ------------------------------
+    # 執行
+    # ------------------------------
+    def value(self, name: str) -> Any:
+        """上游輸出：這次有跑就用記憶體裡的，跳過的才從產出檔讀回來。"""
+        with self._lock:
+            if name not in self.values:
+                path = self.stages[name].artifact_path
+                self.values[name] = json.loads(path.read_text("utf-8"))
+            return self.values[name]
+
+    def _save_artifact(self, st: Stage, value: Any) -> str:
+        path = st.artifact_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if st.writes_artifact:
+            pass
+        elif isinstance(value, list):
+            with JsonArrayWriter(path, indent=st.indent) as w:
+                for item in value:
+                    w.write(item)
+        else:
+            tmp = path.with_name(path.name + ".tmp")
+            kw = {"indent": st.indent} if st.indent is not None else {"separators": (",", ":")}
+            tmp.write_text(json.dumps(value, ensure_ascii=False, **kw), "utf-8")
+            tmp.replace(path)
+        return sha256_file(path)
+
+    def _execute(self, st: Stage, key: str) -> Tuple[str, bool, float]:
+        args = [self.value(d) for d in st.deps]
+        t0 = time.monotonic()
+        if self.metrics is None:
+            value, out, artifact_sha = self._run_stage(st, args)
+        else:
+            counts = [_count(a) for a in args]
+            records_in = sum(counts) if counts and None not in counts else None
+            with self.metrics.stage(st.name, records_in) as m:
+                value, out, artifact_sha = self._run_stage(st, args)
+                m.records_out = _count(value)
+        sec = time.monotonic() - t0
+        with self._lock:
+            self.values[st.name] = value
+            unchanged = (self.state.get(st.name) or {}).get("out") == out
+            self.state[st.name] = {
+                "key": key,
+                "out": out,
+                "artifact_sha256": artifact_sha,
+                "finished_at": time.time(),
+                "sec": round(sec, 3),
+            }
+        return out, unchanged, sec
+
+    def _run_stage(self, st: Stage, args: List[Any]) -> Tuple[Any, str, str]:
+        value = st.run(*args)
+        return value, digest(value), self._save_artifact(st, value)
+
+    def _mark(self, name: str, status: str) -> None:
+        if self.metrics is not None:
+            self.metrics.mark(name, status)
+
+    def run(self, targets: Sequence[str] = (), force: Sequence[str] = (), jobs: int = JOBS,
+            dry_run: bool = False) -> Dict[str, str]:
+        """跑 targets（含上游）；回傳 {階段: ran / unchanged / skipped / failed / blocked / would-run}。"""
+        pending = self.order(targets)
+        forced = set(self.stages) if "all" in force else set(force)
+        status: Dict[str, str] = {}
+        outs: Dict[str, str] = {}
+        running: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            while pending or running:
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in list(pending):
+                        st = self.stages[name]
+                        if any(status.get(d) in ("failed", "blocked") for d in st.deps):
+                            pending.remove(name)
+                            status[name] = "blocked"
+                            self._mark(name, "blocked")
+                            print(f"[WARN] {name}：上游失敗，略過")
+                            progressed = True
+                            continue
+                        if not all(d in outs for d in st.deps):
+                            continue
+                        pending.remove(name)
+                        progressed = True
+                        key = self.key(st, outs)
+                        if name not in forced and not st.always and self.fresh(st, key):
+                            outs[name] = self.state[name]["out"]
+                            status[name] = "skipped"
+                            self._mark(name, "skipped")
+                            print(f"[SKIP] {name}（輸入未變）")
+                        elif dry_run:
+                            # always 階段假設輸出不變；其他會跑的階段視為輸出會變，下游一併列出
+                            prev = (self.state.get(name) or {}).get("out", "")
+                            outs[name] = prev if st.always and name not in forced else "?"
+                            status[name] = "would-run"
+                            print(f"[PLAN] {name}" + ("（每次都跑）" if st.always else ""))
+                        else:
+                            print(f"[RUN] {name}")
+                            running[pool.submit(self._execute, st, key)] = name
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    try:
+                        out, unchanged, sec = fut.result()
+                    except BaseException as e:  # SystemExit 也算這個階段失敗，不要整條中斷
+                        traceback.print_exception(type(e), e, e.__traceback__)
+                        status[name] = "failed"
+                        self._mark(name, "failed")
+                        print(f"[ERR] {name} 失敗：{e}")
+                        continue
+                    outs[name] = out
+                    status[name] = "unchanged" if unchanged else "ran"
+                    print(f"[OK] {name} {sec:.2f}s" + ("（輸出跟上次相同）" if unchanged else ""))
+                if not dry_run:
+                    self.save_state()
+        return status
+
+
+def _count(value: Any) -> Optional[int]:
+    """階段之間傳的值有幾筆（list / dict 的長度）；其他型別不算。"""
+    return len(value) if isinstance(value, (list, dict)) else None
+
+
+# ------------------------------
+# 各階段
+# ------------------------------
+def _extract(*_) -> List[str]:
+    import extract_from_csv
+
+    if not MANUAL_CSV.exists():
+        raise SystemExit(f"[ERR] 找不到 CSV：{MANUAL_CSV}")
+    ids = extract_from_csv.extract_ids(MANUAL_CSV)
+    extract_from_csv.write_ids(ids)  # 單獨跑 fetch_bgg.py 時還是讀這個檔
+    print(f"[OK] 共 {len(ids)} 個 BGG ID")
+    return [str(i) for i in ids]
+
+
+def _fetch_bgg(ids: List[str]) -> List[Dict]:
+    import fetch_bgg
+    from catalog import Catalog
+    from rate_limit import FetchStats
+
+    stats = FetchStats()
+    with Catalog() as catalog:
+        fetch_bgg.refresh_cache(catalog, ids, stats)
+        rows = list(catalog.iter_records(ids))
+    if stats.requests:
+        print(f"[STAT] {stats.summary()}")
+    return rows
+
+
+def _apply_overrides(rows: List[Dict]) -> List[Dict]:
+    import apply_taxonomy_and_price as atp
+    from catalog import Catalog
+
+    rows = [dict(r) for r in rows]  # 不要動到上游的記錄
+    with Catalog() as catalog:
+        overrides, applied = atp.apply_all(rows, atp.sync_overrides(catalog))
+    print(f"apply_taxonomy_and_price: total={len(rows)}, manual_rows={len(overrides)}, applied={applied}")
+    return rows
+
+
+def _fetch_version_image(rows: List[Dict]) -> List[Dict]:
+    import fetch_version_image
+
+    rows = [dict(r) for r in rows]
+    fetch_version_image.apply_version_images(rows)
+    return rows
+
+
+def _download_images(rows: List[Dict]) -> Dict[str, Dict]:
+    import bgg_client
+    import download_images
+    import metrics
+    from image_store import ImageStore
+
+    jobs = download_images.plan_downloads(rows)
+    download_images.clean_partials(download_images.OUT)
+    if bgg_client.MODE == "replay":
+        # 離線重跑：只用倉庫裡已有的圖，不下載也不重新確認
+        have = ImageStore(download_images.OUT)
+        jobs = [j for j in jobs if have.has(j[2])]
+        st = download_images.download_all(jobs, revalidate_days=float("inf"))
+    else:
+        st = download_images.download_all(jobs)
+    print(
+        f"download_images: 新下載 {st['downloaded']}，上游更新 {st['updated']}，304 {st['not_modified']}，"
+        f"略過 {st['skipped']}，失敗 {st['failed']}"
+    )
+    ok = st["downloaded"] + st["updated"] + st["not_modified"]
+    metrics.add_http(requests=ok + st["failed"], ok=ok, failed=st["failed"], bytes=st["bytes"])
+    store = ImageStore(download_images.OUT)
+    # 輸出 = 本機有的圖（哪款遊戲、哪個網址、內容 hash）；只改價格、文字時不會變，衍生圖就不用重跑
+    return {
+        fname: {"bgg_id": bid, "url": url, "sha256": store.get(fname)["sha256"]}
+        for bid, url, fname in jobs
+        if store.has(fname)
+    }
+
+
+def _build_image_variants(images: Dict[str, Dict]) -> Dict:
+    import build_image_variants as biv
+
+    if biv.Image is None:
+        print("[WARN] 沒有 Pillow，略過 build_image_variants（沿用現有索引）")
+    else:
+        st = biv.build_variants([{"bgg_id": v["bgg_id"], "image_url": v["url"]} for v in images.values()])
+        print(f"build_image_variants: 原圖 {st['sources']}，新產生 {st['built']}，沿用 {st['reused']}，失敗 {st['failed']}")
+    return biv.load_index()
+
+
+def _normalize(rows: List[Dict]) -> List[Dict]:
+    import normalize_bgg_data
+
+    return normalize_bgg_data.normalize_rows(rows)
+
+
+def _build_json(rows: List[Dict]) -> List[Dict]:
+    import build_json
+
+    return build_json.build_records(rows)
+
+
+def _attach_image_variants(rows: List[Dict], games: List[Dict], variant_index: Dict) -> List[Dict]:
+    import build_json
+    from catalog import Catalog
+    from common_image import image_variants_from_index
+
+    # games.json 由 publish_games 寫，這裡只寫 games_full.json（沒變的遊戲直接沿用上次的輸出）＋目錄的 built 表；
+    # 指紋看 normalize 的輸出（rows）＋衍生圖，games 是 build_json 階段從同一份 rows 算好的記錄
+    with Catalog() as catalog:
+        b = build_json.build_incremental(
+            rows, image_variants_from_index(variant_index), outputs=((build_json.OUT_FULL, 2),),
+            catalog=catalog, records=games,
+        )
+    print(f"build_json: {b.delta.summary()}；image_variants: {b.attached} 款套用本機 srcset")
+    return b.games
+
+
+def _publish(games: List[Dict]) -> Dict:
+    import publish_games
+
+    rows = publish_games.normalize_rows(games)
+    payload = publish_games.publish(rows)
+    print(f"publish_games: rows={len(rows)} → published={len(payload['games'])} → {publish_games.OUT}")
+    return payload
+
+
+def default_stages() -> List[Stage]:
+    return [
+        Stage("extract_from_csv", _extract, files=(MANUAL_CSV,), modules=("extract_from_csv",)),
+        Stage("fetch_bgg", _fetch_bgg, deps=("extract_from_csv",), always=True),
+        Stage("apply_taxonomy_and_price", _apply_overrides, deps=("fetch_bgg",),
+              files=(MANUAL_CSV, PRICE_RULES), modules=("apply_taxonomy_and_price", "price_rules", "catalog")),
+        Stage("fetch_version_image", _fetch_version_image, deps=("apply_taxonomy_and_price",),
+              modules=("fetch_version_image", "bgg_client")),
+        Stage("download_images", _download_images, deps=("fetch_version_image",), always=True),
+        Stage("build_image_variants", _build_image_variants, deps=("download_images",),
+              modules=("build_image_variants",)),
+        Stage("normalize_bgg_data", _normalize, deps=("fetch_version_image",),
+              modules=("normalize_bgg_data", "game_record"), artifact=DATA / "bgg_data.json", indent=2),
+        Stage("build_json", _build_json, deps=("normalize_bgg_data",), modules=("build_json", "game_record")),
+        Stage("attach_image_variants", _attach_image_variants,
+              deps=("normalize_bgg_data", "build_json", "build_image_variants"),
+              modules=("build_json", "game_record", "common_image", "json_stream", "catalog", "fingerprint"),
+              artifact=DATA / "games_full.json", indent=2, writes_artifact=True),
+        Stage("publish_games", _publish, deps=("attach_image_variants",), files=TAXONOMY_MAPS,
+              modules=("publish_games", "site_payload", "search_index", "taxonomy", "game_record", "catalog",
+                       "fingerprint"),
+              artifact=ROOT / "site" / "data" / "games.json", writes_artifact=True),
+    ]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m scripts", description="跑整條資料管線（沒變的階段自動跳過）")
+    ap.add_argument("targets", nargs="*", metavar="STAGE", help="只跑到這些階段（含上游）")
+    ap.add_argument("--force", action="append", default=[], metavar="STAGE", help="強制重跑（可重複；all = 全部）")
+    ap.add_argument("--jobs", type=int, default=JOBS, help="同時跑的階段數")
+    ap.add_argument("--dry-run", action="store_true", help="只列出會跑哪些階段")
+    ap.add_argument("--list", action="store_true", help="列出階段與依賴")
+    ap.add_argument("--profile", action="store_true", help="每個階段跑 cProfile（存到 data/cache/runs/<run_id>/）")
+    ap.add_argument("--report", type=pathlib.Path, metavar="PATH", help="指標報告寫到哪（預設 data/cache/runs/<run_id>.json）")
+    args = ap.parse_args(argv)
+
+    run_metrics = None if args.dry_run or args.list else RunMetrics(profile=args.profile)
+    pipe = Pipeline(default_stages(), metrics=run_metrics)
+
+    if args.list:
+        for st in pipe.stages.values():
+            deps = ", ".join(st.deps) or "-"
+            print(f"{st.name:<26} ← {deps}" + ("  (always)" if st.always else ""))
+        return
+    for name in args.force:
+        if name != "all" and name not in pipe.stages:
+            raise SystemExit(f"[ERR] 沒有這個階段：{name}")
+
+    jobs = args.jobs
+    if args.profile and jobs > 1:
+        # cProfile 一次只能有一個在跑（Python 3.12 起是整個 interpreter 共用）；平行跑的話各階段的數字也會互相干擾
+        print("[INFO] --profile：階段改成一個一個跑")
+        jobs = 1
+    t0 = time.monotonic()
+    try:
+        status = pipe.run(args.targets, force=args.force, jobs=jobs, dry_run=args.dry_run)
+    finally:
+        if run_metrics is not None:
+            print(f"[STAT] 指標報告 → {run_metrics.write(args.report)}")
+    counts: Dict[str, int] = {}
+    for s in status.values():
+        counts[s] = counts.get(s, 0) + 1
+    print(f"[STAT] pipeline {time.monotonic() - t0:.1f}s ; " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    if any(s in ("failed", "blocked") for s in status.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+price_rules.py — 依 data/price_rules.json 補上 manual.csv 沒填的售價／二手價
+
+規則檔格式：
+    {
+      "default_used_pct": 0.65,          # 沒有規則命中時：二手價 = 售價 × 這個比例
+      "round_step": 50,                  # 算出來的二手價四捨五入到這個倍數
+      "rules": [                         # 由上往下，第一條命中的規則生效
+        {"match": {"category_zh": "派對"}, "price_set": 750, "used_set": 500},
+        {"match": {"weight_lte": 2.0}, "used_pct": 0.60},
+        {"match": {"weight_gt": 3.0}, "used_pct": 0.70}
+      ]
+    }
+
+- match 可用：category_zh（manual.csv 的 category_zh，可用 、 , ， / ; ； | 分隔多個，任一個相同就算）、
+  weight_lte / weight_gt / weight_gte / weight_lt（BGG 重量）；同一條裡的條件要全部成立；空的 match 一律命中
+- 動作：price_set（售價）、used_set（二手價）、used_pct（二手價 = 售價 × 比例）
+- 售價的基準：price_twd，沒有就用 price_msrp_twd
+- manual.csv 有填的值（套完覆寫後記錄上已經有的 price_twd / used_price_twd）一律優先，規則只補空的
+- 規則補上的欄位記在 price_rule：{"used_price_twd": "rules[1] weight_lte=2.0", ...}；
+  下次重跑時先用 clear_rule_values 拿掉這些值（要在套 manual.csv 之前），不會被誤認成手填的
+
+規則只編譯一次，然後整欄一起算（有 numpy 就用 numpy 陣列，沒有就用 list 逐欄算），
+不是每筆記錄各自跑一遍規則。
+
+用法：
+    python scripts/price_rules.py            # 對目前的 bgg_data 記錄（catalog.py）試算，印出各規則命中數（不寫檔）
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import pathlib
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np  # 選用：pip install numpy，沒有就用純 Python 逐欄計算
+except ImportError:
+    np = None
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+RULES_JSON = ROOT / "data" / "price_rules.json"
+
+CATEGORY_SEP = re.compile(r"[、,，/;；|｜]")
+WEIGHT_OPS = {
+    "weight_lte": lambda w, x: w <= x,
+    "weight_lt": lambda w, x: w < x,
+    "weight_gte": lambda w, x: w >= x,
+    "weight_gt": lambda w, x: w > x,
+}
+ACTIONS = ("price_set", "used_set", "used_pct")
+DEFAULT_LABEL = "default_used_pct"
+NO_RULE = -1
+
+
+def _num(v: Any) -> Optional[float]:
+    if v is None or isinstance(v, bool):
+        return None
+    try:
+        n = float(v) if isinstance(v, (int, float)) else float(str(v).strip())
+    except ValueError:
+        return None
+    return n if math.isfinite(n) else None
+
+
+def _num_column(rows: List[Dict[str, Any]], key: str) -> List[Optional[float]]:
+    """整欄取數字；大部分值是 None 或 int/float，走快速路徑。"""
+    out: List[Optional[float]] = []
+    append = out.append
+    for r in rows:
+        v = r.get(key)
+        t = type(v)
+        if v is None:
+            append(None)
+        elif t is int:
+            append(float(v))
+        elif t is float:
+            append(v if math.isfinite(v) else None)
+        else:
+            append(_num(v))
+    return out
+
+
+def _categories(v: Any) -> Tuple[str, ...]:
+    if isinstance(v, list):
+        parts = v
+    else:
+        parts = CATEGORY_SEP.split(str(v or ""))
+    return tuple(s for s in (str(p).strip() for p in parts) if s)
+
+
+class Rule:
+    """一條編譯好的規則：條件（category 集合＋重量比較）跟動作。"""
+
+    def __init__(self, index: int, spec: Dict[str, Any]) -> None:
+        match = spec.get("match") or {}
+        unknown = set(match) - {"category_zh", *WEIGHT_OPS}
+        if unknown:
+            raise ValueError(f"price_rules.json rules[{index}]：不認得的條件 {sorted(unknown)}")
+        self.index = index
+        cats = match.get("category_zh")
+        self.categories = frozenset(_categories(cats)) if cats is not None else None
+        self.weight = [(op, float(match[op])) for op in WEIGHT_OPS if op in match]
+        self.actions = {k: float(spec[k]) for k in ACTIONS if spec.get(k) is not None}
+        if not self.actions:
+            raise ValueError(f"price_rules.json rules[{index}]：沒有 price_set / used_set / used_pct")
+        cond = " ".join(f"{k}={v}" for k, v in match.items())
+        self.label = f"rules[{index}] {cond}".strip()
+
+
+class PriceRules:
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        self.default_used_pct = _num(spec.get("default_used_pct"))
+        self.round_step = _num(spec.get("round_step")) or 1.0
+        self.rules = [Rule(i, r) for i, r in enumerate(spec.get("rules") or [])]
+
+    @classmethod
+    def load(cls, path: pathlib.Path = RULES_JSON) -> Optional["PriceRules"]:
+        if not path.exists():
+            return None
+        return cls(json.loads(path.read_text("utf-8")))
+
+    # ---- 逐欄計算 ----
+
+    def _category_masks(self, cats: Sequence[Any]) -> Dict[int, List[bool]]:
+        """每條有 category 條件的規則 → 命中與否（相同的 category_zh 值只拆解、判斷一次）。"""
+        codes: Dict[Any, int] = {}
+        col = [codes.setdefault(c if not isinstance(c, list) else tuple(c), len(codes)) for c in cats]
+        distinct = [_categories(list(c) if isinstance(c, tuple) else c) for c in codes]
+        if np is not None:
+            col = np.asarray(col, dtype=np.int64)
+        out = {}
+        for r in self.rules:
+            if r.categories is not None:
+                hit = [bool(r.categories.intersection(c)) for c in distinct]
+                out[r.index] = np.asarray(hit, dtype=bool)[col] if np is not None else [hit[k] for k in col]
+        return out
+
+    def evaluate(self, weight: Sequence[Optional[float]], cats: Sequence[Any],
+                 price: Sequence[Optional[float]], msrp: Sequence[Optional[float]],
+                 used: Sequence[Optional[float]]) -> Tuple[List[int], List[Optional[float]], List[Optional[float]]]:
+        """
+        欄位 → (每列命中的規則編號（NO_RULE = 預設比例）, 規則給的售價, 規則給的二手價)。
+        cats 是原始的 category_zh 值（字串或 list）。
+        售價／二手價已經有值的列，對應的結果是 None（不覆蓋）。
+        """
+        masks = self._category_masks(cats)
+        if np is not None:
+            return self._evaluate_numpy(weight, masks, price, msrp, used)
+        return self._evaluate_python(weight, masks, price, msrp, used)
+
+    def _round(self, x: float) -> float:
+        return math.floor(x / self.round_step + 0.5) * self.round_step
+
+    def _evaluate_python(self, weight, masks, price, msrp, used):
+        n = len(weight)
+        rule_of = [NO_RULE] * n
+        open_rows = list(range(n))
+        for r in self.rules:
+            hit = open_rows
+            if r.index in masks:
+                cat = masks[r.index]
+                hit = [i for i in hit if cat[i]]
+            for op, x in r.weight:
+                f = WEIGHT_OPS[op]
+                hit = [i for i in hit if weight[i] is not None and f(weight[i], x)]
+            for i in hit:
+                rule_of[i] = r.index
+            if hit:
+                taken = set(hit)
+                open_rows = [i for i in open_rows if i not in taken]
+        new_price: List[Optional[float]] = [None] * n
+        new_used: List[Optional[float]] = [None] * n
+        for i in range(n):
+            acts = self.rules[rule_of[i]].actions if rule_of[i] != NO_RULE else {}
+            p = price[i]
+            if p is None and "price_set" in acts:
+                p = new_price[i] = acts["price_set"]
+            if used[i] is not None:
+                continue
+            if "used_set" in acts:
+                new_used[i] = acts["used_set"]
+                continue
+            pct = acts.get("used_pct", self.default_used_pct)
+            base = p if p is not None else msrp[i]
+            if pct is not None and base is not None:
+                new_used[i] = self._round(base * pct)
+        return rule_of, new_price, new_used
+
+    def _evaluate_numpy(self, weight, masks, price, msrp, used):
+        def col(values):
+            return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+        w, p, m, u = col(weight), col(price), col(msrp), col(used)
+        n = len(w)
+        rule_of = np.full(n, NO_RULE, dtype=np.int64)
+        open_ = np.ones(n, dtype=bool)
+        for r in self.rules:
+            hit = open_.copy()
+            if r.index in masks:
+                hit &= masks[r.index]
+            with np.errstate(invalid="ignore"):
+                for op, x in r.weight:
+                    hit &= WEIGHT_OPS[op](w, x)  # NaN 比較一律 False
+            rule_of[hit] = r.index
+            open_ &= ~hit
+
+        def per_rule(action, default=np.nan):
+            table = np.array([r.actions.get(action, np.nan) for r in self.rules] + [default], dtype=float)
+            return table[rule_of]  # NO_RULE = -1 → 最後一格（預設）
+
+        default_pct = np.nan if self.default_used_pct is None else self.default_used_pct
+        price_set = per_rule("price_set")
+        used_set = per_rule("used_set")
+        pct = np.array([r.actions.get("used_pct", default_pct) for r in self.rules] + [default_pct],
+                       dtype=float)[rule_of]
+
+        fill_price = np.isnan(p) & ~np.isnan(price_set)
+        p = np.where(fill_price, price_set, p)
+        base = np.where(np.isnan(p), m, p)
+        calc = np.floor(base * pct / self.round_step + 0.5) * self.round_step
+        new_used = np.where(np.isnan(used_set), calc, used_set)
+        new_used = np.where(np.isnan(u), new_used, np.nan)
+
+        def out(a):
+            return [None if math.isnan(x) else float(x) for x in a.tolist()]
+
+        return rule_of.tolist(), out(np.where(fill_price, p, np.nan)), out(new_used)
+
+    # ---- 套到記錄上 ----
+
+    def apply(self, rows: List[Dict[str, Any]]) -> Counter:
+        """就地補上售價／二手價並記下 price_rule；回傳 {規則標籤: 補了幾個欄位}。"""
+        rule_of, new_price, new_used = self.evaluate(
+            _num_column(rows, "weight"),
+            [r.get("category_zh") for r in rows],
+            _num_column(rows, "price_twd"),
+            _num_column(rows, "price_msrp_twd"),
+            _num_column(rows, "used_price_twd"),
+        )
+        labels = [r.label for r in self.rules] + [DEFAULT_LABEL]  # NO_RULE = -1 → 最後一個
+        stats: Counter = Counter()
+        for r, rule, p, u in zip(rows, rule_of, new_price, new_used):
+            if p is None and u is None:
+                continue
+            label = labels[rule]
+            filled = {}
+            for field, v in (("price_twd", p), ("used_price_twd", u)):
+                if v is not None:
+                    r[field] = int(v) if v.is_integer() else v
+                    filled[field] = label
+                    stats[label] += 1
+            r["price_rule"] = filled
+        return stats
+
+
+def clear_rule_values(rows: List[Dict[str, Any]]) -> None:
+    """拿掉上次規則補上的值（price_rule 記的那些欄位）；要在套 manual.csv 覆寫之前呼叫。"""
+    for r in rows:
+        for field in r.pop("price_rule", None) or {}:
+            r.pop(field, None)
+
+
+def apply_price_rules(rows: List[Dict[str, Any]], path: pathlib.Path = RULES_JSON) -> Counter:
+    """讀規則檔並套用；沒有規則檔就什麼都不做。"""
+    rules = PriceRules.load(path)
+    if rules is None:
+        print(f"[INFO] 找不到 {path}，略過價格規則。")
+        return Counter()
+    stats = rules.apply(rows)
+    summary = "、".join(f"{k} {v}" for k, v in sorted(stats.items())) or "無"
+    print(f"[STAT] 價格規則（{'numpy' if np is not None else '純 Python'}）：補上 {sum(stats.values())} 個欄位；{summary}")
+    return stats
+
+
+def main() -> None:
+    import apply_taxonomy_and_price as atp
+    from catalog import Catalog
+
+    with Catalog() as catalog:
+        rows = catalog.rows()
+    atp.apply_all(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,37 @@
 publish_games.py
 
 目的：
-- 確保 site/data/games.json 一定是 `list[dict]` 結構，給前端直接使用。
-- 不再改動欄位，只做「來源選擇＋結構修正」。
+- 把 games_full.json（沒有就用 bgg_data.json）轉成網站用的 site/data/games.json
+- 格式見 site_payload.py：有 schema 版本、每個值只留一個欄位、分類／機制用字典編碼、不縮排
+- 分兩層：games.json 只放卡片／篩選／排序要的欄位；描述、備註等明細分塊寫到
+  site/data/detail/（檔名含內容雜湊），開啟遊戲時才載入
+- 搜尋框的倒排索引（search_index.py）寫成 site/data/search-<hash>.json
+- 分類／機制的中文名稱在這裡用 data/*_map_zh.csv 翻好放進 games.json（taxonomy.py）；
+  沒有對照的詞寫到 data/*_map_candidates.csv
+- 不再被 games.json 列出的舊明細檔、舊索引會刪掉
+- 每個檔都同時寫出預先壓縮的 .gz（以及有裝 brotli 套件時的 .br），
+  支援 gzip_static / brotli_static 的主機可以直接送
+- games_full.json 是 build_json 寫完後沒被動過的那份 → 直接從本機目錄（catalog.py）的 built 表
+  串流讀（一個 SELECT … ORDER BY position），不用整份 JSON 讀進記憶體；否則照舊讀檔
+- 結尾印出清單、明細、搜尋索引各自的大小，以及同一批記錄用舊格式（indent=2 list）寫出會是多大
+  （從目錄串流讀時也算：邊讀邊累計，不把整份放進記憶體）
 """
 
+import gzip
 import json
+import zlib
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    import brotli  # 選用：pip install brotli，沒有就只產 .gz
+except ImportError:
+    brotli = None
+
+import taxonomy
+from catalog import DB_PATH, Catalog
+from json_stream import encode as encode_json
+from site_payload import DETAIL_DIR, FACETS, dumps, encode
 
 ROOT = Path(__file__).resolve().parents[1]
 FULL = ROOT / "data" / "games_full.json"
@@ -30,6 +55,17 @@ def load_source():
     return src, data
 
 
+def open_catalog() -> Optional[Catalog]:
+    """目錄的 built 表跟 games_full.json 一致（build_json 記下的大小＋mtime 相同）→ 回傳目錄；否則 None。"""
+    if not FULL.exists() or not DB_PATH.exists():
+        return None
+    catalog = Catalog()
+    if not catalog.output_current(FULL):
+        catalog.close()
+        return None
+    return catalog
+
+
 def normalize_rows(data):
     """
     將 data 統一變成 list[dict]：
@@ -52,14 +88,119 @@ def normalize_rows(data):
     raise SystemExit("publish_games: input JSON is neither list nor dict")
 
 
-def main():
-    src, data = load_source()
-    rows = normalize_rows(data)
+def _write(path: Path, data: bytes) -> None:
+    """內容沒變就不寫（mtime 不動，部署時不會被當成新檔）。"""
+    if path.exists() and path.read_bytes() == data:
+        return
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def write_compressed(path: Path, data: bytes) -> Dict[str, int]:
+    """寫出 path 本身＋ .gz（＋ .br）；回傳各自的 byte 數。沒有 brotli 時會清掉舊的 .br。"""
+    _write(path, data)
+    sizes = {"raw": len(data)}
+    gz = gzip.compress(data, compresslevel=9, mtime=0)  # mtime=0 → 同樣內容產出同樣 bytes
+    _write(path.with_name(path.name + ".gz"), gz)
+    sizes["gz"] = len(gz)
+    br_path = path.with_name(path.name + ".br")
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        _write(br_path, br)
+        sizes["br"] = len(br)
+    else:
+        br_path.unlink(missing_ok=True)
+    return sizes
+
+
+def _fmt(sizes: Dict[str, int]) -> str:
+    return " / ".join(f"{k} {v / 1024:.1f} KB" for k, v in sizes.items())
+
+
+def _prune(base: Path, keep: List[str]) -> int:
+    """刪掉 base 底下 detail/*、search-* 裡不在 keep（含各自的 .gz / .br）的舊檔；回傳刪了幾個。"""
+    keep_paths = {base / (k + ext) for k in keep for ext in ("", ".gz", ".br")}
+    n = 0
+    for f in [*base.glob(f"{DETAIL_DIR}/*"), *base.glob("search-*")]:
+        if f.is_file() and f not in keep_paths:
+            f.unlink()
+            n += 1
+    return n
+
 
-    OUT.parent.mkdir(parents=True, exist_ok=True)
-    OUT.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+class LegacySize:
+    """邊讀邊算舊格式 json.dumps(rows, ensure_ascii=False, indent=2) 的 raw / gz 大小（不留下整份文字）。"""
+
+    def __init__(self) -> None:
+        self.raw = 0
+        self.gz = 0
+        self._z = zlib.compressobj(9, zlib.DEFLATED, 31)  # wbits=31 → gzip 格式，跟 gzip.compress 同樣大小
+        self._n = 0
+
+    def _put(self, data: bytes) -> None:
+        self.raw += len(data)
+        self.gz += len(self._z.compress(data))
+
+    def feed(self, rows: Iterable[Dict]) -> Iterator[Dict]:
+        """原樣轉交 rows，順便累計大小；讀完才算數。"""
+        self._put(b"[")
+        for r in rows:
+            self._put(b"," if self._n else b"")
+            self._put(b"\n  " + encode_json(r, 2).replace("\n", "\n  ").encode("utf-8"))
+            self._n += 1
+            yield r
+        self._put(b"\n]" if self._n else b"]")
+        self.gz += len(self._z.flush())
+
+    def sizes(self) -> Dict[str, int]:
+        return {"raw": self.raw, "gz": self.gz}
+
+
+def publish(rows: Iterable[Dict], out: Path = OUT) -> Dict:
+    """
+    rows → 清單 payload 寫到 out、明細分塊寫到 out 旁的 detail/（都含壓縮版）；回傳清單 payload。
+    rows 可以是串流（只讀一遍）；另外印出同一批記錄用舊格式寫出的大小。
+    """
+    labels = taxonomy.load_labels()
+    legacy = LegacySize()
+    payload, files = encode(legacy.feed(rows), labels=labels)
+    missing = taxonomy.update_candidates({f: payload["facets"][f]["names"] for f in FACETS}, labels)
+    (out.parent / DETAIL_DIR).mkdir(parents=True, exist_ok=True)
+    detail: Dict[str, int] = {}
+    for name in payload["detail"]["chunks"]:
+        for k, v in write_compressed(out.parent / name, dumps(files[name])).items():
+            detail[k] = detail.get(k, 0) + v
+    search = write_compressed(out.parent / payload["search"], dumps(files[payload["search"]]))
+    pruned = _prune(out.parent, list(files))
+    after = write_compressed(out, dumps(payload))  # 清單最後寫：它列出的檔案都已經在了
+
+    print(f"[STAT] games.json 舊格式（indent=2 list）：{_fmt(legacy.sizes())}")
+    print(f"[STAT] games.json schema {payload['schema']} 清單：{_fmt(after)}"
+          + ("" if brotli is not None else "（沒有 brotli 套件，略過 .br）"))
+    print(f"[STAT] 明細 {len(payload['detail']['chunks'])} 檔（每檔 {payload['detail']['chunk_size']} 款）合計：{_fmt(detail)}"
+          + (f"；刪掉舊檔 {pruned} 個" if pruned else ""))
+    print(f"[STAT] 搜尋索引 {payload['search']}：{_fmt(search)}")
+    print("[STAT] 中文對照：" + "；".join(
+        f"{f} {len(payload['facets'][f]['names']) - len(missing[f])}/{len(payload['facets'][f]['names'])}" for f in FACETS))
+    return payload
+
+
+def main():
+    catalog = open_catalog()
+    if catalog is not None:
+        with catalog:
+            n = catalog.counts()["built"]
+            payload = publish(catalog.iter_built())
+        src = f"{catalog.path.name}:built"
+    else:
+        path, data = load_source()
+        rows = normalize_rows(data)
+        n = len(rows)
+        payload = publish(rows)
+        src = str(path)
 
-    print(f"publish_games: mode=games_full ; rows={len(rows)} → {OUT} (from {src})")
+    print(f"publish_games: mode=games_full ; rows={n} → published={len(payload['games'])} → {OUT} (from {src})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+rate_limit.py — 呼叫 BGG API 共用的節流／退避工具
+
+- TokenBucket：多執行緒共用的令牌桶；遇到 429 會自動降速，連續成功再慢慢回升
+- Backoff：有上限的指數退避（含 jitter），取代各腳本裡的固定 sleep
+- FetchStats：統計請求數、重試次數、回應快取命中、等待時間，最後印出吞吐量；
+  在管線階段裡建立的會自動記進該階段的指標（metrics.py）
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import metrics
+
+# 會觸發退避重試的 HTTP 狀態碼
+RETRY_STATUS = (202, 429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    令牌桶：rate = 每秒補充幾個令牌，burst = 桶子容量。
+    acquire() 會阻塞到拿到令牌為止，回傳實際等待的秒數。
+
+    penalize()／reward() 是 AIMD 調速：
+    - 被 429 打槍 → rate 減半（不低於 min_rate）
+    - 成功一次 → rate 加一點點（不高於一開始設定的 rate）
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate 必須 > 0")
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = float(min_rate) if min_rate else self.max_rate / 8
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                delay = (1.0 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def reward(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class Backoff:
+    """有上限的指數退避：base * factor^(attempt-1)，最多 cap 秒，乘上 jitter。"""
+
+    def __init__(self, base: float = 2.0, factor: float = 1.7, cap: float = 60.0, jitter: float = 0.3):
+        self.base = base
+        self.factor = factor
+        self.cap = cap
+        self.jitter = jitter
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        # 伺服器有給 Retry-After（秒數）就照它的
+        if retry_after:
+            try:
+                return min(self.cap, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        d = min(self.cap, self.base * (self.factor ** max(0, attempt - 1)))
+        if self.jitter:
+            d *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return d
+
+
+@dataclass
+class FetchStats:
+    """抓取統計（多執行緒共用，更新時請用 add）。"""
+
+    requests: int = 0
+    ok: int = 0
+    failed: int = 0
+    cached: int = 0  # bgg_client 回應快取命中（沒有連網）
+    retries: dict = field(default_factory=dict)
+    items: int = 0
+    bytes: int = 0
+    wait_sec: float = 0.0
+    sleep_sec: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+    ended: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self) -> None:
+        metrics.attach_http(self)
+
+    def add(self, **kw) -> None:
+        with self._lock:
+            for k, v in kw.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def retry(self, status: int) -> None:
+        with self._lock:
+            self.retries[status] = self.retries.get(status, 0) + 1
+
+    def finish(self) -> None:
+        self.ended = time.monotonic()
+
+    def summary(self) -> str:
+        elapsed = max(1e-9, (self.ended or time.monotonic()) - self.started)
+        retry_txt = ", ".join(f"{k}×{v}" for k, v in sorted(self.retries.items())) or "0"
+        return (
+            f"requests={self.requests} ok={self.ok} failed={self.failed} retries=[{retry_txt}] "
+            + (f"cached={self.cached} " if self.cached else "")
+            + f"items={self.items} bytes={self.bytes} "
+            f"elapsed={elapsed:.1f}s throughput={self.items / elapsed:.1f} items/s "
+            f"(token wait {self.wait_sec:.1f}s, backoff sleep {self.sleep_sec:.1f}s)"
+        )
@@ -4,40 +4,58 @@
 Resolve BoardGameGeek IDs from manual.csv
 
 - 讀取 data/manual.csv（UTF-8 with BOM 容忍）
-- 依序：bgg_url_override → bgg_id → bgg_query 搜尋
+- 依序：bgg_url_override → bgg_id → bgg_query（先查本機名稱索引 name_index.py，沒有唯一結果才搜尋）
 - 產出 data/bgg_ids.json（原子寫入；未達門檻保留舊檔）
+- 搜尋結果記在 data/cache/bgg_search.json（query → id），下次同一個 query 直接沿用：
+    * 找到 id 的保留 BGG_SEARCH_TTL_DAYS 天；搜不到的只保留 BGG_SEARCH_MISS_TTL_DAYS 天
+    * 連線失敗／重試用完這類暫時性錯誤不記，下次照樣重搜
+    * 搜尋類型或比對邏輯（MATCHER_VERSION）改了，整個快取作廢
+- 同一輪裡重複的 query 只搜一次；要搜的 query 由 BGG_SEARCH_CONCURRENCY 條執行緒同時處理
+- HTTP 走 bgg_client.shared()：UA／token、連線池、令牌桶（BGG_RATE 次/秒）、退避重試都在那裡；
+  搜尋另外把 401／403 與解析不了的回應也當成暫時性錯誤重試
 - 環境變數：
     BGG_SEARCH_TYPES   (default: 'boardgame,boardgameexpansion')
-    BGG_RETRY          (default: 5)
     BGG_MIN_SAVE_IDS   (default: 5)  # 若未設亦讀 BGG_MIN_SAVE
-    BGG_UA             (default: repo UA)
-    BGG_TOKEN          (optional; 若有則附 Authorization)
+    BGG_SEARCH_CONCURRENCY   (default: 2)
+    BGG_SEARCH_TTL_DAYS      (default: 30)
+    BGG_SEARCH_MISS_TTL_DAYS (default: 3)
+    BGG_SEARCH_URL           (optional)  # 測試／benchmark 用，指向本機 stub
+
+用法：
+    python scripts/resolve_bgg.py             # 只搜本機索引對不到、快取裡也沒有（或過期）的 query
+    python scripts/resolve_bgg.py --refresh   # 忽略快取，本機索引對不到的全部重搜
+    python scripts/resolve_bgg.py --no-index  # 不用本機名稱索引
 """
 
+import argparse
 import os
-import csv, json, re, time, random, xml.etree.ElementTree as ET
+import csv, json, re, threading, time, xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from urllib.parse import quote
-import requests
+from typing import Dict, Iterable, Optional, Tuple
+
+import bgg_client
+from bgg_client import BGGClient
+from name_index import NameIndex, norm_name
+from rate_limit import RETRY_STATUS, FetchStats
 
-MANUAL = Path("data/manual.csv")
-OUT    = Path("data/bgg_ids.json")
+ROOT   = Path(__file__).resolve().parents[1]
+MANUAL = ROOT / "data" / "manual.csv"
+OUT    = ROOT / "data" / "bgg_ids.json"
+CACHE  = ROOT / "data" / "cache" / "bgg_search.json"
 
 # ---- 可由 CI 覆寫 ----
 SEARCH_TYPES = os.getenv("BGG_SEARCH_TYPES", "boardgame,boardgameexpansion")
-RETRY        = int(os.getenv("BGG_RETRY", "5"))
 MIN_SAVE     = int(os.getenv("BGG_MIN_SAVE_IDS", os.getenv("BGG_MIN_SAVE", "5")))
-TOKEN        = os.getenv("BGG_TOKEN", "").strip()
-
-HEADERS = {
-    "User-Agent": os.getenv("BGG_UA", "game-guide-site/ci (+https://github.com/TELIFUJ/game-guide-site)"),
-    "Accept": "application/xml",
-    "Referer": "https://boardgamegeek.com/",
-}
-if TOKEN:
-    HEADERS["Authorization"] = f"Bearer {TOKEN}"
+CONCURRENCY  = int(os.getenv("BGG_SEARCH_CONCURRENCY", "2"))
+HIT_TTL_DAYS  = float(os.getenv("BGG_SEARCH_TTL_DAYS", "30"))
+MISS_TTL_DAYS = float(os.getenv("BGG_SEARCH_MISS_TTL_DAYS", "3"))
+SEARCH_URL   = bgg_client.SEARCH_URL
 
-JLOW, JHIGH = 0.7, 1.3
+# 改了 _pick_best 的比對規則就 +1，讓舊的搜尋結果作廢
+MATCHER_VERSION = 1
+# 搜尋偶爾會在還沒授權好時回 401／403，等一下再問通常就好了
+SEARCH_RETRY_STATUS = RETRY_STATUS + (401, 403)
 
 def _int_or_none(x):
     if x is None: return None
@@ -46,60 +64,170 @@ def _int_or_none(x):
     try: return int(float(s))
     except Exception: return None
 
-def _norm_name(s: str) -> str:
-    s = s.lower()
-    s = re.sub(r"[ \t\n\r\-\–\—:•·\.,!\"'®™()\[\]{}]", "", s)
-    return s
+def _norm_query(q: str) -> str:
+    """快取／去重用的 key：大小寫、前後與重複空白不算差異。"""
+    return " ".join(q.casefold().split())
 
 def _extract_id_from_url(u: str):
     if not u: return None
     m = re.search(r"/(\d+)(?:/|$)", u)
     return int(m.group(1)) if m else None
 
-def _sleep_backoff(base, attempt):
-    time.sleep(base * (1.7 ** (attempt - 1)) * random.uniform(JLOW, JHIGH))
 
-def bgg_search_to_id(session: requests.Session, q: str):
-    """以 XMLAPI2 搜尋並回傳最合理的 id（含 202/429/5xx 退避）"""
+class QueryCache:
+    """
+    bgg_query → BGG id 的持久快取；id 為 None 代表「搜過但沒有結果」（有效期較短）。
+    檔案格式：{"version":1, "salt":..., "entries": {query_key: {"id": int|None, "at": epoch}}}
+    """
+
+    def __init__(self, path: Path = CACHE, hit_ttl_days: float = HIT_TTL_DAYS,
+                 miss_ttl_days: float = MISS_TTL_DAYS):
+        self.path = path
+        self.hit_ttl = hit_ttl_days * 86400
+        self.miss_ttl = miss_ttl_days * 86400
+        self.salt = f"{MATCHER_VERSION}|{SEARCH_TYPES}"
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path.exists():
+            try:
+                data = json.loads(path.read_text("utf-8"))
+            except ValueError:
+                print(f"[WARN] {path} 壞掉了，全部重搜")
+                data = {}
+            if data.get("salt") == self.salt:
+                self.entries = data.get("entries", {})
+            elif data:
+                self._dirty = True
+
+    def lookup(self, q: str, now: Optional[float] = None) -> Tuple[bool, Optional[int]]:
+        """回傳 (是否命中, id)；過期的當作沒命中。"""
+        hit = self.entries.get(_norm_query(q))
+        if hit is None:
+            return False, None
+        ttl = self.hit_ttl if hit.get("id") else self.miss_ttl
+        if (now or time.time()) - hit.get("at", 0) >= ttl:
+            return False, None
+        return True, hit.get("id")
+
+    def put(self, q: str, bid: Optional[int]) -> None:
+        with self._lock:
+            self.entries[_norm_query(q)] = {"id": bid, "at": int(time.time())}
+            self._dirty = True
+
+    def save(self) -> bool:
+        """有變動才寫檔；回傳是否有寫。"""
+        if not self._dirty:
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        body = {"version": 1, "salt": self.salt, "entries": self.entries}
+        tmp.write_text(json.dumps(body, ensure_ascii=False, separators=(",", ":")), "utf-8")
+        tmp.replace(self.path)
+        self._dirty = False
+        return True
+
+
+def _pick_best(root: ET.Element, q: str) -> Optional[int]:
+    """從搜尋結果挑最合理的 id：主名稱完全相同 > 開頭相同 > 包含 > 第一個沒有主名稱的。"""
+    target = norm_name(q)
+    best_id, best_score = None, -1
+    for it in root.findall("item"):
+        if it.get("type") not in ("boardgame", "boardgameexpansion"): continue
+        pid = int(it.get("id"))
+        names = [n.get("value") for n in it.findall("name") if n.get("type") == "primary"]
+        if not names:
+            if best_id is None: best_id, best_score = pid, 0
+            continue
+        primary = norm_name(names[0])
+        if primary == target: return pid
+        score = 2 if primary.startswith(target) else (1 if target in primary else 0)
+        if score > best_score:
+            best_id, best_score = pid, score
+    return best_id
+
+def bgg_search_to_id(client: BGGClient, q: str, stats: Optional[FetchStats] = None,
+                     base_url: str = SEARCH_URL):
+    """
+    以 XMLAPI2 搜尋並回傳最合理的 id；確定搜不到回傳 None。
+    限速、退避重試（含 401/403 與解析不了的回應）由 client 處理；
+    重試用完會丟 bgg_client.BGGError（暫時性錯誤，呼叫端不應該記進快取）。
+    """
     if not q: return None
-    url = f"https://boardgamegeek.com/xmlapi2/search?type={SEARCH_TYPES}&query={quote(q)}"
-    for attempt in range(1, RETRY + 1):
-        r = session.get(url, timeout=30)
-        if r.status_code in (202, 429, 500, 502, 503, 504):
-            _sleep_backoff(1.5, attempt); continue
-        if r.status_code in (401, 403):
-            _sleep_backoff(2.5, attempt); continue
-        r.raise_for_status()
+    stats = stats or FetchStats()
+    r = client.get(base_url, {"type": SEARCH_TYPES, "query": q}, stats=stats,
+                   retry_status=SEARCH_RETRY_STATUS, parse=ET.fromstring)
+    stats.add(items=1)
+    return _pick_best(r.parsed, q)
+
+def resolve_queries(queries: Iterable[str], cache: Optional[QueryCache] = None,
+                    client: Optional[BGGClient] = None, refresh: bool = False,
+                    index: Optional[NameIndex] = None,
+                    concurrency: int = CONCURRENCY,
+                    base_url: str = SEARCH_URL) -> Tuple[Dict[str, Optional[int]], Dict[str, int]]:
+    """
+    把一批 query 換成 id：先查本機名稱索引（有給 index 的話）與快取，剩下的（去重後）同時搜尋
+    （client 預設 bgg_client.shared()）。
+    回傳 ({query_key: id 或 None}, 統計)；搜尋失敗的 query 不會出現在結果裡。
+    """
+    cache = cache or QueryCache()
+    result: Dict[str, Optional[int]] = {}
+    todo: Dict[str, str] = {}
+    st = {"queries": 0, "unique": 0, "local": 0, "cached": 0, "searched": 0, "failed": 0}
+    for q in queries:
+        st["queries"] += 1
+        key = _norm_query(q)
+        if key in result or key in todo:
+            continue
+        st["unique"] += 1
+        bid = index.resolve(q) if index is not None else None
+        if bid:
+            result[key] = bid
+            st["local"] += 1
+            continue
+        found, bid = (False, None) if refresh else cache.lookup(q)
+        if found:
+            result[key] = bid
+            st["cached"] += 1
+        else:
+            todo[key] = q
+    if not todo:
+        return result, st
+
+    fstats = FetchStats()
+    client = client or bgg_client.shared()
+
+    def work(item: Tuple[str, str]) -> None:
+        key, q = item
         try:
-            root = ET.fromstring(r.text)
-        except ET.ParseError:
-            _sleep_backoff(1.0, attempt); continue
-
-        target = _norm_name(q)
-        best_id, best_score = None, -1
-        for it in root.findall("item"):
-            if it.get("type") not in ("boardgame", "boardgameexpansion"): continue
-            pid = int(it.get("id"))
-            names = [n.get("value") for n in it.findall("name") if n.get("type") == "primary"]
-            if not names:
-                if best_id is None: best_id, best_score = pid, 0
-                continue
-            primary = _norm_name(names[0])
-            if primary == target: return pid
-            score = 2 if primary.startswith(target) else (1 if target in primary else 0)
-            if score > best_score:
-                best_id, best_score = pid, score
-        return best_id
-    return None
+            bid = bgg_search_to_id(client, q, fstats, base_url)
+        except Exception as e:
+            print(f"[WARN] 搜尋失敗 {q!r}：{e}")
+            return
+        result[key] = bid
+        cache.put(q, bid)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            list(pool.map(work, todo.items()))
+    finally:
+        cache.save()
+    fstats.finish()
+    st["searched"] = len(todo)
+    st["failed"] = sum(1 for k in todo if k not in result)
+    print(f"[STAT] search: {fstats.summary()}")
+    return result, st
 
 def main():
+    ap = argparse.ArgumentParser(description="由 manual.csv 解析 BGG id")
+    ap.add_argument("--refresh", action="store_true", help="忽略搜尋快取，全部重搜")
+    ap.add_argument("--no-index", action="store_true", help="不查本機名稱索引")
+    args = ap.parse_args()
+
     if not MANUAL.exists():
         OUT.write_text("[]", encoding="utf-8"); print("No manual.csv → 0"); return
 
-    s = requests.Session()
-    s.headers.update(HEADERS)
-
-    rows = []
+    rows, pending = [], []
     with MANUAL.open(encoding="utf-8-sig", newline="") as f:
         reader = csv.DictReader(f)
         for r in reader:
@@ -130,14 +258,23 @@ def main():
             if not bid and bid_raw:
                 try: bid = int(float(bid_raw))
                 except Exception: bid = None
-            if not bid and q:
-                try: bid = bgg_search_to_id(s, q)
-                except Exception: bid = None
 
             if bid: entry["bgg_id"] = int(bid)
-            if q:   entry["bgg_query"] = q
+            if q:
+                entry["bgg_query"] = q
+                if not bid: pending.append(entry)
             rows.append(entry)
 
+    # 需要搜尋的 query 統一處理：本機索引 → 快取 → 去重 → 同時搜尋
+    if pending:
+        index = None if args.no_index else NameIndex.load()
+        found, st = resolve_queries((e["bgg_query"] for e in pending), refresh=args.refresh, index=index)
+        for e in pending:
+            bid = found.get(_norm_query(e["bgg_query"]))
+            if bid: e["bgg_id"] = int(bid)
+        print(f"[STAT] query {st['queries']}（不重複 {st['unique']}）：本機索引 {st['local']}，快取命中 {st['cached']}，"
+              f"實際搜尋 {st['searched']}，失敗 {st['failed']}")
+
     text = json.dumps(rows, ensure_ascii=False, indent=2)
     OUT.parent.mkdir(parents=True, exist_ok=True)
     tmp = OUT.with_suffix(".bgg_ids.tmp.json")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+search_index.py — 網站搜尋框用的倒排索引（publish_games 產生，前端打字時查）
+
+索引的欄位：name_zh、name_en、alias_zh、search_keywords（後兩個在明細檔裡，前端平常拿不到，
+只能靠這個索引搜）。文字先 NFKC + 轉小寫，再切成：
+- 中日韓文字（CJK_RUN）：每個字（1-gram）跟相鄰兩字（2-gram）→ "grams"
+- 其他連續的字母／數字：整個詞 → "words"（排序過，前端用二分搜尋找「以 query 開頭」的詞）
+
+查詢時 query 用同樣方式切：
+- 中文一個字查 1-gram，兩個字以上查它的每個 2-gram
+- 英文／數字每個詞都當「詞首」比對（cat → Catan、Cathedral）
+- 所有 token 的 posting list 取交集（AND）
+中文 2-gram 交集是「可能包含」：「卡坦島」會命中同時有「卡坦」跟「坦島」但不相連的名稱，實務上很少見。
+
+posting list 是清單（games.json）裡的列號，排序後存差值（[3, 1, 4] = 列 3、4、8）。
+
+    {
+      "schema": 2,
+      "fields": ["name_zh", "name_en", "alias_zh", "search_keywords"],
+      "words": ["7", "catan", ...],
+      "word_postings": [[12, 40], [3, 1, 4], ...],   # 對應 words 的位置
+      "grams": {"卡": [...], "卡坦": [...], ...}
+    }
+
+前端的切詞在 site/index.html 的 searchTokens()，兩邊規則要一致。
+
+用法：
+    python scripts/search_index.py "卡坦" "ticket to"   # 用 site/data 目前的索引查
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import re
+import sys
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+SEARCH_FIELDS = ("name_zh", "name_en", "alias_zh", "search_keywords")
+
+# 注音、假名、CJK 擴充 A、CJK 基本區、相容表意字、韓文音節
+CJK_CHARS = "\u3100-\u312f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+CJK_RUN = re.compile(f"[{CJK_CHARS}]+")
+WORD = re.compile(f"(?:(?![{CJK_CHARS}])[^\\W_])+")
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokens(text: str) -> List[Tuple[str, str]]:
+    """文字 → [("gram", "卡坦") | ("word", "catan"), ...]（查詢用：中文單字只給 1-gram）。"""
+    text = normalize(text)
+    out: List[Tuple[str, str]] = []
+    for run in CJK_RUN.findall(text):
+        if len(run) == 1:
+            out.append(("gram", run))
+        else:
+            out.extend(("gram", run[i:i + 2]) for i in range(len(run) - 1))
+    out.extend(("word", w) for w in WORD.findall(text))
+    return out
+
+
+def _index_terms(text: str) -> Tuple[Set[str], Set[str]]:
+    """建索引用：中文的 1-gram 跟 2-gram 都收（單字查詢要用）。"""
+    text = normalize(text)
+    grams: Set[str] = set()
+    for run in CJK_RUN.findall(text):
+        grams.update(run)
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams, set(WORD.findall(text))
+
+
+def delta_encode(rows: List[int]) -> List[int]:
+    return [r - p for r, p in zip(rows, [0] + rows[:-1])]
+
+
+def delta_decode(deltas: List[int]) -> List[int]:
+    out, acc = [], 0
+    for d in deltas:
+        acc += d
+        out.append(acc)
+    return out
+
+
+def _field_text(value: Any) -> str:
+    """欄位值 → 要切詞的文字；search_keywords 這類 list 逐項用空白接起來（不要變成 "['a', 'b']"）。"""
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value if v not in (None, ""))
+    return str(value or "")
+
+
+def build(games: Iterable[Dict[str, Any]], schema: int) -> Dict[str, Any]:
+    """games（依清單順序，每筆有 SEARCH_FIELDS 裡的欄位）→ 索引 dict。"""
+    grams: Dict[str, List[int]] = {}
+    words: Dict[str, List[int]] = {}
+    for row, g in enumerate(games):
+        text = " ".join(_field_text(g.get(f)) for f in SEARCH_FIELDS)
+        gs, ws = _index_terms(text)
+        for t in gs:
+            grams.setdefault(t, []).append(row)
+        for t in ws:
+            words.setdefault(t, []).append(row)
+    word_list = sorted(words)
+    return {
+        "schema": schema,
+        "fields": list(SEARCH_FIELDS),
+        "words": word_list,
+        "word_postings": [delta_encode(words[w]) for w in word_list],
+        "grams": {t: delta_encode(grams[t]) for t in sorted(grams)},
+    }
+
+
+class SearchIndex:
+    """載入後的索引；query() 跟前端 searchRows() 同一套規則（給工具、benchmark 用）。"""
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.words: List[str] = data["words"]
+        self._word_postings = data["word_postings"]
+        self._grams = data["grams"]
+        self._cache: Dict[Tuple[str, str], List[int]] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "SearchIndex":
+        return cls(json.loads(path.read_text("utf-8")))
+
+    def _prefix_range(self, prefix: str) -> Tuple[int, int]:
+        lo = bisect.bisect_left(self.words, prefix)
+        hi = lo
+        while hi < len(self.words) and self.words[hi].startswith(prefix):
+            hi += 1
+        return lo, hi
+
+    def postings(self, kind: str, term: str) -> List[int]:
+        key = (kind, term)
+        if key not in self._cache:
+            if kind == "gram":
+                rows = delta_decode(self._grams.get(term, []))
+            else:
+                lo, hi = self._prefix_range(term)
+                if hi - lo == 1:
+                    rows = delta_decode(self._word_postings[lo])
+                else:
+                    rows = sorted({r for i in range(lo, hi) for r in delta_decode(self._word_postings[i])})
+            self._cache[key] = rows
+        return self._cache[key]
+
+    def query(self, q: str) -> Optional[List[int]]:
+        """命中的列號（由小到大）；query 裡沒有可查的字（空白、純標點）回傳 None＝不篩選。"""
+        toks = list(dict.fromkeys(tokens(q)))
+        if not toks:
+            return None
+        lists = sorted((self.postings(k, t) for k, t in toks), key=len)
+        hits = set(lists[0])
+        for rows in lists[1:]:
+            if not hits:
+                break
+            hits.intersection_update(rows)
+        return sorted(hits)
+
+
+def main(argv: List[str]) -> None:
+    site = Path(__file__).resolve().parents[1] / "site" / "data"
+    payload = json.loads((site / "games.json").read_text("utf-8"))
+    idx = SearchIndex.load(site / payload["search"])
+    id_col = payload["fields"].index("id")
+    for q in argv:
+        rows = idx.query(q)
+        if rows is None:
+            print(f"{q!r}: 沒有可查的字（不篩選）")
+            continue
+        print(f"{q!r}: {len(rows)} 筆 {[payload['games'][r][id_col] for r in rows[:10]]}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+site_payload.py — 網站用 games.json 的精簡格式（有 schema 版本）
+
+games_full.json 為了相容，同一個值常有好幾個欄位名（rating／rating_avg、weight／weight_avg、
+usersrated／users_rated、minplayers／min_players…）；網站只需要一份。
+
+網站資料分兩層：
+- games.json（清單）：卡片、篩選、排序用得到的欄位（LIST_FIELDS），首頁一次載完
+- detail/NNNN-<hash>.json（明細）：描述、備註、原圖網址、BGG 連結等（DETAIL_FIELDS），
+  依清單順序每 CHUNK_SIZE 款一個檔，開啟遊戲時才載入；檔名含內容雜湊，內容沒變檔名就不變，
+  瀏覽器可以長期快取
+
+    games.json = {
+      "schema": 4,
+      "fields": ["id", "bgg_id", "name_en", ...],     # 每款遊戲一個 array，位置對應 fields
+      "games": [["Catan-13", 13, "Catan", ...], ...],
+      "facets": {                                     # 分類／機制的 posting list（見下）
+        "categories": {"names": ["Card Game", ...], "labels_zh": ["卡牌", ...],
+                       "counts": [412, ...], "rows": [[0, 2, 5], ...]},
+        "mechanisms": {...}
+      },
+      "sort": {"rating_bayes_desc": [2, 0, 1, ...], ..., "name_zh": [...]},   # 每個排序一個名次 array
+      "detail": {"fields": ["id", "bgg_url", ...], "chunk_size": 100,
+                 "chunks": ["detail/0000-1a2b3c4d5e.json", ...]},
+      "search": "search-6f7e8d9c0b.json"
+    }
+    detail/0000-….json = {"schema": 4, "start": 0, "games": [["Catan-13", null, ...], ...]}
+    search-….json      = 搜尋框的倒排索引（見 search_index.py；前端第一次畫面出來後才載入）
+
+- 每個值只留一個標準欄位；結尾連續的 null 省略
+- categories / mechanisms 不放在每款遊戲上，改成 facets：每個分類／機制一個 posting list
+  （有這個分類的遊戲在 games 裡的列號，排序後存差值，跟 search_index 一樣）＋款數；
+  names 依款數由多到少排（前端下拉選單就是這個順序）。前端篩選＝posting list 取交集，
+  每款遊戲的分類清單在載入時由 posting list 反推（順序＝names 的順序）
+- labels_zh：names 對應的中文名稱（taxonomy.py 讀 data/*_map_zh.csv 翻好；沒有對照的是 null，
+  前端顯示英文）。前端不再自己抓 CSV
+- image = image_override ＞ image ＞ thumbnail（前端本來就是這樣挑）；有本機衍生圖（image_variants）
+  時卡片用衍生圖，原圖只在讀不到時才用 → 這種遊戲的 image 放明細，其餘放清單
+- bgg_url 只有跟預設網址（由 bgg_id 組出來）不同時才輸出；mechanism_count 只有跟機制數不同時才輸出
+- sort：前端每個排序選項一個名次 array（sort[key][列號] = 名次），前端排序只比整數；
+  比較方式跟舊版前端 sortGames 一樣（價格＝二手價 ＞ 售價；沒有值的排最後），同分照列號。
+  name_zh（沒有中文名就用英文名）只有裝了 PyICU 才在這裡用 zh-Hant 定序算好；沒裝就不輸出 name_zh，
+  前端載入時自己用 Intl.Collator('zh-Hant') 算（ensureNameRanks）。Python 沒有內建的 zh-Hant 定序
+  （漢字照筆畫），自己湊的 key 跟瀏覽器的順序對不上，寧可不給
+- manual.csv 有標 manual_override 時，只發佈標成 1 的遊戲（原本是前端載入後才過濾）
+- 評分／重量四捨五入到小數 3 位（前端顯示到 2 位）
+
+改了格式（欄位順序、意義、分檔方式）就把 SCHEMA +1，前端會檢查。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import icu  # 選用：pip install PyICU，name_zh 排序在 build 時就用 zh-Hant 定序算好
+except ImportError:
+    icu = None
+
+from fingerprint import digest
+from game_record import SOURCES, Game, bgg_url_for
+from search_index import build as build_search_index
+from search_index import delta_decode, delta_encode
+
+SCHEMA = 4
+
+CHUNK_SIZE = int(os.getenv("SITE_DETAIL_CHUNK", "100"))
+DETAIL_DIR = "detail"
+
+# 清單：卡片、篩選、排序會用到的
+LIST_FIELDS = (
+    "id",
+    "bgg_id",
+    "name_en",
+    "name_zh",
+    "year",
+    "min_players",
+    "max_players",
+    "min_playtime",
+    "max_playtime",
+    "rating_bayes",
+    "rating_avg",
+    "users_rated",
+    "weight",
+    "price_twd",
+    "used_price_twd",
+    "price_msrp_twd",
+    "stock",
+    "image",
+    "image_variants",
+    "mechanism_count",
+)
+
+FACETS = ("categories", "mechanisms")
+
+# (排序 key, 欄位, 由大到小)
+NUMERIC_SORTS = (
+    ("rating_bayes_desc", "rating_bayes", True),
+    ("rating_avg_desc", "rating_avg", True),
+    ("users_rated_desc", "users_rated", True),
+    ("weight_asc", "weight", False),
+    ("weight_desc", "weight", True),
+    ("price_asc", "price", False),
+    ("price_desc", "price", True),
+)
+
+# 明細：開啟遊戲時才需要的（id 放第一欄，前端用來核對）
+DETAIL_FIELDS = (
+    "id",
+    "alias_zh",
+    "search_keywords",
+    "bgg_url",
+    "image",
+    "price_note",
+    "used_note",
+    "description",
+)
+
+DECIMALS = {"rating_bayes": 3, "rating_avg": 3, "weight": 3}
+
+
+def _first(rec: Dict[str, Any], *keys: str) -> Any:
+    for k in keys:
+        v = rec.get(k)
+        if v not in (None, ""):
+            return v
+    return None
+
+
+def _bgg_id(v: Any) -> Any:
+    s = str(v).strip() if v is not None else ""
+    return int(s) if s.isdigit() else (s or None)
+
+
+def _clean_list(v: Any) -> List[str]:
+    if not isinstance(v, list):
+        return []
+    return list(dict.fromkeys(s for s in (str(x).strip() for x in v if x is not None) if s))
+
+
+def _override_flag(rec: Dict[str, Any]) -> str:
+    v = rec.get("manual_override")
+    return "" if v is None else str(v).strip()
+
+
+def published(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """有任何一款標了 manual_override → 只留標成 1 的（跟舊版前端 filterByManualOverride 一樣）。"""
+    rows = list(rows)
+    if not any(_override_flag(r) for r in rows):
+        return rows
+    return [r for r in rows if _override_flag(r) == "1"]
+
+
+def canonical(rec: Dict[str, Any]) -> Game:
+    """games_full.json（或舊版 games.json）的一筆 → 只留標準欄位的 Game（舊欄位名照 game_record.SOURCES）。"""
+    mechanisms = _clean_list(_first(rec, *SOURCES["mechanisms"]))
+    bid = _bgg_id(rec.get("bgg_id"))
+    bgg_url = rec.get("bgg_url") or None
+    mcount = rec.get("mechanism_count")
+    out = {
+        "id": rec.get("id") or (str(bid) if bid else None),
+        "bgg_id": bid,
+        "name_en": _first(rec, "name_en", "name"),
+        "name_zh": _first(rec, "name_zh"),
+        "alias_zh": _first(rec, "alias_zh"),
+        "year": rec.get("year") or None,
+        "min_players": _first(rec, *SOURCES["min_players"]),
+        "max_players": _first(rec, *SOURCES["max_players"]),
+        "min_playtime": _first(rec, *SOURCES["min_playtime"]),
+        "max_playtime": _first(rec, *SOURCES["max_playtime"]),
+        "rating_bayes": _first(rec, *SOURCES["rating_bayes"]),
+        "rating_avg": _first(rec, *SOURCES["rating_avg"]),
+        "users_rated": _first(rec, *SOURCES["users_rated"]),
+        "weight": _first(rec, *SOURCES["weight"]),
+        "categories": _clean_list(rec.get("categories")),
+        "mechanisms": mechanisms,
+        "price_twd": _first(rec, *SOURCES["price_twd"]),
+        "used_price_twd": rec.get("used_price_twd"),
+        "price_msrp_twd": rec.get("price_msrp_twd"),
+        "stock": rec.get("stock"),
+        "image": _first(rec, "image_override", "image", "thumbnail"),
+        "image_variants": rec.get("image_variants") or None,
+        "mechanism_count": mcount if mcount not in (None, len(mechanisms)) else None,
+        "bgg_url": bgg_url if bgg_url != bgg_url_for(bid) else None,
+        "search_keywords": rec.get("search_keywords") or None,
+        "price_note": _first(rec, "price_note"),
+        "used_note": _first(rec, "used_note"),
+        "description": _first(rec, "description"),
+    }
+    for k, n in DECIMALS.items():
+        if isinstance(out[k], float):
+            out[k] = round(out[k], n)
+    return Game.adopt(out)
+
+
+def _dictionary(games: List[Dict[str, Any]], field: str) -> List[str]:
+    counts = Counter(v for g in games for v in g[field])
+    return [v for v, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))]
+
+
+def _facet(games: List[Dict[str, Any]], field: str, labels: Dict[str, str]) -> Dict[str, Any]:
+    """{names, labels_zh, counts, rows}：每個值一個 posting list（遊戲在清單裡的列號，存差值）。"""
+    names = _dictionary(games, field)
+    ix = {v: i for i, v in enumerate(names)}
+    rows: List[List[int]] = [[] for _ in names]
+    for row, g in enumerate(games):
+        for v in g[field]:
+            rows[ix[v]].append(row)
+    return {
+        "names": names,
+        "labels_zh": [labels.get(v) for v in names],
+        "counts": [len(r) for r in rows],
+        "rows": [delta_encode(r) for r in rows],
+    }
+
+
+def _num(v: Any) -> Optional[float]:
+    """跟前端 toNumberOrNull 一樣：數字或數字字串 → float，其餘 None。"""
+    if v is None or isinstance(v, bool):
+        return None
+    try:
+        n = float(str(v).strip()) if not isinstance(v, (int, float)) else float(v)
+    except ValueError:
+        return None
+    return n if math.isfinite(n) else None
+
+
+def _ranks(order: List[int]) -> List[int]:
+    out = [0] * len(order)
+    for i, row in enumerate(order):
+        out[row] = i
+    return out
+
+
+def _sort_ranks(games: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    """{排序 key: 名次 array}；沒有值的排最後，同分照列號。"""
+    values = {f: [_num(g.get(f)) for g in games] for f in ("rating_bayes", "rating_avg", "users_rated", "weight")}
+    used = [_num(g.get("used_price_twd")) for g in games]
+    values["price"] = [u if u is not None else _num(g.get("price_twd")) for u, g in zip(used, games)]
+    out = {}
+    rows = range(len(games))
+    for key, field, desc in NUMERIC_SORTS:
+        vals = values[field]
+        sign = -1 if desc else 1
+        out[key] = _ranks(sorted(rows, key=lambda r: (vals[r] is None, sign * (vals[r] or 0), r)))
+    if icu is not None:
+        # 沒有 PyICU 就不給，前端用 Intl.Collator('zh-Hant') 自己算（見模組說明）
+        collator = icu.Collator.createInstance(icu.Locale("zh_Hant"))
+        names = [collator.getSortKey(g.get("name_zh") or g.get("name_en") or "") for g in games]
+        out["name_zh"] = _ranks(sorted(rows, key=lambda r: (names[r], r)))
+    return out
+
+
+def _pack(values: Dict[str, Any], fields: Tuple[str, ...]) -> List[Any]:
+    row = [values.get(f) for f in fields]
+    while row and row[-1] is None:
+        row.pop()
+    return row
+
+
+def encode(rows: Iterable[Dict[str, Any]], chunk_size: int = CHUNK_SIZE,
+           labels: Optional[Dict[str, Dict[str, str]]] = None) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    games_full 記錄 → (清單 payload, {附屬檔相對路徑: 內容})；已套用 manual_override 篩選。
+    附屬檔（明細分塊、搜尋索引）的路徑相對於 games.json 所在的目錄。
+    labels = {facet: {英文: 中文}}（taxonomy.load_labels()）；沒給就全部是 null。
+    """
+    # 跟 published() 同一個規則，但邊讀邊轉成 Game：rows 是串流（catalog.iter_built）時不必先整份放進記憶體
+    flagged = [(_override_flag(r), canonical(r)) for r in rows]
+    if any(flag for flag, _ in flagged):
+        games = [g for flag, g in flagged if flag == "1"]
+    else:
+        games = [g for _, g in flagged]
+    del flagged
+    search = build_search_index(games, SCHEMA)
+    facets = {f: _facet(games, f, (labels or {}).get(f) or {}) for f in FACETS}
+    listed, details = [], []
+    for g in games:
+        g = g.to_dict()
+        detail = {f: g[f] for f in DETAIL_FIELDS}
+        if g["image_variants"]:
+            g = {**g, "image": None}  # 卡片用衍生圖；原圖只是讀不到時的後備，放明細
+        else:
+            detail["image"] = None
+        listed.append(_pack(g, LIST_FIELDS))
+        details.append(_pack(detail, DETAIL_FIELDS))
+
+    chunks: Dict[str, Dict[str, Any]] = {}
+    for k, start in enumerate(range(0, len(details), chunk_size)):
+        chunk = {"schema": SCHEMA, "start": start, "games": details[start:start + chunk_size]}
+        chunks[f"{DETAIL_DIR}/{k:04d}-{digest(chunk)[:10]}.json"] = chunk
+    search_name = f"search-{digest(search)[:10]}.json"
+    payload = {
+        "schema": SCHEMA,
+        "fields": list(LIST_FIELDS),
+        "games": listed,
+        "facets": facets,
+        "sort": _sort_ranks(games),
+        "detail": {"fields": list(DETAIL_FIELDS), "chunk_size": chunk_size, "chunks": list(chunks)},
+        "search": search_name,
+    }
+    return payload, {**chunks, search_name: search}
+
+
+def _check(payload: Dict[str, Any]) -> None:
+    if payload.get("schema") != SCHEMA:
+        raise ValueError(f"不支援的 games.json schema：{payload.get('schema')!r}（預期 {SCHEMA}）")
+
+
+def decode(payload: Dict[str, Any], chunks: Optional[Iterable[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    payload → [{欄位: 值}]（categories / mechanisms 還原成字串）；給 Python 端工具用。
+    有給明細（chunks）就一起併進去。
+    """
+    _check(payload)
+    fields = payload["fields"]
+    out = []
+    for row in payload["games"]:
+        g = {f: v for f, v in zip(fields, row) if v is not None}
+        for f in FACETS:
+            g[f] = []
+        out.append(g)
+    for f in FACETS:
+        facet = payload["facets"][f]
+        for name, deltas in zip(facet["names"], facet["rows"]):
+            for r in delta_decode(deltas):
+                out[r][f].append(name)
+    detail_fields = payload["detail"]["fields"]
+    for chunk in chunks or ():
+        _check(chunk)
+        for i, row in enumerate(chunk["games"], chunk["start"]):
+            d = {f: v for f, v in zip(detail_fields, row) if v is not None}
+            if d.get("id") != out[i].get("id"):
+                raise ValueError(f"明細檔跟清單對不上：第 {i} 筆 {d.get('id')!r} ≠ {out[i].get('id')!r}")
+            out[i].update(d)
+    return out
+
+
+def load(path: Path) -> List[Dict[str, Any]]:
+    """讀 games.json 以及它列出的明細檔 → 完整的 [{欄位: 值}]。"""
+    payload = json.loads(path.read_text("utf-8"))
+    _check(payload)
+    chunks = [json.loads((path.parent / name).read_text("utf-8")) for name in payload["detail"]["chunks"]]
+    return decode(payload, chunks)
+
+
+def dumps(payload: Dict[str, Any], indent: Optional[int] = None) -> bytes:
+    kw = {"indent": indent} if indent is not None else {"separators": (",", ":")}
+    return json.dumps(payload, ensure_ascii=False, **kw).encode("utf-8")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+taxonomy.py — BGG 分類／機制的中文對照（build 時翻好放進 games.json，前端不再自己讀 CSV）
+
+對照表：
+- data/category_map_zh.csv   ：bgg_category_en,category_zh
+- data/mechanism_map_zh.csv  ：bgg_mechanism_en,mechanism_zh
+每行以「最後一個逗號」切開（英文名稱本身可能有逗號，例如 "Deck, Bag, and Pool Building"），
+跟原本前端 parseCsvToMap 的規則一樣；# 開頭的行略過。
+
+對照表裡找不到的詞寫到候選檔（中文留空，翻好再搬到對照表）：
+- data/category_map_candidates.csv
+- data/mechanism_map_candidates.csv
+候選檔裡已經有人填了中文、但還沒搬過去的列會保留；對照表已經有的詞會從候選檔拿掉。
+
+用法：
+    python scripts/taxonomy.py     # 用 data/games_full.json 檢查哪些詞還沒翻譯，更新候選檔
+"""
+
+from __future__ import annotations
+
+import json
+import pathlib
+from typing import Dict, Iterable, List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+DATA = ROOT / "data"
+
+# facet → (對照表, 候選檔, CSV 表頭)
+MAPS = {
+    "categories": (DATA / "category_map_zh.csv", DATA / "category_map_candidates.csv",
+                   ("bgg_category_en", "category_zh")),
+    "mechanisms": (DATA / "mechanism_map_zh.csv", DATA / "mechanism_map_candidates.csv",
+                   ("bgg_mechanism_en", "mechanism_zh")),
+}
+MAP_FILES = tuple(m[0] for m in MAPS.values())
+
+
+def _strip_quotes(s: str) -> str:
+    s = s.strip()
+    if len(s) >= 2 and s[0] == s[-1] and s[0] in "\"'":
+        s = s[1:-1].strip()
+    return s
+
+
+def read_map(path: pathlib.Path, keep_empty: bool = False) -> Dict[str, str]:
+    """對照表 CSV → {英文: 中文}；keep_empty=True 時連中文空白的列也收（讀候選檔用）。"""
+    out: Dict[str, str] = {}
+    if not path.exists():
+        return out
+    lines = path.read_text("utf-8-sig").splitlines()
+    for line in lines[1:]:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        en, sep, zh = line.rpartition(",")
+        en, zh = _strip_quotes(en), _strip_quotes(zh)
+        if not sep or not en or (not zh and not keep_empty):
+            continue
+        out[en] = zh
+    return out
+
+
+def load_labels() -> Dict[str, Dict[str, str]]:
+    """{"categories": {英文: 中文}, "mechanisms": {...}}"""
+    return {facet: read_map(m[0]) for facet, m in MAPS.items()}
+
+
+def write_candidates(facet: str, names: Iterable[str], labels: Dict[str, str],
+                     path: Optional[pathlib.Path] = None) -> List[str]:
+    """
+    把 names 裡 labels 沒有的詞寫進候選檔（依英文排序）；回傳還沒翻譯的詞。
+    內容沒變就不寫檔。
+    """
+    _, default_path, header = MAPS[facet]
+    path = path or default_path
+    missing = sorted({n for n in names if n and n not in labels})
+    old = read_map(path, keep_empty=True)
+    rows = {n: old.get(n, "") for n in missing}
+    rows.update({en: zh for en, zh in old.items() if zh and en not in labels})  # 填了中文、還沒搬走的留著
+    text = "\n".join([",".join(header)] + [f"{en},{rows[en]}" for en in sorted(rows)]) + "\n"
+    if not path.exists() or path.read_text("utf-8-sig") != text:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        tmp.replace(path)
+    return missing
+
+
+def update_candidates(terms: Dict[str, Iterable[str]], labels: Dict[str, Dict[str, str]]) -> Dict[str, List[str]]:
+    """{facet: 出現過的詞} → 寫候選檔並印出統計；回傳 {facet: 還沒翻譯的詞}。"""
+    out = {}
+    for facet, names in terms.items():
+        names = list(names)
+        missing = write_candidates(facet, names, labels[facet])
+        out[facet] = missing
+        if missing:
+            print(f"[WARN] {facet}：{len(missing)}/{len(names)} 個詞沒有中文對照 → {MAPS[facet][1].name}")
+    return out
+
+
+def main() -> None:
+    games = json.loads((DATA / "games_full.json").read_text("utf-8"))
+    terms = {f: {t for g in games for t in g.get(f) or []} for f in MAPS}
+    missing = update_candidates(terms, load_labels())
+    for facet, names in missing.items():
+        print(f"{facet}: 出現 {len(terms[facet])} 個，未翻譯 {len(names)} 個")
+
+
+if __name__ == "__main__":
+    main()